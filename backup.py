@@ -0,0 +1,232 @@
+"""
+casino.db 온라인 백업 / 복원.
+
+봇이 쓰는 중에 파일을 복사하면 찢어진 사본이 나올 수 있어서 sqlite 온라인 백업 API 로 찍는다.
+- 백업: pages 장씩 step 하고 step 사이에 pause 초 쉰다 (쓰기 락을 오래 안 잡는다).
+  다른 연결이 쓰면 sqlite 가 백업을 처음부터 다시 하는데, 그게 max_restarts 번 넘으면
+  한 번에 다 복사한다 (WAL 이라 읽기 스냅샷 하나로 끝나고 쓰기는 안 막힌다).
+- 찍은 사본은 integrity_check 후 gzip 으로 <dir>/<이름>-YYYYmmdd-HHMMSS.db.gz (같은 초면 _02, _03 ...), 최근 keep 개만 남긴다.
+- 복원: 풀어서 integrity_check, 같은 백업 API 로 라이브 DB 에 덮어쓴다 (열린 연결들은 다음 조회부터 새 내용).
+
+전부 블로킹 함수다. 봇에서는 asyncio.to_thread 로 부른다.
+
+    python backup.py --db casino.db --dir backups --keep 14
+    python backup.py --db casino.db --list
+    python backup.py --db casino.db --restore backups/casino-20261019-120000.db.gz
+"""
+
+import argparse
+import gzip
+import logging
+import os
+import shutil
+import sqlite3
+import time
+
+log = logging.getLogger(__name__)
+
+SUFFIX = ".db.gz"
+
+
+class BackupError(RuntimeError):
+    pass
+
+
+class Result:
+    __slots__ = ("path", "size", "pages", "restarts", "elapsed")
+
+    def __init__(self, path: str, size: int, pages: int, restarts: int, elapsed: float):
+        self.path = path
+        self.size = size
+        self.pages = pages
+        self.restarts = restarts
+        self.elapsed = elapsed
+
+    def line(self) -> str:
+        again = f", 재시작 {self.restarts}" if self.restarts else ""
+        return (f"{os.path.basename(self.path)}  {self.size / 1024:,.0f}KB  "
+                f"{self.pages:,}페이지  {self.elapsed:.2f}s{again}")
+
+
+class _Restarted(Exception):
+    pass
+
+
+def _copy(src: sqlite3.Connection, dst: sqlite3.Connection, pages: int, pause: float, max_restarts: int) -> tuple[int, int]:
+    """(전체 페이지 수, 재시작 횟수)."""
+    state = {"remaining": None, "restarts": 0, "total": 0}
+
+    def progress(status, remaining, total):
+        # remaining 이 늘었으면 다른 연결이 써서 처음부터 다시 하는 중
+        if state["remaining"] is not None and remaining > state["remaining"]:
+            state["restarts"] += 1
+            if state["restarts"] > max_restarts:
+                raise _Restarted
+        state["remaining"] = remaining
+        state["total"] = total
+        if pause:
+            time.sleep(pause)
+
+    try:
+        src.backup(dst, pages=pages, progress=progress)
+    except _Restarted:
+        log.info("backup restarted %d times, copying in one step", state["restarts"])
+        src.backup(dst, pages=-1)
+    return state["total"] or _page_count(dst), state["restarts"]
+
+
+def _page_count(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA page_count").fetchone()[0]
+
+
+def check(path: str) -> int:
+    """integrity_check 가 ok 가 아니면 BackupError. user_version 을 돌려준다."""
+    conn = sqlite3.connect(path)
+    try:
+        rows = [r[0] for r in conn.execute("PRAGMA integrity_check")]
+        if rows != ["ok"]:
+            raise BackupError("integrity_check: " + "; ".join(rows[:5]))
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+    except sqlite3.DatabaseError as e:
+        raise BackupError(f"sqlite 파일이 아니야: {e}") from e
+    finally:
+        conn.close()
+
+
+def _name(db_path: str) -> str:
+    return os.path.splitext(os.path.basename(db_path))[0]
+
+
+def archives(out_dir: str, db_path: str) -> list[str]:
+    """이 DB 의 백업 파일, 최근 것부터."""
+    if not os.path.isdir(out_dir):
+        return []
+    prefix = _name(db_path) + "-"
+    names = [n for n in os.listdir(out_dir) if n.startswith(prefix) and n.endswith(SUFFIX)]
+    return [os.path.join(out_dir, n) for n in sorted(names, reverse=True)]
+
+
+def prune(out_dir: str, db_path: str, keep: int) -> list[str]:
+    removed = archives(out_dir, db_path)[keep:] if keep > 0 else []
+    for path in removed:
+        os.remove(path)
+    return removed
+
+
+def _reserve(out_dir: str, db_path: str) -> str:
+    # 같은 초에 두 번 찍으면 (/backup 과 backup_loop) 이름이 겹쳐 os.replace 가 앞 백업을 덮는다.
+    # .tmp 를 O_EXCL 로 먼저 만들어 이름을 잡고, 이미 있으면 _02, _03 ... ('_' 가 '.' 보다 커서 정렬해도 나중 것이 최신)
+    base = os.path.join(out_dir, f"{_name(db_path)}-{time.strftime('%Y%m%d-%H%M%S')}")
+    n = 1
+    while True:
+        path = f"{base}{SUFFIX}" if n == 1 else f"{base}_{n:02d}{SUFFIX}"
+        if not os.path.exists(path):
+            try:
+                os.close(os.open(path + ".tmp", os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return path
+            except FileExistsError:
+                pass
+        n += 1
+
+
+def snapshot(db_path: str, out_dir: str, keep: int = 14, pages: int = 256, pause: float = 0.005,
+             max_restarts: int = 3) -> Result:
+    t0 = time.perf_counter()
+    os.makedirs(out_dir, exist_ok=True)
+    path = _reserve(out_dir, db_path)
+    raw = path + ".tmp"
+
+    try:
+        # storage.connect 의 스레드별 연결과 섞지 않게 백업 전용 연결
+        src = sqlite3.connect(db_path, timeout=30)
+        dst = sqlite3.connect(raw)
+        try:
+            total, restarts = _copy(src, dst, pages, pause, max_restarts)
+        finally:
+            dst.close()
+            src.close()
+
+        check(raw)
+        with open(raw, "rb") as f, gzip.open(path + ".part", "wb", compresslevel=6) as out:
+            shutil.copyfileobj(f, out, 1 << 20)
+        os.replace(path + ".part", path)
+    finally:
+        for p in (raw, path + ".part"):
+            if os.path.exists(p):
+                os.remove(p)
+
+    prune(out_dir, db_path, keep)
+    return Result(path, os.path.getsize(path), total, restarts, time.perf_counter() - t0)
+
+
+def _unpack(archive: str, dest: str):
+    try:
+        with gzip.open(archive, "rb") as f, open(dest, "wb") as out:
+            shutil.copyfileobj(f, out, 1 << 20)
+    except (gzip.BadGzipFile, EOFError) as e:
+        raise BackupError(f"압축이 깨졌어: {e}") from e
+
+
+def verify(archive: str) -> int:
+    """풀어서 integrity_check. user_version 을 돌려준다."""
+    raw = archive + ".verify"
+    try:
+        _unpack(archive, raw)
+        return check(raw)
+    finally:
+        if os.path.exists(raw):
+            os.remove(raw)
+
+
+def restore(archive: str, db_path: str, pages: int = 1024) -> Result:
+    """
+    archive 를 라이브 DB 에 덮어쓴다. 백업 API 가 대상 쓰기 락을 잡고 바꾸므로 다른 연결이 열려 있어도 된다.
+    풀어본 사본이 integrity_check 를 통과 못 하면 아무것도 안 건드리고 BackupError.
+    """
+    t0 = time.perf_counter()
+    raw = db_path + ".restore"
+    try:
+        _unpack(archive, raw)
+        check(raw)
+        src = sqlite3.connect(raw)
+        dst = sqlite3.connect(db_path, timeout=30)
+        try:
+            src.backup(dst, pages=pages)
+            total = _page_count(dst)
+            check_rows = [r[0] for r in dst.execute("PRAGMA quick_check")]
+        finally:
+            dst.close()
+            src.close()
+        if check_rows != ["ok"]:
+            raise BackupError("복원 뒤 quick_check: " + "; ".join(check_rows[:5]))
+    finally:
+        if os.path.exists(raw):
+            os.remove(raw)
+    return Result(archive, os.path.getsize(archive), total, 0, time.perf_counter() - t0)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="sqlite 온라인 백업 / 복원")
+    ap.add_argument("--db", default="casino.db")
+    ap.add_argument("--dir", default="backups")
+    ap.add_argument("--keep", type=int, default=14)
+    ap.add_argument("--pages", type=int, default=256, help="step 당 페이지 수")
+    ap.add_argument("--list", action="store_true")
+    ap.add_argument("--verify", metavar="ARCHIVE")
+    ap.add_argument("--restore", metavar="ARCHIVE", help="봇을 멈추고 쓰는 걸 권장")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.list:
+        for path in archives(args.dir, args.db):
+            print(f"{path}  {os.path.getsize(path) / 1024:,.0f}KB")
+    elif args.verify:
+        print(f"ok (schema v{verify(args.verify)})")
+    elif args.restore:
+        print("restored " + restore(args.restore, args.db).line())
+    else:
+        print(snapshot(args.db, args.dir, args.keep, args.pages).line())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,425 @@
+"""
+부하 테스트 하네스.
+
+실제 핸들러(cmd_start / cmd_bet / on_text(!dice_*) / settle_round / settle_dice_round)를
+가짜 Update / Context 와 전송만 기록하는 가짜 Bot 으로 돌린다.
+N 개 채팅 x M 명 유저가 바카라/다이스 라운드를 끝까지 진행하고,
+핸들러별 / 정산 단계별(db, render, send) 처리량과 p50/p95/p99 지연을 JSON 으로 남긴다.
+
+    python bench.py --chats 20 --users 30 --rounds 3 --out bench.json
+    python bench.py --chats 20 --users 30 --shards 4      # shard.py 처럼 chat_id 로 나눈 프로세스 N 개
+    python bench.py --chats 20 --users 30 --backend memory  # 저장소 비용 없이 게임 로직만
+
+다른 커밋끼리 비교할 수 있게 결과에 git 커밋 해시를 같이 적는다.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing as mp
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+
+import main
+
+
+# ================== FAKE TELEGRAM ==================
+
+class FakeBot:
+    """app.bot 대용. 실제로 보내지 않고 메서드별 횟수/바이트만 센다."""
+
+    def __init__(self, send_latency: float = 0.0):
+        self.send_latency = send_latency
+        self.calls = defaultdict(int)
+        self.bytes = defaultdict(int)
+
+    async def _record(self, method: str, payload=None):
+        self.calls[method] += 1
+        if payload is not None and hasattr(payload, "getbuffer"):
+            self.bytes[method] += payload.getbuffer().nbytes
+        elif isinstance(payload, str):
+            self.bytes[method] += len(payload.encode())
+        if self.send_latency:
+            await asyncio.sleep(self.send_latency)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await self._record("send_message", text)
+
+    async def send_photo(self, chat_id, photo, **kwargs):
+        await self._record("send_photo", photo)
+
+    async def send_animation(self, chat_id, animation, **kwargs):
+        await self._record("send_animation", animation)
+
+    async def send_document(self, chat_id, document, **kwargs):
+        await self._record("send_document", document)
+
+
+class FakeMessage:
+    def __init__(self, bot: FakeBot, chat_id: int, text: str):
+        self._bot = bot
+        self.chat_id = chat_id
+        self.text = text
+
+    async def reply_text(self, text, **kwargs):
+        await self._bot.send_message(self.chat_id, text)
+
+    async def reply_photo(self, photo, **kwargs):
+        await self._bot.send_photo(self.chat_id, photo)
+
+    async def reply_animation(self, animation, **kwargs):
+        await self._bot.send_animation(self.chat_id, animation)
+
+    async def reply_document(self, document, **kwargs):
+        await self._bot.send_document(self.chat_id, document)
+
+
+def make_update(bot: FakeBot, chat_id: int, user_id: int, text: str):
+    return SimpleNamespace(
+        update_id=0,
+        effective_chat=SimpleNamespace(id=chat_id, type="group"),
+        effective_user=SimpleNamespace(id=user_id, username=f"u{user_id}"),
+        message=FakeMessage(bot, chat_id, text),
+    )
+
+
+def make_context(app, args: list[str]):
+    return SimpleNamespace(args=args, application=app, bot=app.bot)
+
+
+# ================== PHASE TIMER ==================
+
+class PhaseTimer:
+    """
+    단계별로 그 단계가 돌던 벽시계 구간을 모은다.
+    정산은 렌더(렌더 스레드)와 전송이 겹쳐 돌아서 단계별 합이 전체를 넘을 수 있으니
+    겹친 구간은 한 번만 센다 (busy). db 는 settle 전체에서 render ∪ send 를 뺀 나머지 (정산 로직 + sqlite).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.spans: dict[str, list[tuple[float, float]]] = defaultdict(list)
+
+    def reset(self):
+        with self.lock:
+            self.spans = defaultdict(list)
+
+    def _add(self, phase: str, started: float):
+        now = time.perf_counter()
+        with self.lock:
+            self.spans[phase].append((started, now))
+
+    def busy(self, *phases: str) -> float:
+        with self.lock:
+            spans = sorted(s for p in phases for s in self.spans.get(p, ()))
+        total = 0.0
+        end = float("-inf")
+        for a, b in spans:
+            if b <= end:
+                continue
+            total += b - max(a, end)
+            end = b
+        return total
+
+    def wrap(self, phase: str, fn):
+        def inner(*a, **kw):
+            started = time.perf_counter()
+            try:
+                return fn(*a, **kw)
+            finally:
+                self._add(phase, started)
+        return inner
+
+    def wrap_async(self, phase: str, fn):
+        async def inner(*a, **kw):
+            started = time.perf_counter()
+            try:
+                return await fn(*a, **kw)
+            finally:
+                self._add(phase, started)
+        return inner
+
+
+def percentile(sorted_vals: list[float], q: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    k = (len(sorted_vals) - 1) * q
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_vals) - 1)
+    return sorted_vals[lo] + (sorted_vals[hi] - sorted_vals[lo]) * (k - lo)
+
+
+def summarize(samples: list[float], wall: float) -> dict:
+    # 핸들러가 겹쳐 돌기 때문에 처리량은 지연 합이 아니라 실행 전체 벽시계 시간으로 나눈다
+    vals = sorted(samples)
+    total = sum(vals)
+    return {
+        "count": len(vals),
+        "total_s": round(total, 6),
+        "throughput_per_s": round(len(vals) / wall, 2) if wall > 0 else None,
+        "mean_ms": round(total / len(vals) * 1000, 3) if vals else 0.0,
+        "p50_ms": round(percentile(vals, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(vals, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(vals, 0.99) * 1000, 3),
+        "max_ms": round(vals[-1] * 1000, 3) if vals else 0.0,
+    }
+
+
+# ================== SIMULATION ==================
+
+async def _no_timer(*args, **kwargs):
+    # 벤치에서는 마감 타이머 대신 직접 정산을 호출한다
+    return None
+
+
+def chat_ids(chats: int) -> list[int]:
+    return [-(1000000 + i) for i in range(chats)]
+
+
+class Bench:
+    def __init__(self, chats: list[int], users: int, rounds: int, send_latency: float, seed: int):
+        self.chats = chats
+        self.users = [10000 + i for i in range(users)]
+        self.rounds = rounds
+        self.rng = random.Random(seed)
+        self.bot = FakeBot(send_latency)
+        self.app = SimpleNamespace(bot=self.bot)
+        self.samples: dict[str, list[float]] = defaultdict(list)
+        self.phases: dict[str, dict[str, list[float]]] = defaultdict(lambda: defaultdict(list))
+        self.timer = PhaseTimer()
+
+    def install(self):
+        t = self.timer
+        main.delayed_settle = _no_timer
+        main.delayed_dice_settle = _no_timer
+        # 유저 몇 명이 모든 채팅에서 몰아서 치니 폭주 제한은 끈다
+        main.ADMISSION = None
+        for name in ("make_reveal_gif", "draw_road_image_bytes", "make_dice_gif"):
+            setattr(main, name, t.wrap("render", getattr(main, name)))
+        for name in ("send_message", "send_photo", "send_animation", "send_document"):
+            setattr(self.bot, name, t.wrap_async("send", getattr(self.bot, name)))
+
+    async def timed(self, name: str, coro_fn, *args):
+        t0 = time.perf_counter()
+        await coro_fn(*args)
+        self.samples[name].append(time.perf_counter() - t0)
+
+    async def settle(self, name: str, coro_fn, *args):
+        self.timer.reset()
+        t0 = time.perf_counter()
+        await coro_fn(*args)
+        total = time.perf_counter() - t0
+        self.samples[name].append(total)
+        t = self.timer
+        self.phases[name]["render"].append(t.busy("render"))
+        self.phases[name]["send"].append(t.busy("send"))
+        self.phases[name]["db"].append(max(0.0, total - t.busy("render", "send")))
+
+    async def baccarat_round(self):
+        for chat_id in self.chats:
+            starter = self.users[0]
+            await self.timed("cmd_start", main.cmd_start,
+                             make_update(self.bot, chat_id, starter, "/start"), make_context(self.app, []))
+
+        for chat_id in self.chats:
+            for uid in self.users:
+                amt = str(self.rng.randint(100, 5000))
+                choice = self.rng.choice("PPPBBBT")
+                await self.timed("cmd_bet", main.cmd_bet,
+                                 make_update(self.bot, chat_id, uid, f"/bet {amt} {choice}"),
+                                 make_context(self.app, [amt, choice]))
+
+        for chat_id in self.chats:
+            rid = int(main.STORE.get_round(chat_id)["round_id"])
+            await self.settle("settle_round", main.settle_round, self.app, chat_id, rid)
+
+    async def dice_round(self):
+        for chat_id in self.chats:
+            text = "!dice_start"
+            await self.timed("dice_start_cmd", main.on_text,
+                             make_update(self.bot, chat_id, self.users[0], text), make_context(self.app, []))
+
+        for chat_id in self.chats:
+            for uid in self.users:
+                amt = self.rng.randint(100, 5000)
+                kind = self.rng.choice(["BIG", "SMALL", "EXACT"])
+                if kind == "EXACT":
+                    text = f"!dice_bet EXACT {self.rng.randint(1, 6)} {amt}"
+                else:
+                    text = f"!dice_bet {kind} {amt}"
+                await self.timed("dice_bet_cmd", main.on_text,
+                                 make_update(self.bot, chat_id, uid, text), make_context(self.app, []))
+
+        for chat_id in self.chats:
+            rid = int(main.get_dice_state(chat_id)["round_id"])
+            await self.settle("settle_dice_round", main.settle_dice_round, self.app, chat_id, rid)
+
+    async def run(self) -> float:
+        t0 = time.perf_counter()
+        for _ in range(self.rounds):
+            await self.baccarat_round()
+            await self.dice_round()
+        return time.perf_counter() - t0
+
+    def raw(self) -> dict:
+        return {
+            "samples": dict(self.samples),
+            "phases": {name: dict(p) for name, p in self.phases.items()},
+            "calls": dict(self.bot.calls),
+            "bytes": dict(self.bot.bytes),
+        }
+
+    def merge(self, raw: dict):
+        for name, vals in raw["samples"].items():
+            self.samples[name].extend(vals)
+        for name, phases in raw["phases"].items():
+            for phase, vals in phases.items():
+                self.phases[name][phase].extend(vals)
+        for k, v in raw["calls"].items():
+            self.bot.calls[k] += v
+        for k, v in raw["bytes"].items():
+            self.bot.bytes[k] += v
+
+    def report(self, wall: float, params: dict) -> dict:
+        calls = sum(len(v) for v in self.samples.values())
+        return {
+            "meta": {
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "started_at": int(time.time()),
+                "params": params,
+                "wall_s": round(wall, 6),
+                "handler_calls_per_s": round(calls / wall, 2) if wall > 0 else None,
+            },
+            "handlers": {name: summarize(vals, wall) for name, vals in sorted(self.samples.items())},
+            "settle_phases": {
+                name: {phase: summarize(vals, wall) for phase, vals in sorted(phases.items())}
+                for name, phases in sorted(self.phases.items())
+            },
+            "sends": {
+                "calls": dict(self.bot.calls),
+                "bytes": dict(self.bot.bytes),
+            },
+        }
+
+
+def _shard_worker(index: int, args: argparse.Namespace, db_path: str, start, out):
+    import shard
+
+    main.DB_PATH = db_path
+    main.SHARDS = args.shards
+    main.SHARD_INDEX = index
+    main.RNG_SEED = str(args.seed)
+    main.PREDEAL = args.predeal
+    main.init_db()
+    chats = [c for c in chat_ids(args.chats) if shard.shard_of(c, args.shards) == index]
+    bench = Bench(chats, args.users, args.rounds, args.send_latency_ms / 1000, args.seed + index)
+    bench.install()
+    start.wait()
+    asyncio.run(bench.run())
+    out.put(bench.raw())
+
+
+def run_sharded(bench: Bench, args: argparse.Namespace, db_path: str) -> float:
+    """shard.py 와 같은 규칙으로 채팅을 나눠 프로세스마다 돌리고 결과를 합친다. 벽시계 시간을 돌려준다."""
+    ctx = mp.get_context("spawn")
+    start = ctx.Event()
+    out = ctx.Queue()
+    procs = [
+        ctx.Process(target=_shard_worker, args=(i, args, db_path, start, out))
+        for i in range(args.shards)
+    ]
+    for p in procs:
+        p.start()
+
+    # 프로세스 기동/임포트 시간은 빼고 잰다
+    time.sleep(0.5)
+    t0 = time.perf_counter()
+    start.set()
+    for _ in procs:
+        bench.merge(out.get())
+    wall = time.perf_counter() - t0
+    for p in procs:
+        p.join()
+    return wall
+
+
+def git_commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="olympus-bot 핸들러 부하 테스트")
+    ap.add_argument("--chats", type=int, default=10)
+    ap.add_argument("--users", type=int, default=20)
+    ap.add_argument("--rounds", type=int, default=3)
+    ap.add_argument("--send-latency-ms", type=float, default=0.0,
+                    help="가짜 Bot 전송마다 넣을 지연 (텔레그램 RTT 흉내)")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--shards", type=int, default=1,
+                    help="chat_id %% N 으로 나눈 워커 프로세스 수 (잔액은 공용 DB, 채팅 테이블은 샤드 파일)")
+    ap.add_argument("--backend", choices=("sqlite", "memory"), default="sqlite",
+                    help="memory 면 저장소 비용을 빼고 게임 로직/렌더만 잰다")
+    ap.add_argument("--predeal", action="store_true",
+                    help="PREDEAL: /start 때 딜하고 베팅 받는 동안 렌더 (정산은 쓰기 + 전송만)")
+    ap.add_argument("--db", default=None, help="sqlite 파일 (기본: 임시 파일)")
+    ap.add_argument("--out", default="bench.json")
+    return ap.parse_args(argv)
+
+
+def main_cli(argv=None):
+    args = parse_args(argv)
+    if args.backend == "memory" and args.shards > 1:
+        raise SystemExit("--backend memory 는 --shards 1 에서만 (프로세스끼리 잔액을 공유 못 함)")
+    main.STORAGE_BACKEND = args.backend
+    # 카드/다이스/룰렛도 --seed 로 고정해서 같은 인자면 같은 판이 나오게
+    main.RNG_SEED = str(args.seed)
+    main.PREDEAL = args.predeal
+
+    tmpdir = None
+    if args.db:
+        main.DB_PATH = args.db
+    else:
+        tmpdir = tempfile.TemporaryDirectory()
+        main.DB_PATH = os.path.join(tmpdir.name, "bench.db")
+    main.init_db()
+
+    bench = Bench(chat_ids(args.chats), args.users, args.rounds, args.send_latency_ms / 1000, args.seed)
+    if args.shards > 1:
+        wall = run_sharded(bench, args, main.DB_PATH)
+    else:
+        bench.install()
+        wall = asyncio.run(bench.run())
+
+    params = {k: v for k, v in vars(args).items() if k != "out"}
+    result = bench.report(wall, params)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+    for name, s in result["handlers"].items():
+        print(f"{name:20s} n={s['count']:6d}  p50={s['p50_ms']:8.2f}ms  p95={s['p95_ms']:8.2f}ms  p99={s['p99_ms']:8.2f}ms")
+    print(f"wall {wall:.2f}s -> {args.out}")
+
+    if tmpdir:
+        tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,361 @@
+"""
+casino.db 대량 내보내기 / 가져오기 / 일괄 지급.
+
+테이블을 fetchall() 로 한꺼번에 올리지 않는다. 전부 chunk 줄씩 흘려보내서 메모리는 테이블 크기와 상관없다.
+- export: SELECT 하나를 fetchmany(chunk) 로 읽으며 바로 CSV / NDJSON 으로 쓴다.
+  문장 하나라 한 시점 스냅샷이고 (WAL 이라 쓰기는 안 막힌다), 읽기 전용 연결을 따로 연다.
+- import_users: 파일의 user_id / points 로 잔액을 맞춘다. chunk 줄마다 트랜잭션 하나.
+  잔액을 바로 덮지 않고 차이를 'import' 원장 줄로 남긴다 (reconcile / rebuild_balance 가 계속 맞는다).
+  없는 유저는 만든다. 원장/라운드 기록 자체를 옮기는 건 backup.py 로.
+- grant: (user_id, 포인트) 들을 chunk 마다 원장 executemany 한 번 + 잔액 executemany 한 번으로 지급.
+  없는 유저는 건너뛴다.
+
+경로가 .ndjson / .jsonl 이면 NDJSON, 아니면 CSV (첫 줄 헤더). 뒤에 .gz 가 붙으면 gzip, '-' 는 표준 입출력.
+progress(done, total) 는 chunk 마다 부른다 (total 은 모르면 None). 전부 블로킹 함수다.
+
+    python bulk.py export users --out users.csv
+    python bulk.py export ledger --out ledger.ndjson.gz
+    python bulk.py import users users.csv
+    python bulk.py grant rewards.csv --reason event
+    python bulk.py grant --amount 10000 --users 111,222,333
+"""
+
+import argparse
+import csv
+import gzip
+import json
+import logging
+import sqlite3
+import sys
+import time
+
+import storage
+
+log = logging.getLogger(__name__)
+
+_LEDGER_INSERT = (
+    "INSERT INTO ledger(user_id, delta, reason, chat_id, game, round_id, created_at) VALUES(?,?,?,NULL,NULL,NULL,?)"
+)
+
+# 이름 -> (열, SELECT). 순서는 rowid (원장은 id) 순
+EXPORTS = {
+    "users": (
+        ("user_id", "username", "points"),
+        "SELECT user_id, username, points FROM users ORDER BY user_id",
+    ),
+    "ledger": (
+        ("id", "user_id", "delta", "reason", "chat_id", "game", "round_id", "created_at"),
+        "SELECT id, user_id, delta, reason, chat_id, game, round_id, created_at FROM ledger ORDER BY id",
+    ),
+    "rounds": (
+        ("chat_id", "game", "round_id", "shoe_no", "shoe_pos", "outcome", "total_bet", "house_delta", "created_at"),
+        "SELECT chat_id, game, round_id, shoe_no, shoe_pos, outcome, total_bet, house_delta, created_at "
+        "FROM round_log ORDER BY rowid",
+    ),
+    "bets": (
+        ("chat_id", "game", "round_id", "user_id", "choice", "exact_value", "amount"),
+        "SELECT chat_id, game, round_id, user_id, choice, exact_value, amount FROM bet_log ORDER BY rowid",
+    ),
+}
+
+_COUNT = {
+    "users": "SELECT COUNT(*) FROM users",
+    "ledger": "SELECT COUNT(*) FROM ledger",
+    "rounds": "SELECT COUNT(*) FROM round_log",
+    "bets": "SELECT COUNT(*) FROM bet_log",
+}
+
+# 잘못된 줄은 건너뛰고 처음 몇 개만 이유를 남긴다
+MAX_ERRORS = 5
+
+
+class BulkError(ValueError):
+    pass
+
+
+class Result:
+    __slots__ = ("rows", "applied", "skipped", "errors", "elapsed")
+
+    def __init__(self):
+        self.rows = 0       # 읽은/쓴 줄 (건너뛴 줄 포함)
+        self.applied = 0    # 실제로 바뀐 유저 수 (export 는 rows 와 같다)
+        self.skipped = 0
+        self.errors: list[str] = []
+        self.elapsed = 0.0
+
+    def skip(self, lineno: int, why: str):
+        self.rows += 1
+        self.skipped += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append(f"{lineno}번째 줄: {why}")
+
+    def line(self) -> str:
+        skipped = f", 건너뜀 {self.skipped:,}" if self.skipped else ""
+        return f"{self.rows:,}줄, 반영 {self.applied:,}{skipped}  {self.elapsed:.2f}s"
+
+
+# ================== FILES ==================
+
+def is_ndjson(path: str) -> bool:
+    name = path[:-3] if path.endswith(".gz") else path
+    return name.endswith((".ndjson", ".jsonl"))
+
+
+def _open(path: str, mode: str):
+    if path == "-":
+        return open((sys.stdout if "w" in mode else sys.stdin).fileno(), mode, encoding="utf-8",
+                    newline="", closefd=False)
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8", newline="")
+    return open(path, mode, encoding="utf-8", newline="")
+
+
+def read_rows(f, ndjson: bool):
+    """(줄 번호, dict) 를 하나씩. 깨진 NDJSON 줄은 dict 대신 None."""
+    if ndjson:
+        for lineno, text in enumerate(f, start=1):
+            if not text.strip():
+                continue
+            try:
+                row = json.loads(text)
+            except ValueError:
+                row = None
+            yield lineno, row if isinstance(row, dict) else None
+    else:
+        # 헤더가 1번째 줄
+        for lineno, row in enumerate(csv.DictReader(f), start=2):
+            yield lineno, row
+
+
+def _chunks(it, size: int):
+    chunk = []
+    for item in it:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _int(row: dict, key: str) -> int:
+    value = row.get(key)
+    if value is None or value == "":
+        raise ValueError(f"{key} 없음")
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{key} 가 정수가 아님: {value!r}") from None
+
+
+# ================== EXPORT ==================
+
+def export(db_path: str, what: str, out: str, chunk: int = 1000, progress=None) -> Result:
+    if what not in EXPORTS:
+        raise BulkError(f"알 수 없는 대상: {what} ({', '.join(EXPORTS)})")
+    columns, sql = EXPORTS[what]
+    ndjson = is_ndjson(out)
+    result = Result()
+    t0 = time.perf_counter()
+
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, timeout=30)
+    try:
+        total = conn.execute(_COUNT[what]).fetchone()[0]
+        cur = conn.execute(sql)
+        with _open(out, "w") as f:
+            if ndjson:
+                write = lambda rows: f.writelines(
+                    json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n" for row in rows
+                )
+            else:
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                write = writer.writerows
+            while rows := cur.fetchmany(chunk):
+                write(rows)
+                result.rows += len(rows)
+                if progress:
+                    progress(result.rows, total)
+    finally:
+        conn.close()
+
+    result.applied = result.rows
+    result.elapsed = time.perf_counter() - t0
+    return result
+
+
+# ================== IMPORT ==================
+
+def _parse_balances(rows, result: Result):
+    for lineno, row in rows:
+        if row is None:
+            result.skip(lineno, "JSON 이 아님")
+            continue
+        try:
+            uid = _int(row, "user_id")
+            points = _int(row, "points")
+        except ValueError as e:
+            result.skip(lineno, str(e))
+            continue
+        if points < 0:
+            result.skip(lineno, f"음수 잔액 {points}")
+            continue
+        yield uid, row.get("username") or "", points
+
+
+def _apply_balances(conn: sqlite3.Connection, batch: list[tuple[int, str, int]], reason: str) -> int:
+    # 같은 파일에 같은 유저가 여러 번 나오면 마지막 줄
+    wanted = {uid: (username, points) for uid, username, points in batch}
+    marks = ",".join("?" * len(wanted))
+    current = dict(conn.execute(f"SELECT user_id, points FROM users WHERE user_id IN ({marks})", list(wanted)))
+
+    now = int(time.time())
+    created = [(uid, username, 0) for uid, (username, _) in wanted.items() if uid not in current]
+    changes = [
+        (uid, username, points - current.get(uid, 0), points)
+        for uid, (username, points) in wanted.items()
+        if points != current.get(uid, 0) or uid not in current
+    ]
+    conn.executemany("INSERT INTO users(user_id, username, points) VALUES(?,?,?)", created)
+    conn.executemany(_LEDGER_INSERT, [(uid, delta, reason, now) for uid, _, delta, _ in changes if delta])
+    conn.executemany(
+        "UPDATE users SET points = ?, username = CASE WHEN ? != '' THEN ? ELSE username END WHERE user_id=?",
+        [(points, username, username, uid) for uid, username, _, points in changes]
+    )
+    return len(changes)
+
+
+def import_users(db_path: str, src: str, chunk: int = 1000, reason: str = "import", progress=None) -> Result:
+    """src 의 잔액으로 맞춘다. 열: user_id, points[, username]."""
+    result = Result()
+    t0 = time.perf_counter()
+    conn = storage.connect(db_path)
+    with _open(src, "r") as f:
+        for batch in _chunks(_parse_balances(read_rows(f, is_ndjson(src)), result), chunk):
+            # 읽고 나서 쓰는 사이에 베팅이 끼면 안 되니 처음부터 쓰기 락
+            conn.execute("BEGIN IMMEDIATE")
+            with conn:
+                result.applied += _apply_balances(conn, batch, reason)
+            result.rows += len(batch)
+            if progress:
+                progress(result.rows, None)
+    result.elapsed = time.perf_counter() - t0
+    return result
+
+
+# ================== GRANT ==================
+
+def parse_grants(rows, amount: int | None, result: Result):
+    """(줄 번호, dict) -> (user_id, 포인트). 파일에 amount 열이 없으면 amount 를 쓴다."""
+    for lineno, row in rows:
+        if row is None:
+            result.skip(lineno, "JSON 이 아님")
+            continue
+        try:
+            uid = _int(row, "user_id")
+            value = _int(row, "amount") if row.get("amount") not in (None, "") or amount is None else amount
+        except ValueError as e:
+            result.skip(lineno, str(e))
+            continue
+        if value <= 0:
+            result.skip(lineno, f"지급액이 0 이하: {value}")
+            continue
+        yield uid, value
+
+
+def _apply_grants(conn: sqlite3.Connection, batch: list[tuple[int, int]], reason: str) -> int:
+    now = int(time.time())
+    # 없는 유저 몫은 원장에도 안 남긴다
+    conn.executemany(
+        "INSERT INTO ledger(user_id, delta, reason, chat_id, game, round_id, created_at) "
+        "SELECT ?1, ?2, ?3, NULL, NULL, NULL, ?4 WHERE EXISTS (SELECT 1 FROM users WHERE user_id=?1)",
+        [(uid, amt, reason, now) for uid, amt in batch]
+    )
+    cur = conn.executemany("UPDATE users SET points = points + ? WHERE user_id=?", [(amt, uid) for uid, amt in batch])
+    return cur.rowcount
+
+
+def grant(db_path: str, grants, reason: str = "grant", chunk: int = 1000, progress=None,
+          result: Result | None = None) -> Result:
+    """grants: (user_id, 포인트) 이터러블. chunk 개마다 트랜잭션 하나."""
+    result = result or Result()
+    t0 = time.perf_counter()
+    conn = storage.connect(db_path)
+    for batch in _chunks(grants, chunk):
+        with conn:
+            applied = _apply_grants(conn, batch, reason)
+        result.applied += applied
+        result.rows += len(batch)
+        if applied < len(batch):
+            result.skipped += len(batch) - applied
+            if len(result.errors) < MAX_ERRORS:
+                result.errors.append(f"없는 유저 {len(batch) - applied}명")
+        if progress:
+            progress(result.rows, None)
+    result.elapsed = time.perf_counter() - t0
+    return result
+
+
+def grant_file(db_path: str, src: str, amount: int | None = None, reason: str = "grant",
+               chunk: int = 1000, progress=None) -> Result:
+    """열: user_id[, amount]. amount 열이 없는 줄은 amount 인자로."""
+    result = Result()
+    with _open(src, "r") as f:
+        return grant(db_path, parse_grants(read_rows(f, is_ndjson(src)), amount, result), reason, chunk, progress, result)
+
+
+# ================== CLI ==================
+
+def _print_progress(done: int, total: int | None):
+    of = f"/{total:,}" if total is not None else ""
+    print(f"\r{done:,}{of}", end="", file=sys.stderr, flush=True)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="casino.db 대량 내보내기 / 가져오기 / 일괄 지급")
+    ap.add_argument("--db", default="casino.db")
+    ap.add_argument("--chunk", type=int, default=1000)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("export")
+    p.add_argument("what", choices=sorted(EXPORTS))
+    p.add_argument("--out", default="-", help=".csv / .ndjson, 뒤에 .gz 가능. 기본 표준출력 (CSV)")
+
+    p = sub.add_parser("import")
+    p.add_argument("what", choices=["users"])
+    p.add_argument("src")
+    p.add_argument("--reason", default="import")
+
+    p = sub.add_parser("grant")
+    p.add_argument("src", nargs="?", help="user_id[,amount] 파일")
+    p.add_argument("--amount", type=int)
+    p.add_argument("--users", help="쉼표로 구분한 user_id (src 대신)")
+    p.add_argument("--reason", default="grant")
+
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    progress = _print_progress if sys.stderr.isatty() else None
+
+    if args.cmd == "export":
+        result = export(args.db, args.what, args.out, args.chunk, progress)
+    elif args.cmd == "import":
+        result = import_users(args.db, args.src, args.chunk, args.reason, progress)
+    elif args.users:
+        if args.amount is None:
+            ap.error("--users 에는 --amount 가 필요해")
+        uids = (int(x) for x in args.users.split(",") if x.strip())
+        result = grant(args.db, ((uid, args.amount) for uid in uids), args.reason, args.chunk, progress)
+    elif args.src:
+        result = grant_file(args.db, args.src, args.amount, args.reason, args.chunk, progress)
+    else:
+        ap.error("grant 에는 파일이나 --users 가 필요해")
+
+    if progress:
+        print(file=sys.stderr)
+    print(result.line(), file=sys.stderr)
+    for e in result.errors:
+        print("  " + e, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
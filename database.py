@@ -1,15 +1,14 @@
-import sqlite3
+import storage
 
 DB_PATH = "vip_casino.db"
 
 def db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return storage.connect(DB_PATH)
 
-def init_db():
-    with db() as conn:
-        conn.executescript("""
+# 스키마 변경은 끝에 단계를 추가한다 (PRAGMA user_version)
+MIGRATIONS = [
+    # 1: 초기 스키마
+    """
         CREATE TABLE IF NOT EXISTS users(
             user_id INTEGER PRIMARY KEY,
             username TEXT,
@@ -66,5 +65,36 @@ def init_db():
             used INTEGER,
             PRIMARY KEY(chat_id,user_id,day)
         );
-        """)
-        conn.commit()
+    """,
+    # 2: economy.place_bet 의 INSERT OR REPLACE 가 기대하는 bets 기본키 (중복은 마지막 것만 남김),
+    #    activity 테이블, 히스토리/랭킹 인덱스
+    """
+        CREATE TABLE bets_v2(
+            chat_id INTEGER,
+            round_id INTEGER,
+            user_id INTEGER,
+            choice TEXT,
+            amount INTEGER,
+            PRIMARY KEY(chat_id, round_id, user_id)
+        );
+        INSERT OR REPLACE INTO bets_v2(chat_id, round_id, user_id, choice, amount)
+            SELECT chat_id, round_id, user_id, choice, amount FROM bets ORDER BY rowid;
+        DROP TABLE bets;
+        ALTER TABLE bets_v2 RENAME TO bets;
+
+        CREATE TABLE IF NOT EXISTS activity(
+            chat_id INTEGER,
+            user_id INTEGER,
+            day TEXT,
+            msg_count INTEGER,
+            rewarded_steps INTEGER,
+            PRIMARY KEY(chat_id,user_id,day)
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_road_chat ON road(chat_id, round_id);
+        CREATE INDEX IF NOT EXISTS idx_users_points ON users(points DESC);
+    """,
+]
+
+def init_db():
+    storage.migrate(db(), MIGRATIONS)
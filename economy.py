@@ -190,16 +190,6 @@ def activity_reward(chat_id, user_id):
     today = datetime.utcnow().strftime("%Y-%m-%d")
 
     with db() as conn:
-        conn.execute("""
-        CREATE TABLE IF NOT EXISTS activity(
-            chat_id INTEGER,
-            user_id INTEGER,
-            day TEXT,
-            msg_count INTEGER,
-            rewarded_steps INTEGER,
-            PRIMARY KEY(chat_id,user_id,day)
-        )
-        """)
         row = conn.execute("""
             SELECT * FROM activity
             WHERE chat_id=? AND user_id=? AND day=?
@@ -0,0 +1,171 @@
+"""
+이벤트 루프 지연(lag) 감시.
+
+루프 안의 작은 태스크가 interval 마다 깨어나면서 예정보다 얼마나 늦었는지 잰다.
+별도 샘플링 스레드는 루프가 threshold 이상 안 깨어나면 루프 스레드의 스택을 떠서
+어느 핸들러의 어느 줄(동기 sqlite / PIL 호출 등)이 루프를 막고 있었는지 기록한다.
+report() 는 누적 지연이 큰 순서로 범인을 보여준다.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+APP_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+LAG_SECONDS = metrics.histogram("loop_lag_seconds", "Event loop scheduling lag")
+STALLS = metrics.counter("loop_stalls", "Event loop stalls over the lag threshold")
+
+
+class Offender:
+    __slots__ = ("count", "total", "max", "stack")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.stack = ""
+
+
+class LoopWatch:
+    def __init__(self, threshold: float = 0.1, interval: float = 0.05,
+                 report_every: float = 600.0, skip: tuple[str, ...] = ()):
+        self.threshold = threshold
+        self.interval = interval
+        self.report_every = report_every
+        # 어트리뷰션에서 건너뛸 범용 래퍼 함수 이름 (예: instrument 의 wrapped, on_text 라우터)
+        self.skip = set(skip)
+
+        self.offenders: dict[tuple[str, str], Offender] = {}
+        self._samples: list[tuple[str, str, str]] = []
+        self._lock = threading.Lock()
+        self._beat = time.monotonic()
+        self._thread_id: int | None = None
+        self._task: asyncio.Task | None = None
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    # ---------- lifecycle ----------
+
+    def start(self):
+        """실행 중인 이벤트 루프 안에서 불러야 한다."""
+        self._thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._tick())
+        self._thread = threading.Thread(target=self._sample, name="loopwatch", daemon=True)
+        self._thread.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # ---------- loop side ----------
+
+    async def _tick(self):
+        last_report = time.monotonic()
+        while True:
+            t0 = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._beat = now
+
+            lag = max(0.0, now - t0 - self.interval)
+            LAG_SECONDS.observe(lag)
+
+            with self._lock:
+                samples, self._samples = self._samples, []
+            if lag >= self.threshold:
+                self._attribute(lag, samples)
+
+            if self.report_every and now - last_report >= self.report_every:
+                last_report = now
+                if self.offenders:
+                    log.warning("event loop stalls:\n%s", "\n".join(self.report(5)))
+
+    def _attribute(self, lag: float, samples: list[tuple[str, str, str]]):
+        if samples:
+            (handler, site), _ = Counter((h, s) for h, s, _ in samples).most_common(1)[0]
+            stack = next(st for h, s, st in reversed(samples) if (h, s) == (handler, site))
+        else:
+            # 샘플 간격보다 짧게 막혔다
+            handler, site, stack = "?", "?", ""
+
+        off = self.offenders.get((handler, site))
+        if off is None:
+            off = self.offenders[(handler, site)] = Offender()
+        off.count += 1
+        off.total += lag
+        off.max = max(off.max, lag)
+        if stack:
+            off.stack = stack
+        STALLS.inc(handler=handler)
+
+    # ---------- sampler thread ----------
+
+    def _sample(self):
+        step = self.interval / 2
+        while not self._stop.wait(step):
+            stalled = time.monotonic() - self._beat - self.interval
+            if stalled < self.threshold:
+                continue
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            sample = self._describe(frame)
+            with self._lock:
+                self._samples.append(sample)
+
+    def _describe(self, frame) -> tuple[str, str, str]:
+        stack = traceback.extract_stack(frame)
+        here = os.path.abspath(__file__)
+
+        # 지금 도는 태스크/콜백의 프레임만 본다 (run_polling 을 부른 main() 같은 바깥쪽은 제외)
+        start = 0
+        for i, f in enumerate(stack):
+            if f.name == "_run" and f.filename.endswith(os.path.join("asyncio", "events.py")):
+                start = i + 1
+
+        app = [
+            f for f in stack[start:]
+            if os.path.abspath(f.filename).startswith(APP_ROOT) and os.path.abspath(f.filename) != here
+        ]
+        if not app:
+            return "?", "?", "".join(traceback.format_list(stack[-8:]))
+
+        handler = next((f.name for f in app if f.name not in self.skip), app[0].name)
+        last = app[-1]
+        site = f"{os.path.basename(last.filename)}:{last.lineno} {last.name}"
+        return handler, site, "".join(traceback.format_list(stack[-12:]))
+
+    # ---------- report ----------
+
+    def report(self, n: int = 10) -> list[str]:
+        ranked = sorted(self.offenders.items(), key=lambda kv: kv[1].total, reverse=True)[:n]
+        lines = []
+        for (handler, site), off in ranked:
+            lines.append(
+                f"{off.total * 1000:.0f}ms total  n={off.count}  max={off.max * 1000:.0f}ms  "
+                f"{handler} @ {site}"
+            )
+        return lines
+
+    def worst_stack(self) -> str:
+        if not self.offenders:
+            return ""
+        return max(self.offenders.values(), key=lambda o: o.total).stack
@@ -1,8 +1,10 @@
 import os
-import sqlite3
-import random
 import asyncio
-import json
+import tempfile
+import time
+import functools
+import logging
+from contextlib import contextmanager
 from io import BytesIO
 from datetime import datetime
 from zoneinfo import ZoneInfo
@@ -15,7 +17,23 @@ from telegram.ext import (
     MessageHandler,
     filters,
 )
-from PIL import Image, ImageDraw, ImageFont
+import backup
+import bulk
+import media
+import metrics
+import odds
+import ratelimit
+import replay
+import rules
+import seeding
+import settlement
+import sqltrace
+import storage
+from loopwatch import LoopWatch
+from store import MIGRATIONS, MemoryStore, SqliteStore, Store, shard_files, shard_path
+from updates import ChatOrderedUpdateProcessor
+
+log = logging.getLogger(__name__)
 
 # ================== CONFIG ==================
 
@@ -45,545 +63,701 @@ PAYOUTS = {"P": 2.0, "B": 1.95, "T": 8.0}
 DICE_ROUND_SECONDS = 20
 DICE_PAYOUT = {"BIG": 2.0, "SMALL": 2.0, "EXACT": 6.0}
 
-SUIT = ["♠", "♥", "♦", "♣"]
-RANK = ["A", "2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K"]
-
 KST = ZoneInfo("Asia/Seoul")
 
+# 관리자 user_id 목록 (쉼표 구분). /metrics 같은 운영 명령용
+ADMIN_IDS = {int(x) for x in os.getenv("ADMIN_IDS", "").replace(" ", "").split(",") if x}
+
+# 0 이면 HTTP 메트릭 엔드포인트를 열지 않는다
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+# 이벤트 루프가 이 이상 늦으면 막은 핸들러/줄을 기록한다. 0 이면 감시 끔
+LOOP_LAG_MS = float(os.getenv("LOOP_LAG_MS", "100"))
+
+# 서로 다른 채팅의 업데이트를 동시에 처리할 개수 (같은 채팅은 항상 순서대로). 1 이면 예전처럼 하나씩
+UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", "32"))
+
+# 1 보다 크면 프론트 1개 + 워커 N개 프로세스로 채팅을 나눠 처리한다 (shard.py)
+SHARDS = int(os.getenv("SHARDS", "1"))
+# 샤드 워커 번호 (shard.py 가 넣는다). None 이면 단일 프로세스 또는 프론트.
+# 워커는 채팅 전용 테이블을 자기 파일(store.shard_path)에 두고, 공용 작업(원장 스냅샷, casino.db 백업)은 0번만 한다
+SHARD_INDEX: int | None = None
+
+# 이 주기(초)마다 원장 기준 잔액 스냅샷을 찍는다. 0 이면 안 찍음
+LEDGER_SNAPSHOT_SECONDS = int(os.getenv("LEDGER_SNAPSHOT_SECONDS", "3600"))
+
+# 이 주기(초)마다 casino.db 온라인 백업을 BACKUP_DIR 에 찍고 최근 BACKUP_KEEP 개만 남긴다 (backup.py). 0 이면 끔
+BACKUP_SECONDS = int(os.getenv("BACKUP_SECONDS", "21600"))
+BACKUP_DIR = os.getenv("BACKUP_DIR", "backups")
+BACKUP_KEEP = int(os.getenv("BACKUP_KEEP", "14"))
+
+# 명령 폭주 막기 (ratelimit.py): 유저/채팅 토큰 버킷. 초당 충전량이 0 이면 그 버킷은 끔
+RATE_USER_PER_SECOND = float(os.getenv("RATE_USER_PER_SECOND", "1"))
+RATE_USER_BURST = float(os.getenv("RATE_USER_BURST", "6"))
+RATE_CHAT_PER_SECOND = float(os.getenv("RATE_CHAT_PER_SECOND", "5"))
+RATE_CHAT_BURST = float(os.getenv("RATE_CHAT_BURST", "30"))
+# 명령별 비용 (없으면 1). 렌더/무거운 조회는 비싸게
+RATE_COSTS = ratelimit.parse_costs(os.getenv("RATE_COSTS", "/road=4,/odds=2,/top=2,/stats=2"))
+# 막힌 유저에게 이 간격에 한 번만 안내한다
+RATE_NOTICE_SECONDS = float(os.getenv("RATE_NOTICE_SECONDS", "10"))
+
+# 정산 이미지 품질 (media.py): auto 면 밀린 렌더/최근 렌더 시간을 보고 full -> lite -> static -> text 로 낮춘다
+# 렌더는 전부 MEDIA_WORKERS 개 스레드에서만 돈다 (동시 렌더 상한)
+MEDIA_TIER = media.parse_tier(os.getenv("MEDIA_TIER", "auto"))
+MEDIA_WORKERS = int(os.getenv("MEDIA_WORKERS", "2"))
+# 정산 하나의 렌더가 이 안에 끝날 것 같은 가장 좋은 단계를 고른다 / 이걸 넘기면 이미지 없이 보낸다
+MEDIA_BUDGET_SECONDS = float(os.getenv("MEDIA_BUDGET_SECONDS", "1.5"))
+MEDIA_DEADLINE_SECONDS = float(os.getenv("MEDIA_DEADLINE_SECONDS", "3"))
+
 
 # ================== DB ==================
 
+# sqlite: casino.db / memory: 프로세스 안 dict (재시작하면 사라짐, 시뮬레이션/벤치용)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sqlite")
+
+# /pool, !dice_pool: 채팅마다 이 간격에 한 번만 보낸다 (사이에 온 요청은 한 번으로 합쳐 간격 끝에)
+POOL_THROTTLE_SECONDS = float(os.getenv("POOL_THROTTLE_SECONDS", "3"))
+
+# 설정하면 새 채팅 시드를 (RNG_SEED, chat_id) 로 고정한다 (벤치/재현용). 운영에선 비워둔다
+RNG_SEED = os.getenv("RNG_SEED") or None
+
+# 1 이면 바카라 핸드를 라운드를 열 때 미리 딜하고 sha256 봉인만 공개한다. 렌더는 베팅 받는 동안 끝내고
+# 마감 때는 정산 쓰기와 전송만 남는다. 원문은 결과 메시지에 공개 (seeding.seal)
+PREDEAL = os.getenv("PREDEAL", "0") == "1"
+
+STORE: Store = SqliteStore(DB_PATH)
+
+
 def db():
-    conn = sqlite3.connect(DB_PATH, timeout=30)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA journal_mode=WAL;")
-    conn.execute("PRAGMA synchronous=NORMAL;")
-    conn.execute("PRAGMA foreign_keys=ON;")
-    return conn
+    # sqlite 전용 (운영 명령 등). 게임 로직은 STORE 를 쓴다
+    return storage.connect(DB_PATH)
+
+
+def owns_chat(chat_id: int) -> bool:
+    import shard
+    return shard.shard_of(chat_id, SHARDS) == SHARD_INDEX
+
+
+def chat_db_path() -> str:
+    """채팅 전용 테이블이 있는 파일 (샤드 워커면 자기 샤드 파일)."""
+    return getattr(STORE, "local_path", None) or DB_PATH
+
+
+def check_shard_layout():
+    # 다른 샤드 수로 만든 파일이 남아 있으면 그 채팅들의 라운드/슈/기록이 안 보인다
+    stale = [path for path, _, n in shard_files(DB_PATH) if n != SHARDS or SHARDS == 1]
+    if stale:
+        raise RuntimeError(
+            f"SHARDS={SHARDS} 와 맞지 않는 샤드 파일이 있습니다 ({', '.join(stale)}). "
+            "python shard.py --merge 로 casino.db 에 합친 뒤 시작하세요."
+        )
 
 
 def init_db():
-    with db() as conn:
-        conn.executescript("""
-        CREATE TABLE IF NOT EXISTS users(
-            user_id INTEGER PRIMARY KEY,
-            username TEXT,
-            points INTEGER NOT NULL
-        );
-
-        CREATE TABLE IF NOT EXISTS rounds(
-            chat_id INTEGER PRIMARY KEY,
-            round_id INTEGER NOT NULL,
-            status TEXT NOT NULL  -- OPEN, CLOSING, CLOSED
-        );
-
-        -- One bet per user per round
-        CREATE TABLE IF NOT EXISTS bets(
-            chat_id INTEGER NOT NULL,
-            round_id INTEGER NOT NULL,
-            user_id INTEGER NOT NULL,
-            choice TEXT NOT NULL,
-            amount INTEGER NOT NULL,
-            PRIMARY KEY(chat_id, round_id, user_id)
-        );
-
-        CREATE TABLE IF NOT EXISTS house(
-            chat_id INTEGER PRIMARY KEY,
-            profit INTEGER DEFAULT 0,
-            rounds INTEGER DEFAULT 0
-        );
-
-        CREATE TABLE IF NOT EXISTS road_history(
-            chat_id INTEGER NOT NULL,
-            round_id INTEGER NOT NULL,
-            result TEXT NOT NULL
-        );
-
-        CREATE TABLE IF NOT EXISTS shoe(
-            chat_id INTEGER PRIMARY KEY,
-            cards TEXT NOT NULL,
-            position INTEGER NOT NULL
-        );
-
-        CREATE TABLE IF NOT EXISTS daily_claims(
-            chat_id INTEGER NOT NULL,
-            user_id INTEGER NOT NULL,
-            day TEXT NOT NULL,
-            PRIMARY KEY(chat_id, user_id, day)
-        );
-
-        CREATE TABLE IF NOT EXISTS spin_claims(
-            chat_id INTEGER NOT NULL,
-            user_id INTEGER NOT NULL,
-            day TEXT NOT NULL,
-            used INTEGER NOT NULL,
-            PRIMARY KEY(chat_id, user_id, day)
-        );
-
-        -- ===== DICE TABLES =====
-        CREATE TABLE IF NOT EXISTS dice_rounds(
-            chat_id INTEGER PRIMARY KEY,
-            round_id INTEGER NOT NULL,
-            status TEXT NOT NULL,  -- OPEN, CLOSING, CLOSED
-            ends_at INTEGER NOT NULL
-        );
-
-        -- One dice bet per user per dice round
-        CREATE TABLE IF NOT EXISTS dice_bets(
-            chat_id INTEGER NOT NULL,
-            round_id INTEGER NOT NULL,
-            user_id INTEGER NOT NULL,
-            bet_type TEXT NOT NULL,     -- BIG, SMALL, EXACT
-            exact_value INTEGER,        -- for EXACT 1~6
-            amount INTEGER NOT NULL,
-            PRIMARY KEY(chat_id, round_id, user_id)
-        );
-
-        CREATE TABLE IF NOT EXISTS dice_history(
-            chat_id INTEGER NOT NULL,
-            round_id INTEGER NOT NULL,
-            dice_value INTEGER NOT NULL,
-            created_at INTEGER NOT NULL
-        );
-        """)
-        conn.commit()
+    global STORE
+    SEEDS.clear()
+    POOLS.clear()
+    SEALED.clear()
+    if STORAGE_BACKEND == "memory":
+        STORE = MemoryStore()
+    elif STORAGE_BACKEND == "sqlite":
+        if SHARD_INDEX is None:
+            STORE = SqliteStore(DB_PATH)
+        else:
+            STORE = SqliteStore(DB_PATH, shard_path(DB_PATH, SHARD_INDEX, SHARDS), owns_chat)
+        STORE.migrate()
+    else:
+        raise RuntimeError(f"알 수 없는 STORAGE_BACKEND: {STORAGE_BACKEND}")
+
+
+# ================== METRICS ==================
+
+HANDLER_SECONDS = metrics.histogram("handler_seconds", "Handler latency per command route")
+HANDLER_ERRORS = metrics.counter("handler_errors", "Handler exceptions per command route")
+SETTLE_PHASE_SECONDS = metrics.histogram("settle_phase_seconds", "Settlement latency per game and phase")
+BETS = metrics.counter("bets", "Accepted bets")
+BET_POINTS = metrics.counter("bet_points", "Points wagered")
+ROUNDS = metrics.counter("rounds", "Settled rounds")
+PAYOUT_POINTS = metrics.counter("payout_points", "Points paid out to players (refunds included)")
+
+
+def _open_rounds():
+    return {(("game", game),): n for game, n in STORE.open_round_counts().items()}
+
+
+metrics.gauge("open_rounds", "Rounds currently accepting bets", fn=_open_rounds)
+metrics.gauge("pending_tasks", "asyncio tasks alive on the event loop", fn=lambda: len(asyncio.all_tasks()))
+BACKUPS = metrics.counter("backups", "Online DB backups by result")
+MEDIA_TIERS = metrics.counter("media_tier", "Settlements per game and chosen media tier")
+metrics.gauge("render_backlog_seconds", "Estimated render seconds queued or running", fn=lambda: MEDIA.backlog)
+metrics.gauge("media_late", "Renders that missed the deadline and went out as text", fn=lambda: MEDIA.late)
+metrics.gauge("render_inflight", "Renders queued or running on the render pool", fn=lambda: MEDIA.inflight)
+metrics.gauge("process_peak_rss_bytes", "Peak resident memory of this process", fn=media.peak_rss)
+
+
+@contextmanager
+def track(route: str):
+    token = sqltrace.current_handler.set(route)
+    t0 = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        HANDLER_ERRORS.inc(handler=route)
+        raise
+    finally:
+        HANDLER_SECONDS.observe(time.perf_counter() - t0, handler=route)
+        sqltrace.current_handler.reset(token)
+
+
+def instrument(route: str, handler):
+    @functools.wraps(handler)
+    async def wrapped(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        if not await admit(update, route):
+            return
+        with track(route):
+            return await handler(update, context)
+    return wrapped
+
+
+# ================== ADMISSION ==================
+
+RATE_LIMITED = metrics.counter("rate_limited", "Commands dropped by the per-user / per-chat token buckets")
+
+# None 이면 안 막는다 (벤치)
+ADMISSION: ratelimit.Admission | None = ratelimit.Admission(
+    ratelimit.Limiter(RATE_USER_PER_SECOND, RATE_USER_BURST),
+    ratelimit.Limiter(RATE_CHAT_PER_SECOND, RATE_CHAT_BURST),
+    RATE_COSTS,
+    RATE_NOTICE_SECONDS,
+)
+
+
+async def admit(update: Update, route: str) -> bool:
+    # DB / 렌더 전에. 막히면 답장 없이 버리고, 안내는 RATE_NOTICE_SECONDS 에 한 번 (ratelimit.Admission.notice)
+    u = update.effective_user
+    chat = update.effective_chat
+    if ADMISSION is None or u is None or chat is None or is_admin(u.id):
+        return True
+    blocked = ADMISSION.check(u.id, chat.id, route)
+    if blocked is None:
+        return True
+    RATE_LIMITED.inc(handler=route, scope=blocked)
+    dropped = ADMISSION.notice(u.id if blocked == "user" else None, chat.id)
+    if dropped is not None:
+        limiter = ADMISSION.user if blocked == "user" else ADMISSION.chat
+        key = u.id if blocked == "user" else chat.id
+        wait = limiter.retry_after(key, ADMISSION.cost(route), time.monotonic())
+        who = "명령이" if blocked == "user" else "이 채팅 명령이"
+        await update.message.reply_text(f"⏳ {who} 너무 많아서 {dropped}개 무시했어. {max(1, round(wait))}초 뒤에 다시 해줘.")
+    return False
+
+
+def is_admin(uid: int) -> bool:
+    return uid in ADMIN_IDS
+
+
+# 래퍼/라우터/타이머는 건너뛰고 실제 핸들러 이름으로 잡는다
+LOOP_WATCH = LoopWatch(
+    threshold=LOOP_LAG_MS / 1000,
+    skip=("wrapped", "on_text", "delayed_settle", "delayed_dice_settle"),
+)
 
 
 # ================== USER ==================
 
 def ensure_user(uid: int, username: str | None):
-    with db() as conn:
-        row = conn.execute("SELECT 1 FROM users WHERE user_id=?", (uid,)).fetchone()
-        if not row:
-            conn.execute(
-                "INSERT INTO users(user_id, username, points) VALUES(?,?,?)",
-                (uid, username or "", STARTING_POINTS)
-            )
-            conn.commit()
+    STORE.ensure_user(uid, username, STARTING_POINTS)
 
 
 def get_points(uid: int) -> int:
-    with db() as conn:
-        r = conn.execute("SELECT points FROM users WHERE user_id=?", (uid,)).fetchone()
-        return int(r["points"]) if r else 0
+    return STORE.get_points(uid)
 
 
-def credit(uid: int, amount: int):
+def credit(uid: int, amount: int, reason: str, chat_id: int | None = None,
+           game: str | None = None, round_id: int | None = None):
     if amount <= 0:
         return
-    with db() as conn:
-        conn.execute("UPDATE users SET points = points + ? WHERE user_id=?", (amount, uid))
-        conn.commit()
+    STORE.credit(uid, amount, reason, chat_id, game, round_id)
 
 
-def try_debit(uid: int, amount: int) -> bool:
+def try_debit(uid: int, amount: int, reason: str, chat_id: int | None = None,
+              game: str | None = None, round_id: int | None = None) -> bool:
     if amount <= 0:
         return False
-    with db() as conn:
-        cur = conn.execute(
-            "UPDATE users SET points = points - ? WHERE user_id=? AND points >= ?",
-            (amount, uid, amount)
-        )
-        conn.commit()
-        return cur.rowcount == 1
+    return STORE.try_debit(uid, amount, reason, chat_id, game, round_id)
 
 
-# ================== SHOE ==================
+# ================== SEEDS ==================
+
+# chat_id -> 마스터 시드. 한 번 정해지면 안 바뀌어서 프로세스 안에 들고 있는다
+SEEDS: dict[int, str] = {}
+
+
+def chat_seed(chat_id: int) -> str:
+    seed = SEEDS.get(chat_id)
+    if seed is None:
+        seed = SEEDS[chat_id] = STORE.ensure_seed(chat_id, seeding.new_seed(RNG_SEED, chat_id))
+    return seed
 
-def card_value(rank: str) -> int:
-    if rank == "A":
-        return 1
-    if rank in ["10", "J", "Q", "K"]:
-        return 0
-    return int(rank)
 
+# ================== SHOE ==================
 
-def create_shoe():
-    deck = []
-    for _ in range(8):
-        for s in SUIT:
-            for r in RANK:
-                deck.append((r, s))
-    random.shuffle(deck)
-    return deck
+def create_shoe(chat_id: int):
+    seed = chat_seed(chat_id)
+    return seeding.shoe(seed, STORE.next_shoe(chat_id))
 
 
 def get_shoe(chat_id: int):
-    with db() as conn:
-        row = conn.execute("SELECT * FROM shoe WHERE chat_id=?", (chat_id,)).fetchone()
-        if not row:
-            deck = create_shoe()
-            conn.execute(
-                "INSERT INTO shoe(chat_id, cards, position) VALUES(?,?,?)",
-                (chat_id, json.dumps(deck), 0)
-            )
-            conn.commit()
-            return deck, 0
-        return json.loads(row["cards"]), int(row["position"])
+    shoe = STORE.load_shoe(chat_id)
+    if shoe is None:
+        deck = create_shoe(chat_id)
+        STORE.save_shoe(chat_id, deck, 0)
+        return deck, 0
+    return shoe
+
+
+# chat_id -> 남은 카드 값별 장수 (/odds 용). 재시작 뒤엔 첫 draw / 조회 때 슈에서 다시 센다
+SHOE_COUNTS: dict[int, odds.ShoeCounts] = {}
 
 
 def draw_card(chat_id: int):
     deck, pos = get_shoe(chat_id)
-    if pos >= len(deck) - 6:
-        deck = create_shoe()
+    counts = SHOE_COUNTS.get(chat_id)
+    if pos >= len(deck) - rules.CUT_RESERVE:
+        deck = create_shoe(chat_id)
         pos = 0
+        counts = None
+    if counts is None:
+        counts = SHOE_COUNTS[chat_id] = odds.ShoeCounts(deck, pos)
     card = deck[pos]
     pos += 1
-    with db() as conn:
-        conn.execute(
-            "UPDATE shoe SET cards=?, position=? WHERE chat_id=?",
-            (json.dumps(deck), pos, chat_id)
-        )
-        conn.commit()
+    counts.take(card)
+    STORE.save_shoe(chat_id, deck, pos)
     return card
 
 
+def shoe_counts(chat_id: int) -> odds.ShoeCounts:
+    counts = SHOE_COUNTS.get(chat_id)
+    if counts is None:
+        counts = SHOE_COUNTS[chat_id] = odds.ShoeCounts(*get_shoe(chat_id))
+    return counts
+
+
 # ================== BACCARAT ENGINE ==================
 
 def play_baccarat(chat_id: int):
-    player = [draw_card(chat_id), draw_card(chat_id)]
-    banker = [draw_card(chat_id), draw_card(chat_id)]
+    return rules.deal(lambda: draw_card(chat_id))
+
+
+# ================== BACKGROUND TASKS ==================
+
+# 기다리지 않고 띄운 태스크. 참조를 잡아둬야 도는 중에 GC 되지 않고, 실패도 여기서 로그로 남긴다
+BACKGROUND: set[asyncio.Task] = set()
+
+
+def spawn(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    BACKGROUND.add(task)
+    task.add_done_callback(_background_done)
+    return task
+
+
+def _background_done(task: asyncio.Task):
+    BACKGROUND.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        log.error("background task %s failed", task.get_coro().__qualname__, exc_info=task.exception())
+
+
+# ================== LIVE ODDS ==================
+
+# chat_id -> 다음 판 (P, B, T) 확률. 라운드가 끝날 때마다 스레드에서 다시 계산한다
+LIVE_ODDS: dict[int, tuple[float, float, float]] = {}
+
+
+def odds_key(chat_id: int) -> tuple[tuple[int, ...], int]:
+    # 봉인된 핸드가 있으면 그 카드를 빼기 전 구성으로 (빠진 카드로 핸드를 짐작할 수 없게)
+    seal = open_seal(chat_id)
+    return seal.odds_key if seal is not None else shoe_counts(chat_id).key()
+
+
+async def refresh_odds(chat_id: int):
+    # 열거는 수십 ms 라 루프 밖에서. 같은 구성은 odds.next_hand 캐시가 받는다
+    key = odds_key(chat_id)
+    LIVE_ODDS[chat_id] = await asyncio.to_thread(odds.next_hand, *key)
+
+
+# ================== PREDEAL ==================
+
+class Sealed:
+    __slots__ = ("round_id", "hand", "shoe_no", "shoe_pos", "text", "commitment", "odds_key",
+                 "tier", "reveal", "road", "road_img", "broken")
+
+    def __init__(self, round_id, hand, shoe_no, shoe_pos, text, commitment, odds_key):
+        self.round_id = round_id
+        self.hand = hand  # (player, banker, p, b)
+        self.shoe_no = shoe_no
+        self.shoe_pos = shoe_pos
+        self.text = text
+        self.commitment = commitment
+        self.odds_key = odds_key
+        # 미리 렌더 (prerender). 재시작으로 복원한 봉인은 마감 때 렌더한다
+        self.tier = None
+        self.reveal = None
+        self.road = None
+        self.road_img = None
+        # 재시작 뒤 다시 뽑은 카드가 봉인과 다르다 -> 마감 때 정산하지 않고 무효
+        self.broken = False
+
+
+# chat_id -> 지금 열린 바카라 라운드의 봉인. 재시작 뒤엔 round_seals 에서 다시 만든다
+SEALED: dict[int, Sealed] = {}
+
+
+def predeal(chat_id: int, round_id: int) -> Sealed | None:
+    deck, shoe_pos = get_shoe(chat_id)
+    shoe_no = STORE.shoe_number(chat_id)
+    if shoe_no is None:
+        # 시드 전 슈는 재시작 뒤 다시 만들 수 없으니 예전처럼 마감 때 딘다
+        return None
+    key = shoe_counts(chat_id).key()
+    hand = play_baccarat(chat_id)
+    nonce, text, commitment = seeding.seal(chat_id, round_id, hand[0], hand[1])
+    STORE.save_seal(chat_id, round_id, shoe_no, shoe_pos, nonce, commitment)
+    seal = SEALED[chat_id] = Sealed(round_id, hand, shoe_no, shoe_pos, text, commitment, key)
+    prerender(chat_id, seal)
+    return seal
+
+
+def prerender(chat_id: int, seal: Sealed):
+    # 베팅 받는 동안 렌더 스레드에서. 빅로드는 지금 기록 + 이번 결과 (라운드는 채팅당 하나씩이라 마감 때와 같다)
+    player, banker, p, b = seal.hand
+    result = rules.winner(p, b)
+    tier = seal.tier = MEDIA.pick("baccarat")
+    MEDIA_TIERS.inc(game="baccarat", tier=media.TIER_NAMES[tier])
+    seal.road = build_road(chat_id) + [result]
+    if tier != media.TEXT:
+        seal.reveal = MEDIA.submit("reveal", tier, make_reveal_gif, player, banker, p, b, result, tier)
+    if tier in (media.FULL, media.LITE):
+        seal.road_img = MEDIA.submit("road", tier, draw_road_image_bytes, chat_id, seal.road)
+
+
+def sealed_hand(chat_id: int, round_id: int) -> Sealed | None:
+    seal = SEALED.get(chat_id)
+    if seal is not None and seal.round_id == round_id:
+        return seal
+    row = STORE.get_seal(chat_id, round_id)
+    if row is None:
+        return None
+    # 재시작: 시드와 딜 시작 위치로 같은 카드를 다시 뽑는다 (replay.py 와 같은 규칙)
+    shoe_no, shoe_pos, nonce, commitment = row
+    seed = chat_seed(chat_id)
+    hand = replay.Shoes(seed).deal(shoe_no, shoe_pos)
+    _, text, check = seeding.seal(chat_id, round_id, hand[0], hand[1], nonce)
+    key = odds.ShoeCounts(seeding.shoe(seed, shoe_no), shoe_pos).key()
+    seal = SEALED[chat_id] = Sealed(round_id, hand, shoe_no, shoe_pos, text, commitment, key)
+    if check != commitment:
+        log.error("seal mismatch chat=%s round=%s", chat_id, round_id)
+        seal.broken = True
+    return seal
+
+
+def open_seal(chat_id: int) -> Sealed | None:
+    # 열린 라운드의 봉인 (/odds 용). 메모리에 없으면 재시작 직후일 수 있어서 DB 도 본다
+    seal = SEALED.get(chat_id)
+    if seal is not None or not PREDEAL:
+        return seal
+    r = STORE.get_round(chat_id)
+    if not r or r["status"] != "OPEN":
+        return None
+    return sealed_hand(chat_id, int(r["round_id"]))
+
+
+# ================== BET POOL ==================
+
+class BetPool:
+    """라운드 하나의 선택별 (베팅 수, 합계). 베팅을 받을 때 더하고 /pool 은 여기서만 읽는다."""
+
+    __slots__ = ("round_id", "totals")
+
+    def __init__(self, round_id: int):
+        self.round_id = round_id
+        self.totals: dict[str, tuple[int, int]] = {}
+
+    def add(self, key: str, amount: int, n: int = 1):
+        count, total = self.totals.get(key, (0, 0))
+        self.totals[key] = (count + n, total + amount)
+
 
-    def total(hand):
-        return sum(card_value(r) for r, _ in hand) % 10
+# (game, chat_id) -> 지금 라운드 풀. 재시작 뒤엔 처음 볼 때 bets / dice_bets 에서 다시 센다
+POOLS: dict[tuple[str, int], BetPool] = {}
+POOL_LAST_SENT: dict[int, float] = {}
+POOL_PENDING: dict[int, asyncio.Task] = {}
 
-    p = total(player)
-    b = total(banker)
 
-    # natural
-    if p in (8, 9) or b in (8, 9):
-        return player, banker, p, b
+def dice_key(bet_type: str, exact_value: int | None) -> str:
+    return f"EXACT({exact_value})" if bet_type == "EXACT" else bet_type
 
-    third = None
-    if p <= 5:
-        third = draw_card(chat_id)
-        player.append(third)
-        p = total(player)
 
-    if third is None:
-        if b <= 5:
-            banker.append(draw_card(chat_id))
-            b = total(banker)
+def bet_pool(game: str, chat_id: int, round_id: int) -> BetPool:
+    pool = POOLS.get((game, chat_id))
+    if pool is not None and pool.round_id == round_id:
+        return pool
+    pool = POOLS[(game, chat_id)] = BetPool(round_id)
+    if game == "baccarat":
+        for choice, n, total in STORE.bet_pool(chat_id, round_id):
+            pool.add(choice, total, n)
     else:
-        v = card_value(third[0])
-        if (
-            b <= 2 or
-            (b == 3 and v != 8) or
-            (b == 4 and 2 <= v <= 7) or
-            (b == 5 and 4 <= v <= 7) or
-            (b == 6 and 6 <= v <= 7)
-        ):
-            banker.append(draw_card(chat_id))
-            b = total(banker)
+        for bet_type, exact_value, n, total in STORE.dice_bet_pool(chat_id, round_id):
+            pool.add(dice_key(bet_type, exact_value), total, n)
+    return pool
 
-    return player, banker, p, b
+
+def pool_add(game: str, chat_id: int, round_id: int, key: str, amount: int):
+    # 베팅이 이미 저장된 뒤에 부른다. 풀이 없으면 테이블에서 다시 세니 (이 베팅 포함) 더하지 않는다
+    pool = POOLS.get((game, chat_id))
+    if pool is None or pool.round_id != round_id:
+        bet_pool(game, chat_id, round_id)
+    else:
+        pool.add(key, amount)
+
+
+def pool_reset(game: str, chat_id: int, round_id: int | None = None):
+    if round_id is None:
+        POOLS.pop((game, chat_id), None)
+    else:
+        POOLS[(game, chat_id)] = BetPool(round_id)
+
+
+def _pool_lines(title: str, pool: BetPool, keys) -> list[str]:
+    total = sum(t for _, t in pool.totals.values())
+    lines = [f"{title}  총 {total:,}"]
+    for key, label in keys:
+        n, amount = pool.totals.get(key, (0, 0))
+        share = amount / total * 100 if total else 0.0
+        lines.append(f"  {label}: {amount:,} ({n}명, {share:.0f}%)")
+    return lines
+
+
+def pool_text(chat_id: int) -> str:
+    lines = []
+    r = STORE.get_round(chat_id)
+    if r and r["status"] == "OPEN":
+        pool = bet_pool("baccarat", chat_id, int(r["round_id"]))
+        lines += _pool_lines(f"🃏 바카라 라운드 {pool.round_id}", pool, BET_CHOICES.items())
+    d = get_dice_state(chat_id)
+    if d and d["status"] == "OPEN":
+        pool = bet_pool("dice", chat_id, int(d["round_id"]))
+        keys = [("BIG", "BIG"), ("SMALL", "SMALL")]
+        keys += [(k, k) for k in sorted(pool.totals) if k.startswith("EXACT")]
+        lines += _pool_lines(f"🎲 다이스 라운드 {pool.round_id}", pool, keys)
+    return "\n".join(lines) or "열려있는 라운드가 없어."
+
+
+async def send_pool(bot, chat_id: int):
+    """채팅마다 POOL_THROTTLE_SECONDS 에 한 번. 그 사이 요청은 예약 하나로 합쳐 그때 최신 값으로 보낸다."""
+    if chat_id in POOL_PENDING:
+        return
+    wait = POOL_LAST_SENT.get(chat_id, float("-inf")) + POOL_THROTTLE_SECONDS - time.monotonic()
+    if wait > 0:
+        POOL_PENDING[chat_id] = asyncio.create_task(_send_pool_later(bot, chat_id, wait))
+        return
+    POOL_LAST_SENT[chat_id] = time.monotonic()
+    await bot.send_message(chat_id, pool_text(chat_id))
+
+
+async def _send_pool_later(bot, chat_id: int, wait: float):
+    try:
+        await asyncio.sleep(wait)
+        POOL_LAST_SENT[chat_id] = time.monotonic()
+        await bot.send_message(chat_id, pool_text(chat_id))
+    except Exception:
+        log.exception("pool send failed chat=%s", chat_id)
+    finally:
+        POOL_PENDING.pop(chat_id, None)
 
 
 # ================== BIG ROAD ==================
 
 def build_road(chat_id: int):
-    with db() as conn:
-        rows = conn.execute(
-            "SELECT result FROM road_history WHERE chat_id=? ORDER BY round_id",
-            (chat_id,)
-        ).fetchall()
-    return [r["result"] for r in rows]
-
-
-def draw_road_image_bytes(chat_id: int) -> BytesIO:
-    results = build_road(chat_id)
-    MAX_RESULTS = 200
-    if len(results) > MAX_RESULTS:
-        results = results[-MAX_RESULTS:]
-
-    cell = 30
-    cols = 40
-    img = Image.new("RGB", (cols * cell, 6 * cell + 20), "#111")
-    draw = ImageDraw.Draw(img)
-
-    col = -1
-    row = 0
-    last = None
-
-    for r in results:
-        if r == "T":
-            continue
-        if r != last:
-            col += 1
-            row = 0
-        if col >= cols:
-            break
-
-        x0 = col * cell + 5
-        y0 = row * cell + 5
-        x1 = x0 + 20
-        y1 = y0 + 20
-        color = "#1f4fff" if r == "P" else "#ff2a2a"
-        draw.ellipse([x0, y0, x1, y1], fill=color)
-        row += 1
-        last = r
-
-    bio = BytesIO()
-    bio.name = f"road_{chat_id}.png"
-    img.save(bio, format="PNG")
-    bio.seek(0)
-    return bio
-
-
-# ================== CARD REVEAL GIF (NO TTF DEPENDENCY) ==================
-
-def make_reveal_gif(player, banker, p, b, result) -> BytesIO:
-    """
-    truetype 폰트가 없어도 '무조건' 카드 랭크/무늬가 보이게:
-    - 텍스트는 load_default()로 찍은 뒤 NEAREST 확대(픽셀처럼 크게)
-    - 무늬(♠♥♦♣)는 폰트가 아니라 도형으로 직접 그림
-    """
-    W, H = 900, 520
-    bg = "#0b1220"
-    table = "#0f2a1c"
-
-    base_font = ImageFont.load_default()
-
-    def draw_big_text(img: Image.Image, x: int, y: int, text: str, scale: int = 6, fill="#111111"):
-        tmp = Image.new("RGBA", (260, 90), (0, 0, 0, 0))
-        d = ImageDraw.Draw(tmp)
-        d.text((0, 0), text, font=base_font, fill=fill)
-        tmp = tmp.resize((tmp.size[0] * scale, tmp.size[1] * scale), resample=Image.NEAREST)
-        img.paste(tmp, (x, y), tmp)
-
-    def draw_suit(draw: ImageDraw.ImageDraw, cx: int, cy: int, suit: str):
-        red = suit in ("♥", "♦")
-        color = "#ef4444" if red else "#111111"
-
-        if suit == "♦":
-            pts = [(cx, cy - 26), (cx + 22, cy), (cx, cy + 26), (cx - 22, cy)]
-            draw.polygon(pts, fill=color)
-
-        elif suit == "♥":
-            draw.ellipse([cx - 22, cy - 24, cx, cy - 2], fill=color)
-            draw.ellipse([cx, cy - 24, cx + 22, cy - 2], fill=color)
-            draw.polygon([(cx - 24, cy - 8), (cx + 24, cy - 8), (cx, cy + 30)], fill=color)
-
-        elif suit == "♣":
-            draw.ellipse([cx - 10, cy - 34, cx + 10, cy - 14], fill=color)
-            draw.ellipse([cx - 26, cy - 16, cx - 6, cy + 4], fill=color)
-            draw.ellipse([cx + 6, cy - 16, cx + 26, cy + 4], fill=color)
-            draw.polygon([(cx - 6, cy + 4), (cx + 6, cy + 4), (cx, cy + 30)], fill=color)
-
-        elif suit == "♠":
-            draw.ellipse([cx - 22, cy - 4, cx, cy + 18], fill=color)
-            draw.ellipse([cx, cy - 4, cx + 22, cy + 18], fill=color)
-            draw.polygon([(cx - 24, cy + 10), (cx + 24, cy + 10), (cx, cy - 26)], fill=color)
-            draw.polygon([(cx - 6, cy + 18), (cx + 6, cy + 18), (cx, cy + 44)], fill=color)
-
-    def base_frame(title_text=None, highlight=None):
-        img = Image.new("RGB", (W, H), bg)
-        draw = ImageDraw.Draw(img)
-
-        draw.rounded_rectangle([30, 40, W - 30, H - 40], radius=30, fill=table, outline="#1f2937", width=4)
-        draw_big_text(img, 55, 55, "PLAYER", scale=5, fill="#60a5fa")
-        draw_big_text(img, W - 275, 55, "BANKER", scale=5, fill="#fb7185")
-
-        if title_text:
-            draw_big_text(img, W // 2 - 130, 58, title_text, scale=4, fill="#fbbf24")
-
-        if highlight == "P":
-            draw.rounded_rectangle([40, 45, W // 2 - 20, H - 50], radius=28, outline="#60a5fa", width=6)
-        elif highlight == "B":
-            draw.rounded_rectangle([W // 2 + 20, 45, W - 40, H - 50], radius=28, outline="#fb7185", width=6)
-        elif highlight == "T":
-            draw_big_text(img, W // 2 - 30, 410, "TIE", scale=6, fill="#fbbf24")
-
-        return img, draw
-
-    def draw_card_face(img: Image.Image, draw: ImageDraw.ImageDraw, x: int, y: int, r: str, s: str, face_up=True):
-        cw, ch = 110, 155
-        if face_up:
-            draw.rounded_rectangle([x, y, x + cw, y + ch], radius=12, fill="#f8fafc", outline="#94a3b8", width=3)
-            draw_big_text(img, x + 10, y + 8, str(r), scale=7, fill="#111111")
-            draw_suit(draw, x + 34, y + 90, s)
-        else:
-            draw.rounded_rectangle([x, y, x + cw, y + ch], radius=12, fill="#1e293b", outline="#64748b", width=3)
-            for i in range(0, cw, 12):
-                draw.line([x + i, y, x, y + i], fill="#334155", width=2)
-                draw.line([x + cw - i, y + ch, x + cw, y + ch - i], fill="#334155", width=2)
-
-    px0, py0 = 70, 130
-    bx0, by0 = W - 70 - (110 * 3 + 20 * 2), 130
-    gap = 20
-
-    reveal_steps = []
-    if len(player) >= 1: reveal_steps.append(("P", 0))
-    if len(banker) >= 1: reveal_steps.append(("B", 0))
-    if len(player) >= 2: reveal_steps.append(("P", 1))
-    if len(banker) >= 2: reveal_steps.append(("B", 1))
-    if len(player) >= 3: reveal_steps.append(("P", 2))
-    if len(banker) >= 3: reveal_steps.append(("B", 2))
-
-    frames, durations = [], []
-    shown_p, shown_b = set(), set()
-
-    # frame 0: all back
-    img, draw = base_frame("Revealing...", None)
-    for i in range(3):
-        if i < len(player):
-            draw_card_face(img, draw, px0 + i * (110 + gap), py0, "?", "♠", face_up=False)
-        if i < len(banker):
-            draw_card_face(img, draw, bx0 + i * (110 + gap), by0, "?", "♠", face_up=False)
-    frames.append(img)
-    durations.append(500)
-
-    # reveal one by one
-    for side, idx in reveal_steps:
-        (shown_p if side == "P" else shown_b).add(idx)
-
-        img, draw = base_frame("Revealing...", None)
-
-        for i in range(len(player)):
-            r, s = player[i]
-            draw_card_face(img, draw, px0 + i * (110 + gap), py0, r, s, face_up=(i in shown_p))
-
-        for i in range(len(banker)):
-            r, s = banker[i]
-            draw_card_face(img, draw, bx0 + i * (110 + gap), by0, r, s, face_up=(i in shown_b))
-
-        draw_big_text(img, 55, 320, f"TOTAL: {p}", scale=5, fill="#e2e8f0")
-        draw_big_text(img, W - 270, 320, f"TOTAL: {b}", scale=5, fill="#e2e8f0")
-
-        frames.append(img)
-        durations.append(450)
-
-    # final frame
-    highlight = result if result in ("P", "B") else "T"
-    img, draw = base_frame("RESULT", highlight)
-
-    for i in range(len(player)):
-        r, s = player[i]
-        draw_card_face(img, draw, px0 + i * (110 + gap), py0, r, s, face_up=True)
-
-    for i in range(len(banker)):
-        r, s = banker[i]
-        draw_card_face(img, draw, bx0 + i * (110 + gap), by0, r, s, face_up=True)
-
-    draw_big_text(img, 55, 320, f"TOTAL: {p}", scale=5, fill="#e2e8f0")
-    draw_big_text(img, W - 270, 320, f"TOTAL: {b}", scale=5, fill="#e2e8f0")
-    draw_big_text(img, W // 2 - 200, 410, f"RESULT: {BET_CHOICES.get(result, result)}", scale=5, fill="#fbbf24")
-
-    frames.append(img)
-    durations.append(1400)
-
-    bio = BytesIO()
-    bio.name = "reveal.gif"
-    frames[0].save(
-        bio,
-        format="GIF",
-        save_all=True,
-        append_images=frames[1:],
-        duration=durations,
-        loop=0,
-        disposal=2,
-    )
-    bio.seek(0)
-    return bio
+    return STORE.road_history(chat_id)
 
 
-# ================== BACCARAT SETTLEMENT ==================
+def draw_road_image_bytes(chat_id: int, results: list[str] | None = None) -> BytesIO:
+    if results is None:
+        results = build_road(chat_id)
+    return _render().draw_road_image_bytes(results, f"road_{chat_id}.png")
 
-async def settle_round(app: Application, chat_id: int, round_id: int):
-    # guard: settle only once
-    with db() as conn:
-        r = conn.execute(
-            "SELECT status FROM rounds WHERE chat_id=? AND round_id=?",
-            (chat_id, round_id)
-        ).fetchone()
-        if not r or r["status"] != "OPEN":
-            return
-        conn.execute("UPDATE rounds SET status='CLOSING' WHERE chat_id=? AND round_id=?", (chat_id, round_id))
-        conn.commit()
 
-    player, banker, p, b = play_baccarat(chat_id)
+# ================== RENDERING ==================
+
+def _render():
+    # PIL 은 첫 렌더 때 import 한다. 시작 직후엔 on_startup 이 백그라운드에서 미리 데워둔다
+    import render
+    return render
+
+
+def warm_render():
+    _render().warm()
+
+
+MEDIA = media.Controller(MEDIA_WORKERS, MEDIA_BUDGET_SECONDS, MEDIA_DEADLINE_SECONDS, MEDIA_TIER)
+
 
-    if p > b:
-        result = "P"
-    elif b > p:
-        result = "B"
+def make_reveal_gif(player, banker, p, b, result, tier: int = media.FULL) -> BytesIO:
+    # STATIC 은 GIF 대신 결과 PNG 한 장 (.png 이름으로 send_photo)
+    label = BET_CHOICES.get(result, result)
+    if tier == media.STATIC:
+        return _render().make_result_png(player, banker, p, b, result, label)
+    return _render().make_reveal_gif(player, banker, p, b, result, label, lite=tier == media.LITE)
+
+
+def render_job(wanted: bool, kind: str, tier: int, fn, *args) -> asyncio.Task | None:
+    # 렌더 스레드에 바로 넣고 (이어지는 동기 DB 작업과 겹친다) 기다릴 Task 를 돌려준다. 필요 없는 단계면 None
+    if not wanted:
+        return None
+    return asyncio.create_task(MEDIA.wait(MEDIA.submit(kind, tier, fn, *args), kind, tier))
+
+
+async def send_media(bot, chat_id: int, bio: BytesIO):
+    if bio.name.endswith(".png"):
+        await bot.send_photo(chat_id, photo=bio)
     else:
-        result = "T"
-
-    with db() as conn:
-        bets = conn.execute(
-            "SELECT * FROM bets WHERE chat_id=? AND round_id=?",
-            (chat_id, round_id)
-        ).fetchall()
-
-    total_bet = 0
-    total_payout = 0
-    lines = [f"🎲 결과: {BET_CHOICES.get(result, result)}  (P:{p} / B:{b})"]
-
-    for bet in bets:
-        uid = int(bet["user_id"])
-        choice = bet["choice"]
-        amt = int(bet["amount"])
-        total_bet += amt
-
-        if result == "T":
-            if choice == "T":
-                payout = int(amt * PAYOUTS["T"])
-                credit(uid, payout)
-                total_payout += payout
-                lines.append(f"🎯 {uid} +{payout}")
-            else:
-                # refund and count in payout for correct house accounting
-                credit(uid, amt)
-                total_payout += amt
-                lines.append(f"↩️ {uid} 환급 +{amt}")
-            continue
-
-        if choice == result:
-            payout = int(amt * PAYOUTS[result])
-            credit(uid, payout)
-            total_payout += payout
-            lines.append(f"✅ {uid} +{payout}")
-        else:
-            lines.append(f"❌ {uid} -{amt}")
-
-    with db() as conn:
-        row = conn.execute("SELECT * FROM house WHERE chat_id=?", (chat_id,)).fetchone()
-        if not row:
-            conn.execute("INSERT INTO house(chat_id, profit, rounds) VALUES(?,?,?)", (chat_id, 0, 0))
-            profit = 0
-            rounds = 0
-        else:
-            profit = int(row["profit"])
-            rounds = int(row["rounds"])
+        await bot.send_animation(chat_id, animation=bio)
 
-        profit += (total_bet - total_payout)
-        rounds += 1
 
-        conn.execute("UPDATE house SET profit=?, rounds=? WHERE chat_id=?", (profit, rounds, chat_id))
-        conn.execute("INSERT INTO road_history(chat_id, round_id, result) VALUES(?,?,?)", (chat_id, round_id, result))
-        conn.execute("DELETE FROM bets WHERE chat_id=? AND round_id=?", (chat_id, round_id))
-        conn.execute("UPDATE rounds SET status='CLOSED' WHERE chat_id=? AND round_id=?", (chat_id, round_id))
-        conn.commit()
+# ================== BACCARAT SETTLEMENT ==================
 
-    # 1) reveal gif
-    reveal_gif = make_reveal_gif(player, banker, p, b, result)
-    await app.bot.send_animation(chat_id, animation=reveal_gif)
+def baccarat_lines(outcome: settlement.Outcome):
+    for uid, choice, _, amt, payout, kind in outcome.rows():
+        if kind == settlement.REFUND:
+            yield f"↩️ {uid} 환급 +{amt}"
+        elif kind == settlement.LOSE:
+            yield f"❌ {uid} -{amt}"
+        elif choice == "T":
+            yield f"🎯 {uid} +{payout}"
+        else:
+            yield f"✅ {uid} +{payout}"
 
-    # 2) big road
-    road_img = draw_road_image_bytes(chat_id)
-    await app.bot.send_photo(chat_id, photo=road_img)
+
+async def settle_round(app: Application, chat_id: int, round_id: int):
+    # guard: settle only once
+    if not STORE.claim_round(chat_id, round_id):
+        return
+
+    seal = sealed_hand(chat_id, round_id)
+    if seal is not None and seal.broken:
+        SEALED.pop(chat_id, None)
+        await void_round(app, chat_id, round_id, seal)
+        return
+    if seal is not None:
+        # PREDEAL: 라운드를 열 때 딘 핸드
+        SEALED.pop(chat_id, None)
+        player, banker, p, b = seal.hand
+        shoe_no, shoe_pos = seal.shoe_no, seal.shoe_pos
+    else:
+        with SETTLE_PHASE_SECONDS.time(game="baccarat", phase="deal"):
+            # replay.py 가 같은 카드를 다시 뽑을 수 있게 딜 시작 위치를 같이 남긴다
+            shoe_pos = get_shoe(chat_id)[1]
+            shoe_no = STORE.shoe_number(chat_id)
+            player, banker, p, b = play_baccarat(chat_id)
+
+    result = rules.winner(p, b)
+
+    # 렌더는 MEDIA 스레드에서. 단계는 지금 밀린 렌더 양으로 고르고, 늦으면 이미지 없이 텍스트로 대신한다.
+    # 공개 GIF 는 카드만 있으면 되니 정산 DB 쓰기 전에 시작하고, 빅로드는 이번 결과가 기록된 뒤 시작한다.
+    # 보내는 순서는 그대로 (공개 -> 로드 -> 텍스트): 공개가 끝나면 로드를 기다리지 않고 바로 보낸다
+    if seal is not None and seal.tier is not None:
+        tier = seal.tier
+        reveal_job = asyncio.create_task(MEDIA.wait(seal.reveal, "reveal", tier)) if seal.reveal else None
+    else:
+        tier = MEDIA.pick("baccarat")
+        MEDIA_TIERS.inc(game="baccarat", tier=media.TIER_NAMES[tier])
+        reveal_job = render_job(tier != media.TEXT, "reveal", tier, make_reveal_gif,
+                                player, banker, p, b, result, tier)
+    road_job = None
+    try:
+        t_db = time.perf_counter()
+        user_ids, choices, amounts = STORE.bet_columns(chat_id, round_id)
+        db_elapsed = time.perf_counter() - t_db
+
+        with SETTLE_PHASE_SECONDS.time(game="baccarat", phase="compute"):
+            outcome = settlement.settle_baccarat(user_ids, choices, amounts, result, PAYOUTS)
+            credits = outcome.credits()
+            stats = outcome.stats()
+
+        # 지급/하우스/로드/베팅 정리/마감을 한 번에
+        t_db = time.perf_counter()
+        STORE.settle_baccarat(chat_id, round_id, result, credits, outcome.total_bet - outcome.total_payout,
+                              shoe_no=shoe_no, shoe_pos=shoe_pos, stats=stats)
+        pool_reset("baccarat", chat_id)
+        road = seal.road if seal is not None and seal.road is not None else build_road(chat_id)
+        db_elapsed += time.perf_counter() - t_db
+        SETTLE_PHASE_SECONDS.observe(db_elapsed, game="baccarat", phase="db")
+        ROUNDS.inc(game="baccarat")
+        PAYOUT_POINTS.inc(outcome.total_payout, game="baccarat")
+        spawn(refresh_odds(chat_id))
+
+        if seal is not None and seal.road_img is not None:
+            road_job = asyncio.create_task(MEDIA.wait(seal.road_img, "road", tier))
+        else:
+            road_job = render_job(tier in (media.FULL, media.LITE), "road", tier, draw_road_image_bytes,
+                                  chat_id, road)
+
+        # 렌더를 기다리는 동안 텍스트를 만든다 (3500자 넘는 줄은 만들지도 않는다)
+        head = f"🎲 결과: {BET_CHOICES.get(result, result)}  (P:{p} / B:{b})"
+        body = settlement.clip_text(baccarat_lines(outcome))
+        extra = []
+        opened = [f"🔓 봉인 공개: {seal.text}", f"sha256 = {seal.commitment}"] if seal is not None else []
+
+        # 1) reveal gif
+        with SETTLE_PHASE_SECONDS.time(game="baccarat", phase="render_gif"):
+            reveal_gif = await reveal_job if reveal_job else None
+        if reveal_gif is not None:
+            with SETTLE_PHASE_SECONDS.time(game="baccarat", phase="send_gif"):
+                await send_media(app.bot, chat_id, reveal_gif)
+        else:
+            extra.append(media.cards_text(player, banker, p, b))
+
+        # 2) big road
+        with SETTLE_PHASE_SECONDS.time(game="baccarat", phase="render_road"):
+            road_img = await road_job if road_job else None
+        if road_img is not None:
+            with SETTLE_PHASE_SECONDS.time(game="baccarat", phase="send_road"):
+                await app.bot.send_photo(chat_id, photo=road_img)
+        elif road:
+            extra.append(media.bead_road_text(road))
+    finally:
+        for job in (reveal_job, road_job):
+            if job and not job.done():
+                job.cancel()
 
     # 3) settlement text
-    msg = "\n".join(lines)
-    if len(msg) > 3500:
-        msg = msg[:3500] + "\n…(생략)"
-    await app.bot.send_message(chat_id, msg)
+    lines = [head, *extra, *opened]
+    msg = settlement.clip_text([*lines, body] if body else lines)
+    with SETTLE_PHASE_SECONDS.time(game="baccarat", phase="send_text"):
+        await app.bot.send_message(chat_id, msg)
+
+
+async def void_round(app: Application, chat_id: int, round_id: int, seal: Sealed):
+    # 공개할 카드가 봉인과 맞지 않으면 그 카드로 지급하지 않는다: 베팅 전액 환급하고 판을 닫는다
+    # (round_log/하우스/로드에는 남기지 않는다. 환급 원장 줄만 라운드에 묶인다)
+    user_ids, _, amounts = STORE.bet_columns(chat_id, round_id)
+    credits = [(uid, amt, "refund") for uid, amt in zip(user_ids, amounts)]
+    STORE.void_baccarat(chat_id, round_id, credits)
+    pool_reset("baccarat", chat_id)
+    await app.bot.send_message(
+        chat_id,
+        f"⚠️ 라운드 {round_id} 무효: 다시 딘 카드가 봉인과 달라서 정산하지 않았어.\n"
+        f"sha256 = {seal.commitment}\n"
+        f"베팅 {len(credits):,}건, {sum(amounts):,} 포인트 전액 환급."
+    )
 
 
 async def delayed_settle(app: Application, chat_id: int, rid: int):
     await asyncio.sleep(ROUND_SECONDS)
-    await settle_round(app, chat_id, rid)
+    with track("settle_round"):
+        await settle_round(app, chat_id, rid)
 
 
 # ================== BACCARAT COMMANDS ==================
@@ -591,18 +765,21 @@ async def delayed_settle(app: Application, chat_id: int, rid: int):
 async def cmd_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat = update.effective_chat
 
-    with db() as conn:
-        r = conn.execute("SELECT round_id, status FROM rounds WHERE chat_id=?", (chat.id,)).fetchone()
-        if r and r["status"] == "OPEN":
-            await update.message.reply_text(f"이미 라운드 {r['round_id']} 진행중이야. ({ROUND_SECONDS}초 마감)")
-            return
+    r = STORE.get_round(chat.id)
+    if r and r["status"] == "OPEN":
+        await update.message.reply_text(f"이미 라운드 {r['round_id']} 진행중이야. ({ROUND_SECONDS}초 마감)")
+        return
 
-        rid = 1 if not r else int(r["round_id"]) + 1
-        conn.execute("INSERT OR REPLACE INTO rounds(chat_id, round_id, status) VALUES(?,?,?)", (chat.id, rid, "OPEN"))
-        conn.commit()
+    rid = 1 if not r else int(r["round_id"]) + 1
+    STORE.open_round(chat.id, rid)
+    pool_reset("baccarat", chat.id, rid)
+    seal = predeal(chat.id, rid) if PREDEAL else None
 
     asyncio.create_task(delayed_settle(context.application, chat.id, rid))
-    await update.message.reply_text(f"라운드 {rid} 시작!  /bet <금액> <P|B|T>   (마감 {ROUND_SECONDS}초)")
+    msg = f"라운드 {rid} 시작!  /bet <금액> <P|B|T>   (마감 {ROUND_SECONDS}초)"
+    if seal is not None:
+        msg += f"\n🔒 카드는 이미 딜했어. 봉인 sha256: {seal.commitment}"
+    await update.message.reply_text(msg)
 
 
 async def cmd_bet(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -628,31 +805,24 @@ async def cmd_bet(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("금액은 1 이상이어야 해.")
         return
 
-    with db() as conn:
-        r = conn.execute("SELECT round_id, status FROM rounds WHERE chat_id=?", (chat.id,)).fetchone()
-        if not r or r["status"] != "OPEN":
-            await update.message.reply_text("지금은 라운드가 열려있지 않아. /start 로 시작해줘.")
-            return
-        rid = int(r["round_id"])
-
-        exists = conn.execute(
-            "SELECT 1 FROM bets WHERE chat_id=? AND round_id=? AND user_id=?",
-            (chat.id, rid, u.id)
-        ).fetchone()
-        if exists:
-            await update.message.reply_text("이번 라운드에는 이미 베팅했어.")
-            return
+    r = STORE.get_round(chat.id)
+    if not r or r["status"] != "OPEN":
+        await update.message.reply_text("지금은 라운드가 열려있지 않아. /start 로 시작해줘.")
+        return
+    rid = int(r["round_id"])
 
-    if not try_debit(u.id, amt):
+    if STORE.has_bet(chat.id, rid, u.id):
+        await update.message.reply_text("이번 라운드에는 이미 베팅했어.")
+        return
+
+    if not try_debit(u.id, amt, "bet", chat.id, "baccarat", rid):
         await update.message.reply_text("잔액 부족")
         return
 
-    with db() as conn:
-        conn.execute(
-            "INSERT INTO bets(chat_id, round_id, user_id, choice, amount) VALUES(?,?,?,?,?)",
-            (chat.id, rid, u.id, choice, amt)
-        )
-        conn.commit()
+    STORE.add_bet(chat.id, rid, u.id, choice, amt)
+    pool_add("baccarat", chat.id, rid, choice, amt)
+    BETS.inc(game="baccarat")
+    BET_POINTS.inc(amt, game="baccarat")
 
     await update.message.reply_text(f"베팅 완료 ✅  {amt} / {BET_CHOICES[choice]}   (잔액: {get_points(u.id)})")
 
@@ -664,18 +834,11 @@ async def cmd_daily(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     today = datetime.now(KST).strftime("%Y-%m-%d")
 
-    with db() as conn:
-        row = conn.execute(
-            "SELECT 1 FROM daily_claims WHERE chat_id=? AND user_id=? AND day=?",
-            (chat.id, u.id, today)
-        ).fetchone()
-        if row:
-            await update.message.reply_text("이미 오늘 출석 보상 받았어.")
-            return
-        conn.execute("INSERT INTO daily_claims(chat_id, user_id, day) VALUES(?,?,?)", (chat.id, u.id, today))
-        conn.commit()
+    if not STORE.claim_daily(chat.id, u.id, today):
+        await update.message.reply_text("이미 오늘 출석 보상 받았어.")
+        return
 
-    credit(u.id, DAILY_REWARD)
+    credit(u.id, DAILY_REWARD, "daily", chat.id)
     await update.message.reply_text(f"출석 보상 +{DAILY_REWARD}  (잔액: {get_points(u.id)})")
 
 
@@ -686,34 +849,15 @@ async def cmd_spin(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     today = datetime.now(KST).strftime("%Y-%m-%d")
 
-    with db() as conn:
-        row = conn.execute(
-            "SELECT used FROM spin_claims WHERE chat_id=? AND user_id=? AND day=?",
-            (chat.id, u.id, today)
-        ).fetchone()
-        used = int(row["used"]) if row else 0
-
-        if used >= SPIN_DAILY_LIMIT:
-            await update.message.reply_text("오늘 룰렛은 다 썼어.")
-            return
+    used = STORE.spin_used(chat.id, u.id, today)
+    if used >= SPIN_DAILY_LIMIT:
+        await update.message.reply_text("오늘 룰렛은 다 썼어.")
+        return
 
-        rewards = [r for r, w in SPIN_TABLE]
-        weights = [w for r, w in SPIN_TABLE]
-        prize = random.choices(rewards, weights=weights, k=1)[0]
+    prize = seeding.spin(chat_seed(chat.id), u.id, today, used, SPIN_TABLE)
+    STORE.set_spin_used(chat.id, u.id, today, used + 1)
 
-        if row:
-            conn.execute(
-                "UPDATE spin_claims SET used=? WHERE chat_id=? AND user_id=? AND day=?",
-                (used + 1, chat.id, u.id, today)
-            )
-        else:
-            conn.execute(
-                "INSERT INTO spin_claims(chat_id, user_id, day, used) VALUES(?,?,?,?)",
-                (chat.id, u.id, today, 1)
-            )
-        conn.commit()
-
-    credit(u.id, prize)
+    credit(u.id, prize, "spin", chat.id)
     await update.message.reply_text(
         f"룰렛 🎰 +{prize}  (남은 횟수: {SPIN_DAILY_LIMIT - (used + 1)} / 잔액: {get_points(u.id)})"
     )
@@ -721,7 +865,11 @@ async def cmd_spin(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def cmd_road(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat = update.effective_chat
-    road_img = draw_road_image_bytes(chat.id)
+    road = build_road(chat.id)
+    road_img = await MEDIA.render("road", media.FULL, draw_road_image_bytes, chat.id, road)
+    if road_img is None:
+        await update.message.reply_text(media.bead_road_text(road) or "기록 없음")
+        return
     await update.message.reply_photo(photo=road_img)
 
 
@@ -731,9 +879,35 @@ async def cmd_bal(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(f"잔액: {get_points(u.id)}")
 
 
+def _roi(wagered: int, won: int) -> float:
+    return (won - wagered) / wagered * 100 if wagered else 0.0
+
+
+async def cmd_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # 정산 때 쌓아둔 user_stats 한 줄만 읽는다
+    u = update.effective_user
+    ensure_user(u.id, u.username)
+    s = STORE.user_stats(u.id)
+
+    lines = [
+        "📊 개인 통계",
+        f"포인트: {s['points']:,}",
+        f"라운드: {s['rounds']:,}  적중: {s['wins']:,}",
+        f"연승: {s['streak']}  최고연승: {s['max_streak']}",
+        f"총 베팅: {s['wagered']:,}  총 획득: {s['won']:,}  ROI: {_roi(s['wagered'], s['won']):.2f}%",
+    ]
+    for game, label in (("baccarat", "바카라"), ("dice", "다이스")):
+        rounds = s[f"{game}_rounds"]
+        if rounds:
+            wagered, won = s[f"{game}_wagered"], s[f"{game}_won"]
+            lines.append(
+                f"{label}: {rounds:,}판 {s[f'{game}_wins']:,}승 / 베팅 {wagered:,} / 획득 {won:,} / ROI {_roi(wagered, won):.2f}%"
+            )
+    await update.message.reply_text("\n".join(lines))
+
+
 async def cmd_top(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    with db() as conn:
-        rows = conn.execute("SELECT user_id, username, points FROM users ORDER BY points DESC LIMIT 10").fetchall()
+    rows = STORE.top_users(10)
 
     if not rows:
         await update.message.reply_text("랭킹 데이터가 없어.")
@@ -748,8 +922,7 @@ async def cmd_top(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def cmd_house(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat = update.effective_chat
-    with db() as conn:
-        row = conn.execute("SELECT profit, rounds FROM house WHERE chat_id=?", (chat.id,)).fetchone()
+    row = STORE.get_house(chat.id)
 
     if not row:
         await update.message.reply_text("하우스 기록이 아직 없어.")
@@ -758,146 +931,100 @@ async def cmd_house(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(f"🏦 하우스\n누적 수익: {row['profit']}\n진행 라운드: {row['rounds']}")
 
 
+async def cmd_pool(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # /pool, !dice_pool: 지금 라운드 선택별 베팅 합계 (throttle 걸림)
+    await send_pool(context.bot, update.effective_chat.id)
+
+
+async def cmd_odds(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    chat = update.effective_chat
+    if chat.id not in LIVE_ODDS:
+        await refresh_odds(chat.id)
+    prob = LIVE_ODDS[chat.id]
+    counts, _ = odds_key(chat.id)
+
+    lines = [f"🔮 다음 판 확률 (남은 카드 {sum(counts)}장)"]
+    for choice, pr in zip(("P", "B", "T"), prob):
+        # 1 걸 때 기대 회수율. P/B 는 타이면 환급
+        back = pr * PAYOUTS[choice] + (prob[2] if choice != "T" else 0.0)
+        lines.append(f"{BET_CHOICES[choice]}: {pr * 100:.2f}%   기대값 {(back - 1) * 100:+.2f}%")
+    await update.message.reply_text("\n".join(lines))
+
+
 # ================== DICE (GIF) ==================
 
-def _die_frame(value: int, size: int = 300) -> Image.Image:
-    img = Image.new("RGB", (size, size), "#0b1220")
-    d = ImageDraw.Draw(img)
-    d.rounded_rectangle([22, 22, size - 22, size - 22], radius=42, fill="#f8fafc", outline="#94a3b8", width=6)
-
-    def dot(cx, cy, r=18):
-        d.ellipse([cx - r, cy - r, cx + r, cy + r], fill="#111111")
-
-    x1, x2, x3 = int(size * 0.30), int(size * 0.50), int(size * 0.70)
-    y1, y2, y3 = int(size * 0.30), int(size * 0.50), int(size * 0.70)
-
-    pips = {
-        1: [(x2, y2)],
-        2: [(x1, y1), (x3, y3)],
-        3: [(x1, y1), (x2, y2), (x3, y3)],
-        4: [(x1, y1), (x3, y1), (x1, y3), (x3, y3)],
-        5: [(x1, y1), (x3, y1), (x2, y2), (x1, y3), (x3, y3)],
-        6: [(x1, y1), (x3, y1), (x1, y2), (x3, y2), (x1, y3), (x3, y3)],
-    }
-    for cx, cy in pips[value]:
-        dot(cx, cy)
-    return img
-
-
-def make_dice_gif(final_value: int) -> BytesIO:
-    # 흔들리는 느낌: 랜덤 몇 프레임 + 마지막 결과 프레임
-    frames = []
-    durations = []
-
-    for _ in range(7):
-        frames.append(_die_frame(random.randint(1, 6)))
-        durations.append(120)
-
-    frames.append(_die_frame(final_value))
-    durations.append(900)
-
-    bio = BytesIO()
-    bio.name = "dice.gif"
-    frames[0].save(
-        bio,
-        format="GIF",
-        save_all=True,
-        append_images=frames[1:],
-        duration=durations,
-        loop=0,
-        disposal=2,
-    )
-    bio.seek(0)
-    return bio
+def make_dice_gif(final_value: int, rng=None, tier: int = media.FULL) -> BytesIO:
+    if tier == media.STATIC:
+        return _render().make_dice_png(final_value)
+    return _render().make_dice_gif(final_value, rng, lite=tier == media.LITE)
 
 
 def get_dice_state(chat_id: int):
-    with db() as conn:
-        return conn.execute("SELECT * FROM dice_rounds WHERE chat_id=?", (chat_id,)).fetchone()
+    return STORE.get_dice_round(chat_id)
 
 
-def dice_win(bet_type: str, exact_value: int | None, dice_value: int) -> bool:
-    if bet_type == "BIG":
-        return dice_value >= 4
-    if bet_type == "SMALL":
-        return dice_value <= 3
-    if bet_type == "EXACT":
-        return exact_value == dice_value
-    return False
+def dice_lines(outcome: settlement.Outcome):
+    for uid, bet_type, exact_value, amt, payout, kind in outcome.rows():
+        desc = f"EXACT({exact_value})" if bet_type == "EXACT" else bet_type
+        if kind == settlement.WIN:
+            yield f"✅ {uid} {desc} +{payout}"
+        else:
+            yield f"❌ {uid} {desc} -{amt}"
 
 
 async def settle_dice_round(app: Application, chat_id: int, rid: int):
     # settle only once
-    with db() as conn:
-        r = conn.execute(
-            "SELECT status FROM dice_rounds WHERE chat_id=? AND round_id=?",
-            (chat_id, rid)
-        ).fetchone()
-        if not r or r["status"] != "OPEN":
-            return
-        conn.execute("UPDATE dice_rounds SET status='CLOSING' WHERE chat_id=? AND round_id=?", (chat_id, rid))
-        conn.commit()
-
-        bets = conn.execute(
-            "SELECT * FROM dice_bets WHERE chat_id=? AND round_id=?",
-            (chat_id, rid)
-        ).fetchall()
-
-    dice_value = random.randint(1, 6)
-
-    lines = [f"🎲 다이스 결과: {dice_value}"]
-    total_bet = 0
-    total_payout = 0
-    winners = 0
-
-    for bet in bets:
-        uid = int(bet["user_id"])
-        bet_type = bet["bet_type"]
-        exact_value = bet["exact_value"]
-        amt = int(bet["amount"])
-        total_bet += amt
-
-        if dice_win(bet_type, exact_value, dice_value):
-            payout = int(amt * DICE_PAYOUT[bet_type])
-            credit(uid, payout)
-            total_payout += payout
-            winners += 1
-            if bet_type == "EXACT":
-                lines.append(f"✅ {uid} EXACT({exact_value}) +{payout}")
-            else:
-                lines.append(f"✅ {uid} {bet_type} +{payout}")
-        else:
-            if bet_type == "EXACT":
-                lines.append(f"❌ {uid} EXACT({exact_value}) -{amt}")
-            else:
-                lines.append(f"❌ {uid} {bet_type} -{amt}")
+    t_db = time.perf_counter()
+    if not STORE.claim_dice_round(chat_id, rid):
+        return
+    columns = STORE.dice_bet_columns(chat_id, rid)
+    db_elapsed = time.perf_counter() - t_db
 
-    # DB 정리
-    now_ts = int(datetime.now().timestamp())
-    with db() as conn:
-        conn.execute(
-            "INSERT INTO dice_history(chat_id, round_id, dice_value, created_at) VALUES(?,?,?,?)",
-            (chat_id, rid, dice_value, now_ts)
-        )
-        conn.execute("DELETE FROM dice_bets WHERE chat_id=? AND round_id=?", (chat_id, rid))
-        conn.execute("UPDATE dice_rounds SET status='CLOSED' WHERE chat_id=? AND round_id=?", (chat_id, rid))
-        conn.commit()
+    seed = chat_seed(chat_id)
+    with SETTLE_PHASE_SECONDS.time(game="dice", phase="deal"):
+        dice_value = seeding.dice(seed, rid)
 
-    gif = make_dice_gif(dice_value)
-    await app.bot.send_animation(chat_id, animation=gif)
+    with SETTLE_PHASE_SECONDS.time(game="dice", phase="compute"):
+        outcome = settlement.settle_dice(*columns, dice_value, DICE_PAYOUT)
+        credits = outcome.credits()
+        stats = outcome.stats()
 
-    summary = f"✅ 당첨 {winners}명 | 지급합 {total_payout:,} | 총배팅 {total_bet:,}"
-    msg = "\n".join([summary] + lines)
-    if len(msg) > 3500:
-        msg = msg[:3500] + "\n…(생략)"
-    await app.bot.send_message(chat_id, msg)
+    # 지급 + DB 정리
+    now_ts = int(datetime.now().timestamp())
+    t_db = time.perf_counter()
+    STORE.settle_dice(chat_id, rid, dice_value, now_ts, credits, outcome.total_bet - outcome.total_payout, stats)
+    pool_reset("dice", chat_id)
+    db_elapsed += time.perf_counter() - t_db
+    SETTLE_PHASE_SECONDS.observe(db_elapsed, game="dice", phase="db")
+    ROUNDS.inc(game="dice")
+    PAYOUT_POINTS.inc(outcome.total_payout, game="dice")
+
+    tier = MEDIA.pick("dice")
+    MEDIA_TIERS.inc(game="dice", tier=media.TIER_NAMES[tier])
+    job = render_job(tier != media.TEXT, "dice", tier, make_dice_gif, dice_value, seeding.shake(seed, rid), tier)
+    # 렌더하는 동안 텍스트를 만든다
+    summary = f"✅ 당첨 {outcome.winners}명 | 지급합 {outcome.total_payout:,} | 총배팅 {outcome.total_bet:,}"
+    body = settlement.clip_text(dice_lines(outcome))
+
+    with SETTLE_PHASE_SECONDS.time(game="dice", phase="render_gif"):
+        gif = await job if job else None
+    if gif is not None:
+        with SETTLE_PHASE_SECONDS.time(game="dice", phase="send_gif"):
+            await send_media(app.bot, chat_id, gif)
+    shown = f"{dice_value}" if gif is not None else media.dice_text(dice_value)
+
+    head = [summary, f"🎲 다이스 결과: {shown}"]
+    msg = settlement.clip_text([*head, body] if body else head)
+    with SETTLE_PHASE_SECONDS.time(game="dice", phase="send_text"):
+        await app.bot.send_message(chat_id, msg)
 
 
 async def delayed_dice_settle(app: Application, chat_id: int, rid: int, ends_at: int):
     now = int(datetime.now().timestamp())
     wait = max(0, ends_at - now)
     await asyncio.sleep(wait)
-    await settle_dice_round(app, chat_id, rid)
+    with track("settle_dice_round"):
+        await settle_dice_round(app, chat_id, rid)
 
 
 async def dice_start_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -915,12 +1042,8 @@ async def dice_start_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     rid = 1 if not r else int(r["round_id"]) + 1
     ends_at = int(datetime.now().timestamp()) + DICE_ROUND_SECONDS
 
-    with db() as conn:
-        conn.execute(
-            "INSERT OR REPLACE INTO dice_rounds(chat_id, round_id, status, ends_at) VALUES(?,?,?,?)",
-            (chat.id, rid, "OPEN", ends_at)
-        )
-        conn.commit()
+    STORE.open_dice_round(chat.id, rid, ends_at)
+    pool_reset("dice", chat.id, rid)
 
     asyncio.create_task(delayed_dice_settle(context.application, chat.id, rid, ends_at))
 
@@ -940,10 +1063,8 @@ async def dice_stop_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     rid = int(r["round_id"])
-    with db() as conn:
-        conn.execute("UPDATE dice_rounds SET status='CLOSED' WHERE chat_id=? AND round_id=?", (chat.id, rid))
-        conn.execute("DELETE FROM dice_bets WHERE chat_id=? AND round_id=?", (chat.id, rid))
-        conn.commit()
+    STORE.stop_dice_round(chat.id, rid)
+    pool_reset("dice", chat.id)
 
     await update.message.reply_text("🛑 다이스 라운드 중지 + 베팅 초기화 완료. 다시: !dice_start")
 
@@ -1008,34 +1129,30 @@ async def dice_bet_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE, parts
         return
 
     # 이미 베팅했는지 먼저 체크
-    with db() as conn:
-        exists = conn.execute(
-            "SELECT 1 FROM dice_bets WHERE chat_id=? AND round_id=? AND user_id=?",
-            (chat.id, rid, u.id)
-        ).fetchone()
-    if exists:
+    if STORE.has_dice_bet(chat.id, rid, u.id):
         await update.message.reply_text("이번 다이스 라운드에는 이미 베팅했어. (라운드당 1회)")
         return
 
     # 포인트 차감
-    if not try_debit(u.id, amount):
+    if not try_debit(u.id, amount, "bet", chat.id, "dice", rid):
         await update.message.reply_text("잔액 부족")
         return
 
     # DB 기록
-    with db() as conn:
-        conn.execute(
-            "INSERT INTO dice_bets(chat_id, round_id, user_id, bet_type, exact_value, amount) VALUES(?,?,?,?,?,?)",
-            (chat.id, rid, u.id, bet_type, exact_value, amount)
-        )
-        conn.commit()
+    STORE.add_dice_bet(chat.id, rid, u.id, bet_type, exact_value, amount)
+    pool_add("dice", chat.id, rid, dice_key(bet_type, exact_value), amount)
+    BETS.inc(game="dice")
+    BET_POINTS.inc(amount, game="dice")
 
-    desc = f"EXACT({exact_value})" if bet_type == "EXACT" else bet_type
+    desc = dice_key(bet_type, exact_value)
     await update.message.reply_text(f"다이스 베팅 완료 ✅  {amount} / {desc}   (잔액: {get_points(u.id)})")
 
 
 # ================== ! MESSAGE ROUTER ==================
 
+TEXT_ROUTES = ("!dice_start", "!dice_stop", "!dice_round", "!dice_bet", "!dice_pool", "!dice_help")
+
+
 async def on_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
     text = (update.message.text or "").strip()
     if not text.startswith("!"):
@@ -1043,52 +1160,523 @@ async def on_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     parts = text.split()
     cmd = parts[0].lower()
+    route = cmd if cmd in TEXT_ROUTES else "!unknown"
+    if not await admit(update, route):
+        return
+
+    with track(route):
+        if cmd == "!dice_start":
+            await dice_start_cmd(update, context)
+        elif cmd == "!dice_stop":
+            await dice_stop_cmd(update, context)
+        elif cmd == "!dice_round":
+            await dice_round_cmd(update, context)
+        elif cmd == "!dice_bet":
+            await dice_bet_cmd(update, context, parts)
+        elif cmd == "!dice_pool":
+            await cmd_pool(update, context)
+        elif cmd == "!dice_help":
+            await update.message.reply_text(
+                "🎲 다이스 명령어 (! 전용)\n"
+                "!dice_start\n"
+                "!dice_bet BIG 1000\n"
+                "!dice_bet SMALL 1000\n"
+                "!dice_bet EXACT 3 1000\n"
+                "!dice_round\n"
+                "!dice_pool\n"
+                "!dice_stop"
+            )
+        else:
+            await update.message.reply_text("알 수 없는 !명령어야. !dice_help 를 쳐봐.")
+
+
+# ================== ADMIN ==================
+
+async def cmd_metrics(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not is_admin(update.effective_user.id):
+        await update.message.reply_text("관리자 전용 명령이야.")
+        return
+
+    bio = BytesIO(metrics.render().encode())
+    bio.name = "metrics.txt"
+    await update.message.reply_document(document=bio)
+
+
+async def cmd_sqlstats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # /sqlstats [n] [total|avg|max|count]
+    if not is_admin(update.effective_user.id):
+        await update.message.reply_text("관리자 전용 명령이야.")
+        return
+
+    n = 10
+    by = "total"
+    for a in context.args:
+        if a.isdigit():
+            n = max(1, min(50, int(a)))
+        elif a in ("total", "avg", "max", "count"):
+            by = a
+
+    rows = sqltrace.top(n, by=by)
+    if not rows:
+        await update.message.reply_text("기록된 SQL 이 없어.")
+        return
+
+    lines = [f"🗄 SQL TOP {len(rows)} (by {by}, slow ≥ {sqltrace.SLOW_MS:g}ms)"]
+    for r in rows:
+        lines.append(
+            f"{r['total_ms']:.1f}ms  n={r['count']}  avg={r['avg_ms']:.2f}  max={r['max_ms']:.1f}  "
+            f"rows={r['rows']}  slow={r['slow']}\n  {r['sql'][:160]}\n  ← {r['handler'][:80]}"
+        )
+    msg = "\n".join(lines)
+    if len(msg) > 3500:
+        msg = msg[:3500] + "\n…(생략)"
+    await update.message.reply_text(msg)
+
+
+async def cmd_lag(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # /lag [n] [stack]
+    if not is_admin(update.effective_user.id):
+        await update.message.reply_text("관리자 전용 명령이야.")
+        return
+
+    n = next((int(a) for a in context.args if a.isdigit()), 10)
+    lines = LOOP_WATCH.report(max(1, min(30, n)))
+    if not lines:
+        await update.message.reply_text(f"{LOOP_LAG_MS:g}ms 넘게 루프를 막은 기록이 없어.")
+        return
+
+    msg = f"🐢 이벤트 루프 지연 TOP (≥ {LOOP_LAG_MS:g}ms)\n" + "\n".join(lines)
+    if "stack" in context.args:
+        msg += "\n\n" + LOOP_WATCH.worst_stack()
+    if len(msg) > 3500:
+        msg = msg[:3500] + "\n…(생략)"
+    await update.message.reply_text(msg)
+
+
+async def cmd_audit(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # /audit            : users.points 와 원장이 어긋난 유저 찾기
+    # /audit <user_id>  : 그 유저 잔액 재계산 + 최근 원장
+    if not is_admin(update.effective_user.id):
+        await update.message.reply_text("관리자 전용 명령이야.")
+        return
+
+    if not context.args:
+        bad = await asyncio.to_thread(STORE.reconcile, 20)
+        if not bad:
+            await update.message.reply_text("✅ 모든 유저 잔액이 원장과 일치해.")
+            return
+        lines = [f"⚠️ 원장과 다른 잔액 {len(bad)}건"]
+        for uid, points, rebuilt in bad:
+            lines.append(f"{uid}: 잔액 {points:,} / 원장 {rebuilt:,} (차이 {points - rebuilt:+,})")
+        await update.message.reply_text("\n".join(lines))
+        return
+
+    try:
+        uid = int(context.args[0])
+    except ValueError:
+        await update.message.reply_text("사용법: /audit [user_id]")
+        return
+
+    rebuilt = STORE.rebuild_balance(uid)
+    points = get_points(uid)
+    mark = "✅" if rebuilt == points else "⚠️"
+    lines = [f"{mark} {uid}  잔액 {points:,} / 원장 재계산 {rebuilt:,}"]
+    for e in STORE.ledger_entries(uid, 15):
+        ts = datetime.fromtimestamp(e["created_at"], KST).strftime("%m-%d %H:%M")
+        ref = f" {e['game']}#{e['round_id']}" if e["round_id"] is not None else ""
+        where = f" @{e['chat_id']}" if e["chat_id"] is not None else ""
+        lines.append(f"{ts}  {e['delta']:+,}  {e['reason']}{ref}{where}")
+    await update.message.reply_text("\n".join(lines))
+
+
+async def cmd_replay(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # /replay                 : 이 채팅 기록 전부를 시드로 다시 돌려 원장/하우스와 대조
+    # /replay <round_id>      : 바카라 한 판
+    # /replay dice <round_id> : 다이스 한 판
+    if not is_admin(update.effective_user.id):
+        await update.message.reply_text("관리자 전용 명령이야.")
+        return
+
+    chat = update.effective_chat
+    args = list(context.args)
+    games = replay.GAMES
+    rid = None
+    if args and args[0] in replay.GAMES:
+        games = (args.pop(0),)
+    if args:
+        try:
+            rid = int(args[0])
+        except ValueError:
+            await update.message.reply_text("사용법: /replay [baccarat|dice] [round_id]")
+            return
+        if len(games) > 1:
+            games = ("baccarat",)
+
+    report = await asyncio.to_thread(replay.replay_chat, STORE, chat.id, PAYOUTS, DICE_PAYOUT, games, rid)
+    await update.message.reply_text("\n".join(report.lines()))
 
-    if cmd == "!dice_start":
-        await dice_start_cmd(update, context)
-    elif cmd == "!dice_stop":
-        await dice_stop_cmd(update, context)
-    elif cmd == "!dice_round":
-        await dice_round_cmd(update, context)
-    elif cmd == "!dice_bet":
-        await dice_bet_cmd(update, context, parts)
-    elif cmd == "!dice_help":
+
+async def cmd_backup(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # /backup       : 지금 온라인 백업 하나 찍기
+    # /backup list  : 남아 있는 백업 목록
+    if not is_admin(update.effective_user.id):
+        await update.message.reply_text("관리자 전용 명령이야.")
+        return
+    if STORAGE_BACKEND != "sqlite":
+        await update.message.reply_text("sqlite 저장소에서만 백업할 수 있어.")
+        return
+
+    if context.args and context.args[0] == "list":
+        paths = []
+        for db_path in backup_paths():
+            paths += await asyncio.to_thread(backup.archives, BACKUP_DIR, db_path)
+        if not paths:
+            await update.message.reply_text("백업이 없어.")
+            return
+        lines = [f"💾 백업 {len(paths)}개 ({BACKUP_DIR})"]
+        lines += [f"{os.path.basename(p)}  {os.path.getsize(p) / 1024:,.0f}KB" for p in paths]
+        await update.message.reply_text("\n".join(lines))
+        return
+
+    try:
+        results = await take_backup()
+    except Exception as e:
+        await update.message.reply_text(f"❌ 백업 실패: {e}")
+        return
+    await update.message.reply_text("\n".join("💾 " + r.line() for r in results))
+
+
+async def cmd_restore(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # /restore <파일>        : 백업 검사만 (integrity_check, 스키마 버전)
+    # /restore <파일> 확인   : 라이브 DB 에 덮어쓰기. 열린 라운드가 있으면 거절
+    if not is_admin(update.effective_user.id):
+        await update.message.reply_text("관리자 전용 명령이야.")
+        return
+    if STORAGE_BACKEND != "sqlite" or SHARDS > 1:
+        # 샤드 워커들은 각자 메모리 상태를 들고 있다. 봇을 멈추고 python backup.py --restore 로
+        await update.message.reply_text("sqlite + SHARDS=1 에서만 돼. 아니면 봇을 멈추고 backup.py --restore 를 써.")
+        return
+    if not context.args:
+        await update.message.reply_text("사용법: /restore <파일> [확인]  (/backup list 로 목록)")
+        return
+
+    # 백업 폴더 밖 파일은 안 받는다
+    archive = os.path.join(BACKUP_DIR, os.path.basename(context.args[0]))
+    if not os.path.isfile(archive):
+        await update.message.reply_text(f"{archive} 가 없어.")
+        return
+    try:
+        version = await asyncio.to_thread(backup.verify, archive)
+    except backup.BackupError as e:
+        await update.message.reply_text(f"❌ 검사 실패: {e}")
+        return
+    if version > len(MIGRATIONS):
+        await update.message.reply_text(f"❌ 이 코드보다 새 스키마야 (v{version} > v{len(MIGRATIONS)}).")
+        return
+    if len(context.args) < 2 or context.args[1] != "확인":
         await update.message.reply_text(
-            "🎲 다이스 명령어 (! 전용)\n"
-            "!dice_start\n"
-            "!dice_bet BIG 1000\n"
-            "!dice_bet SMALL 1000\n"
-            "!dice_bet EXACT 3 1000\n"
-            "!dice_round\n"
-            "!dice_stop"
+            f"✅ {os.path.basename(archive)} 정상 (스키마 v{version}).\n"
+            f"덮어쓰려면: /restore {os.path.basename(archive)} 확인"
         )
+        return
+
+    busy = {game: n for game, n in STORE.open_round_counts().items() if n}
+    if busy:
+        text = ", ".join(f"{game} {n}" for game, n in busy.items())
+        await update.message.reply_text(f"진행 중인 라운드가 있어 ({text}). 다 끝나고 다시 해.")
+        return
+
+    try:
+        result = await asyncio.to_thread(backup.restore, archive, DB_PATH)
+    except backup.BackupError as e:
+        await update.message.reply_text(f"❌ 복원 실패 (DB 는 그대로): {e}")
+        return
+    # 복원 전 DB 에서 온 메모리 상태는 버린다. 예전 스키마면 여기서 올린다
+    init_db()
+    SHOE_COUNTS.clear()
+    LIVE_ODDS.clear()
+    log.warning("restored %s by %s", archive, update.effective_user.id)
+    await update.message.reply_text("♻️ 복원 완료: " + result.line())
+
+
+def progress_edits(message, label: str, every: float = 2.0):
+    """bulk 의 progress 콜백 (작업 스레드에서 불린다). every 초에 한 번 message 를 고친다."""
+    loop = asyncio.get_running_loop()
+    last = [time.monotonic()]
+
+    def progress(done: int, total: int | None):
+        now = time.monotonic()
+        if now - last[0] < every:
+            return
+        last[0] = now
+        of = f"/{total:,}" if total else ""
+        fut = asyncio.run_coroutine_threadsafe(message.edit_text(f"{label} {done:,}{of}줄…"), loop)
+        fut.add_done_callback(lambda f: f.exception())
+
+    return progress
+
+
+async def download_reply_document(update: Update) -> tuple[str, str] | None:
+    """답장한 메시지의 첨부 파일을 임시 파일로. (경로, 원래 파일 이름) 또는 None."""
+    reply = update.message.reply_to_message
+    doc = reply.document if reply else None
+    if doc is None:
+        return None
+    name = doc.file_name or "upload.csv"
+    fd, path = tempfile.mkstemp(suffix="-" + os.path.basename(name))
+    os.close(fd)
+    await (await doc.get_file()).download_to_drive(path)
+    return path, name
+
+
+async def cmd_export(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # /export <users|ledger|rounds|bets> [csv|ndjson] : gzip 파일로 받기 (chunk 단위로 흘려 써서 메모리는 일정)
+    if not is_admin(update.effective_user.id):
+        await update.message.reply_text("관리자 전용 명령이야.")
+        return
+    if STORAGE_BACKEND != "sqlite":
+        await update.message.reply_text("sqlite 저장소에서만 돼.")
+        return
+    args = list(context.args)
+    what = args[0] if args else ""
+    fmt = args[1] if len(args) > 1 else "csv"
+    if what not in bulk.EXPORTS or fmt not in ("csv", "ndjson"):
+        await update.message.reply_text(f"사용법: /export <{'|'.join(bulk.EXPORTS)}> [csv|ndjson]")
+        return
+
+    # 라운드/베팅 기록은 채팅 테이블이라 샤드 워커면 이 워커 담당 채팅 것만 나온다
+    db_path, label = DB_PATH, what
+    if what in ("rounds", "bets") and SHARD_INDEX is not None:
+        db_path, label = chat_db_path(), f"{what}-shard{SHARD_INDEX}of{SHARDS}"
+
+    status = await update.message.reply_text(f"📤 {label} 내보내는 중…")
+    fd, path = tempfile.mkstemp(suffix=f".{fmt}.gz")
+    os.close(fd)
+    try:
+        result = await asyncio.to_thread(
+            bulk.export, db_path, what, path, 1000, progress_edits(status, f"📤 {label}")
+        )
+        stamp = datetime.now(KST).strftime("%Y%m%d-%H%M%S")
+        with open(path, "rb") as f:
+            await update.message.reply_document(f, filename=f"{label}-{stamp}.{fmt}.gz")
+    finally:
+        os.remove(path)
+    await status.edit_text(f"📤 {label}: {result.line()}")
+
+
+async def cmd_import(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # /import users : CSV/NDJSON (user_id, points[, username]) 파일에 답장. 잔액을 파일 값으로 맞춘다 (차이는 원장에)
+    if not is_admin(update.effective_user.id):
+        await update.message.reply_text("관리자 전용 명령이야.")
+        return
+    if STORAGE_BACKEND != "sqlite":
+        await update.message.reply_text("sqlite 저장소에서만 돼.")
+        return
+    if context.args[:1] != ["users"]:
+        await update.message.reply_text("사용법: 파일에 답장으로 /import users  (열: user_id, points[, username])")
+        return
+    busy = {game: n for game, n in STORE.open_round_counts().items() if n}
+    if busy:
+        text = ", ".join(f"{game} {n}" for game, n in busy.items())
+        await update.message.reply_text(f"진행 중인 라운드가 있어 ({text}). 다 끝나고 다시 해.")
+        return
+
+    got = await download_reply_document(update)
+    if got is None:
+        await update.message.reply_text("가져올 파일에 답장으로 보내줘.")
+        return
+    path, name = got
+    status = await update.message.reply_text(f"📥 {name} 가져오는 중…")
+    try:
+        # 압축/형식은 원래 파일 이름으로 판단한다 (임시 경로 끝이 원래 이름)
+        result = await asyncio.to_thread(
+            bulk.import_users, DB_PATH, path, 1000, "import", progress_edits(status, "📥")
+        )
+    except (OSError, UnicodeDecodeError) as e:
+        await status.edit_text(f"❌ 읽기 실패: {e}")
+        return
+    finally:
+        os.remove(path)
+    log.warning("imported balances from %s by %s: %s", name, update.effective_user.id, result.line())
+    await status.edit_text("\n".join([f"📥 {name}: {result.line()}"] + result.errors))
+
+
+async def cmd_grant(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # /grant <포인트> <user_id> [user_id ...] : 여러 명에게 한 번에 지급
+    # 파일에 답장으로 /grant [포인트]          : CSV/NDJSON (user_id[, amount]) 대로 지급
+    if not is_admin(update.effective_user.id):
+        await update.message.reply_text("관리자 전용 명령이야.")
+        return
+    if STORAGE_BACKEND != "sqlite":
+        await update.message.reply_text("sqlite 저장소에서만 돼.")
+        return
+    usage = "사용법: /grant <포인트> <user_id> ...  또는 파일에 답장으로 /grant [포인트]"
+    try:
+        amount = int(context.args[0]) if context.args else None
+        uids = [int(x) for x in context.args[1:]]
+    except ValueError:
+        await update.message.reply_text(usage)
+        return
+    if amount is not None and amount <= 0:
+        await update.message.reply_text("지급액은 0 보다 커야 해.")
+        return
+
+    got = None if uids else await download_reply_document(update)
+    if not uids and got is None:
+        await update.message.reply_text(usage)
+        return
+
+    status = await update.message.reply_text("🎁 지급 중…")
+    progress = progress_edits(status, "🎁")
+    if uids:
+        result = await asyncio.to_thread(bulk.grant, DB_PATH, [(uid, amount) for uid in uids], "grant", 1000, progress)
     else:
-        await update.message.reply_text("알 수 없는 !명령어야. !dice_help 를 쳐봐.")
+        path, _ = got
+        try:
+            result = await asyncio.to_thread(bulk.grant_file, DB_PATH, path, amount, "grant", 1000, progress)
+        except (OSError, UnicodeDecodeError) as e:
+            await status.edit_text(f"❌ 읽기 실패: {e}")
+            return
+        finally:
+            os.remove(path)
+    log.warning("granted by %s: %s", update.effective_user.id, result.line())
+    await status.edit_text("\n".join([f"🎁 지급 완료: {result.line()}"] + result.errors))
+
+
+def backup_paths() -> list[str]:
+    # casino.db 는 0번 워커 (또는 단일 프로세스) 만, 샤드 파일은 각 워커가 자기 것을
+    paths = [DB_PATH] if not SHARD_INDEX else []
+    if chat_db_path() != DB_PATH:
+        paths.append(chat_db_path())
+    return paths
+
+
+async def take_backup() -> list[backup.Result]:
+    results = []
+    for db_path in backup_paths():
+        try:
+            result = await asyncio.to_thread(backup.snapshot, db_path, BACKUP_DIR, BACKUP_KEEP)
+        except Exception:
+            BACKUPS.inc(result="error")
+            raise
+        BACKUPS.inc(result="ok")
+        log.info("backup %s", result.line())
+        results.append(result)
+    return results
+
+
+async def backup_loop():
+    while True:
+        await asyncio.sleep(BACKUP_SECONDS)
+        try:
+            await take_backup()
+        except Exception:
+            log.exception("backup failed")
+
+
+async def ledger_snapshot_loop():
+    while True:
+        await asyncio.sleep(LEDGER_SNAPSHOT_SECONDS)
+        try:
+            await asyncio.to_thread(STORE.snapshot_balances)
+        except Exception:
+            # 다음 주기에 다시 찍으면 된다. 재계산은 더 오래된 스냅샷부터 하면 그만이라 잃는 건 없다
+            log.exception("ledger snapshot failed")
+
+
+async def on_startup(app: Application):
+    # 폴링은 바로 시작하고 PIL / numpy 로딩은 스레드에서 따로
+    loop = asyncio.get_running_loop()
+    loop.run_in_executor(None, warm_render)
+    loop.run_in_executor(None, settlement.warm)
+    if METRICS_PORT:
+        app.bot_data["metrics_server"] = await metrics.serve(METRICS_HOST, METRICS_PORT)
+    if LOOP_LAG_MS > 0:
+        LOOP_WATCH.start()
+    # 공용 테이블이라 워커 하나만 (안 그러면 워커 수만큼 같은 스냅샷을 찍는다)
+    if LEDGER_SNAPSHOT_SECONDS > 0 and not SHARD_INDEX:
+        app.bot_data["snapshot_task"] = asyncio.create_task(ledger_snapshot_loop())
+    if BACKUP_SECONDS > 0 and STORAGE_BACKEND == "sqlite":
+        app.bot_data["backup_task"] = asyncio.create_task(backup_loop())
+
+
+async def on_shutdown(app: Application):
+    await LOOP_WATCH.stop()
+    MEDIA.shutdown()
+    for name in ("snapshot_task", "backup_task"):
+        task = app.bot_data.pop(name, None)
+        if task:
+            task.cancel()
+    server = app.bot_data.pop("metrics_server", None)
+    if server:
+        server.close()
+        await server.wait_closed()
 
 
 # ================== MAIN ==================
 
+def build_application(polling: bool = True) -> Application:
+    builder = (
+        Application.builder()
+        .token(TOKEN)
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
+    )
+    if not polling:
+        # 샤드 워커: 업데이트는 프론트 프로세스가 넣어준다
+        builder = builder.updater(None)
+    if UPDATE_CONCURRENCY > 1:
+        builder = builder.concurrent_updates(ChatOrderedUpdateProcessor(UPDATE_CONCURRENCY))
+    app = builder.build()
+
+    # 바카라 (/)
+    app.add_handler(CommandHandler("start", instrument("/start", cmd_start)))
+    app.add_handler(CommandHandler("bet", instrument("/bet", cmd_bet)))
+    app.add_handler(CommandHandler("daily", instrument("/daily", cmd_daily)))
+    app.add_handler(CommandHandler("spin", instrument("/spin", cmd_spin)))
+    app.add_handler(CommandHandler("road", instrument("/road", cmd_road)))
+    app.add_handler(CommandHandler("bal", instrument("/bal", cmd_bal)))
+    app.add_handler(CommandHandler("top", instrument("/top", cmd_top)))
+    app.add_handler(CommandHandler("stats", instrument("/stats", cmd_stats)))
+    app.add_handler(CommandHandler("house", instrument("/house", cmd_house)))
+    app.add_handler(CommandHandler("odds", instrument("/odds", cmd_odds)))
+    app.add_handler(CommandHandler("pool", instrument("/pool", cmd_pool)))
+
+    # 운영
+    app.add_handler(CommandHandler("metrics", instrument("/metrics", cmd_metrics)))
+    app.add_handler(CommandHandler("sqlstats", instrument("/sqlstats", cmd_sqlstats)))
+    app.add_handler(CommandHandler("lag", instrument("/lag", cmd_lag)))
+    app.add_handler(CommandHandler("audit", instrument("/audit", cmd_audit)))
+    app.add_handler(CommandHandler("replay", instrument("/replay", cmd_replay)))
+    app.add_handler(CommandHandler("backup", instrument("/backup", cmd_backup)))
+    app.add_handler(CommandHandler("restore", instrument("/restore", cmd_restore)))
+    app.add_handler(CommandHandler("export", instrument("/export", cmd_export)))
+    app.add_handler(CommandHandler("import", instrument("/import", cmd_import)))
+    app.add_handler(CommandHandler("grant", instrument("/grant", cmd_grant)))
+
+    # 다이스 (!)
+    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, on_text))
+
+    return app
+
+
 def main():
     if not TOKEN:
         raise RuntimeError("TELEGRAM_BOT_TOKEN 환경변수가 필요합니다.")
 
-    init_db()
-    app = Application.builder().token(TOKEN).build()
+    if SHARDS > 1 and STORAGE_BACKEND == "memory":
+        raise RuntimeError("STORAGE_BACKEND=memory 는 SHARDS=1 에서만 쓸 수 있습니다 (프로세스끼리 잔액을 공유 못 함).")
 
-    # 바카라 (/)
-    app.add_handler(CommandHandler("start", cmd_start))
-    app.add_handler(CommandHandler("bet", cmd_bet))
-    app.add_handler(CommandHandler("daily", cmd_daily))
-    app.add_handler(CommandHandler("spin", cmd_spin))
-    app.add_handler(CommandHandler("road", cmd_road))
-    app.add_handler(CommandHandler("bal", cmd_bal))
-    app.add_handler(CommandHandler("top", cmd_top))
-    app.add_handler(CommandHandler("house", cmd_house))
+    if STORAGE_BACKEND == "sqlite":
+        check_shard_layout()
+    init_db()
 
-    # 다이스 (!)
-    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, on_text))
+    if SHARDS > 1:
+        import shard
+        shard.run(SHARDS)
+        return
 
-    app.run_polling()
+    build_application().run_polling()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,182 @@
+"""
+정산 미디어 품질 조절.
+
+한꺼번에 많은 채팅이 정산되면 카드 공개 GIF (900x520, 최대 8프레임) 와 빅로드 PNG 렌더가 CPU 를 다 먹는다.
+렌더는 전용 스레드 풀에서 돌리고, 정산마다 지금 밀린 양과 최근 렌더 시간을 보고 단계를 고른다.
+
+- FULL:   원래 GIF + 빅로드 PNG
+- LITE:   절반 해상도 2프레임 GIF (뒷면 -> 결과) + 빅로드 PNG
+- STATIC: 결과 한 장 PNG (절반 해상도) + 이모지 비드로드 텍스트
+- TEXT:   이미지 없이 카드/비드로드를 텍스트로
+
+고르는 법: (밀린 렌더의 예상 시간 합 / 워커 수) + 이 단계 렌더 예상 시간 <= budget 인 가장 좋은 단계.
+예상 시간은 (종류, 단계) 별 EWMA. 렌더가 deadline 안에 안 끝나면 기다리지 않고 텍스트로 내보내고
+렌더는 뒤에서 끝까지 돌려 시간만 반영한다 (다음 정산부터 단계가 내려간다). 정산 메시지는 밀리지 않는다.
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # windows
+    resource = None
+
+log = logging.getLogger(__name__)
+
+FULL, LITE, STATIC, TEXT = 0, 1, 2, 3
+TIER_NAMES = ("full", "lite", "static", "text")
+
+# 처음 측정 전 예상 렌더 시간 (초). 실측으로 바로 덮인다
+_DEFAULT_COST = {
+    ("reveal", FULL): 0.05, ("reveal", LITE): 0.012, ("reveal", STATIC): 0.01,
+    ("road", FULL): 0.002, ("road", LITE): 0.002,
+    ("dice", FULL): 0.005, ("dice", LITE): 0.002, ("dice", STATIC): 0.001,
+}
+
+# 단계별로 렌더하는 것. 없는 건 텍스트로 대신한다
+PARTS = {
+    "baccarat": {FULL: ("reveal", "road"), LITE: ("reveal", "road"), STATIC: ("reveal",), TEXT: ()},
+    "dice": {FULL: ("dice",), LITE: ("dice",), STATIC: ("dice",), TEXT: ()},
+}
+
+
+def parse_tier(name: str | None) -> int | None:
+    """'auto' / 빈 값이면 None (자동)."""
+    if not name or name == "auto":
+        return None
+    try:
+        return TIER_NAMES.index(name.lower())
+    except ValueError:
+        raise ValueError(f"알 수 없는 MEDIA_TIER: {name}") from None
+
+
+class Controller:
+    def __init__(self, workers: int = 2, budget: float = 1.5, deadline: float = 3.0,
+                 forced: int | None = None, alpha: float = 0.3):
+        self.workers = max(1, workers)
+        self.budget = budget
+        self.deadline = deadline
+        self.forced = forced
+        self.alpha = alpha
+        self.cost = dict(_DEFAULT_COST)
+        self.backlog = 0.0   # 제출됐지만 안 끝난 렌더의 예상 시간 합
+        self.inflight = 0
+        self.late = 0        # deadline 을 넘겨 텍스트로 대신한 수
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def pool(self) -> concurrent.futures.ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = concurrent.futures.ThreadPoolExecutor(self.workers, thread_name_prefix="render")
+        return self._pool
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    # ---------- 단계 고르기 ----------
+
+    def estimate(self, game: str, tier: int) -> float:
+        return sum(self.cost.get((kind, tier), 0.0) for kind in PARTS[game][tier])
+
+    def pick(self, game: str) -> int:
+        if self.forced is not None:
+            return self.forced
+        wait = self.backlog / self.workers
+        for tier in (FULL, LITE, STATIC):
+            if wait + self.estimate(game, tier) <= self.budget:
+                return tier
+        return TEXT
+
+    # ---------- 렌더 ----------
+
+    def submit(self, kind: str, tier: int, fn, *args) -> asyncio.Future:
+        """fn(*args) 를 바로 렌더 스레드에 넣는다 (await 전에 시작돼야 DB 작업과 겹칠 수 있다)."""
+        est = self.cost.get((kind, tier), 0.0)
+        with self._lock:
+            self.backlog += est
+            self.inflight += 1
+
+        def job():
+            t0 = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                self._done(kind, tier, est, time.perf_counter() - t0)
+
+        return asyncio.get_running_loop().run_in_executor(self.pool(), job)
+
+    async def wait(self, fut: asyncio.Future, kind: str, tier: int):
+        """deadline 안에 끝나면 결과, 아니면 None (렌더는 뒤에서 마저 돈다)."""
+        try:
+            return await asyncio.wait_for(asyncio.shield(fut), self.deadline)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.late += 1
+            fut.add_done_callback(_swallow)
+            log.warning("render %s/%s missed %.1fs deadline", kind, TIER_NAMES[tier], self.deadline)
+            return None
+
+    async def render(self, kind: str, tier: int, fn, *args):
+        return await self.wait(self.submit(kind, tier, fn, *args), kind, tier)
+
+    def _done(self, kind: str, tier: int, est: float, elapsed: float):
+        with self._lock:
+            self.backlog = max(0.0, self.backlog - est)
+            self.inflight -= 1
+            old = self.cost.get((kind, tier), elapsed)
+            self.cost[(kind, tier)] = old + self.alpha * (elapsed - old)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "inflight": self.inflight,
+                "backlog_s": round(self.backlog, 3),
+                "late": self.late,
+                "peak_rss": peak_rss(),
+                "cost_ms": {f"{k}/{TIER_NAMES[t]}": round(v * 1000, 1) for (k, t), v in sorted(self.cost.items())},
+            }
+
+
+def peak_rss() -> int | None:
+    """프로세스 최대 RSS (바이트, 리눅스 ru_maxrss 는 KB)."""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _swallow(fut):
+    if not fut.cancelled() and fut.exception() is not None:
+        log.error("late render failed", exc_info=fut.exception())
+
+
+# ================== TEXT FALLBACK ==================
+
+_BEAD = {"P": "🔵", "B": "🔴", "T": "🟢"}
+_DICE_FACES = "⚀⚁⚂⚃⚄⚅"
+
+
+def cards_text(player, banker, p: int, b: int) -> str:
+    fmt = lambda cards: " ".join(f"{r}{s}" for r, s in cards)
+    return f"🃏 P: {fmt(player)} ({p})  /  B: {fmt(banker)} ({b})"
+
+
+def bead_road_text(results: list[str], rows: int = 6, cols: int = 12) -> str:
+    """비드로드: 위에서 아래, 왼쪽에서 오른쪽으로 한 칸씩 (타이 포함). 최근 rows*cols 개."""
+    results = results[-rows * cols:]
+    if not results:
+        return ""
+    used = -(-len(results) // rows)
+    grid = [[""] * used for _ in range(rows)]
+    for i, r in enumerate(results):
+        grid[i % rows][i // rows] = _BEAD.get(r, "⚪")
+    return "\n".join("".join(cell or "▫️" for cell in line) for line in grid)
+
+
+def dice_text(value: int) -> str:
+    return f"{_DICE_FACES[value - 1]} {value}"
@@ -0,0 +1,228 @@
+"""
+프로세스 내 메트릭 (카운터 / 게이지 / 히스토그램) 과 OpenMetrics 텍스트 출력.
+
+외부 의존성 없이 main.py 의 핸들러와 정산 단계에 붙여 쓰는 용도.
+render() 결과는 /metrics 관리자 명령이나 METRICS_PORT 로 여는 로컬 HTTP 엔드포인트로 나간다.
+"""
+
+import asyncio
+import math
+import time
+from contextlib import contextmanager
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# seconds. sqlite 한 줄 ~ 텔레그램 업로드까지 덮도록
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _fmt_labels(key: tuple, extra: tuple = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    inner = ",".join(
+        '{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    )
+    return "{" + inner + "}"
+
+
+def _fmt_value(v: float) -> str:
+    if isinstance(v, int):
+        return str(v)
+    if math.isinf(v):
+        return "+Inf" if v > 0 else "-Inf"
+    if v == int(v) and abs(v) < 1e15:
+        return str(int(v))
+    return repr(float(v))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, doc: str):
+        self.name = name
+        self.doc = doc
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        for key, v in sorted(self.values.items()):
+            yield f"{self.name}_total{_fmt_labels(key)} {_fmt_value(v)}"
+
+
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, name: str, doc: str, fn=None):
+        self.name = name
+        self.doc = doc
+        self.fn = fn
+        self.values: dict[tuple, float] = {}
+
+    def set(self, value: float, **labels):
+        self.values[_label_key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def remove(self, **labels):
+        self.values.pop(_label_key(labels), None)
+
+    def samples(self):
+        if self.fn is not None:
+            try:
+                got = self.fn()
+            except Exception:  # 스크레이프가 봇을 죽이면 안 된다
+                got = None
+            if isinstance(got, dict):
+                for labels, v in got.items():
+                    self.values[_label_key(dict(labels))] = v
+            elif got is not None:
+                self.values[()] = got
+        for key, v in sorted(self.values.items()):
+            yield f"{self.name}{_fmt_labels(key)} {_fmt_value(v)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.doc = doc
+        self.buckets = tuple(sorted(buckets))
+        # key -> [bucket counts..., +Inf count, sum]
+        self.values: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        row = self.values.get(key)
+        if row is None:
+            row = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        for i, b in enumerate(self.buckets):
+            if value <= b:
+                row[i] += 1
+                break
+        else:
+            row[len(self.buckets)] += 1
+        row[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def snapshot(self, **labels) -> dict:
+        """count / sum / 버킷 기반 근사 p50·p95·p99 (관리자 요약용)."""
+        row = self.values.get(_label_key(labels))
+        if not row:
+            return {"count": 0, "sum": 0.0}
+        counts = row[:-1]
+        total = sum(counts)
+        out = {"count": total, "sum": row[-1]}
+        for q in (0.5, 0.95, 0.99):
+            need = q * total
+            acc = 0
+            for i, c in enumerate(counts):
+                acc += c
+                if acc >= need:
+                    out[f"p{int(q * 100)}"] = self.buckets[i] if i < len(self.buckets) else math.inf
+                    break
+        return out
+
+    def samples(self):
+        for key, row in sorted(self.values.items()):
+            acc = 0
+            for i, b in enumerate(self.buckets):
+                acc += row[i]
+                yield f"{self.name}_bucket{_fmt_labels(key, (('le', _fmt_value(float(b))),))} {acc}"
+            acc += row[len(self.buckets)]
+            yield f"{self.name}_bucket{_fmt_labels(key, (('le', '+Inf'),))} {acc}"
+            yield f"{self.name}_count{_fmt_labels(key)} {acc}"
+            yield f"{self.name}_sum{_fmt_labels(key)} {_fmt_value(row[-1])}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: dict[str, object] = {}
+
+    def _get(self, cls, name, doc, **kw):
+        m = self.metrics.get(name)
+        if m is None:
+            m = self.metrics[name] = cls(name, doc, **kw)
+        return m
+
+    def counter(self, name: str, doc: str) -> Counter:
+        return self._get(Counter, name, doc)
+
+    def gauge(self, name: str, doc: str, fn=None) -> Gauge:
+        return self._get(Gauge, name, doc, fn=fn)
+
+    def histogram(self, name: str, doc: str, buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, doc, buckets=buckets)
+
+    def render(self) -> str:
+        lines = []
+        for name, m in sorted(self.metrics.items()):
+            lines.append(f"# TYPE {name} {m.kind}")
+            lines.append(f"# HELP {name} {m.doc}")
+            lines.extend(m.samples())
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+render = REGISTRY.render
+
+
+# ================== HTTP ==================
+
+async def _handle_http(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        request = await asyncio.wait_for(reader.readline(), timeout=5)
+        # 헤더는 버린다
+        while True:
+            line = await asyncio.wait_for(reader.readline(), timeout=5)
+            if line in (b"\r\n", b"\n", b""):
+                break
+
+        parts = request.decode("latin-1").split()
+        if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] in ("/metrics", "/"):
+            body = render().encode()
+            head = f"HTTP/1.1 200 OK\r\nContent-Type: {CONTENT_TYPE}\r\n"
+        else:
+            body = b"not found\n"
+            head = "HTTP/1.1 404 Not Found\r\nContent-Type: text/plain\r\n"
+
+        writer.write((head + f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n").encode() + body)
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host: str = "127.0.0.1", port: int = 9464) -> asyncio.AbstractServer:
+    """GET /metrics 에 OpenMetrics 텍스트를 돌려주는 최소 HTTP 서버."""
+    return await asyncio.start_server(_handle_http, host, port)
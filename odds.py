@@ -0,0 +1,159 @@
+"""
+남은 슈 구성으로 다음 판 P/B/T 확률을 정확히 계산한다.
+
+카드는 값(0~9) 10종으로만 본다. 바카라 결과는 값만 보기 때문이다.
+다음 판은 최대 6장을 순서대로 뽑는다 (플레이어 2, 뱅커 2, 플레이어 3번째, 뱅커 3번째, rules.deal 순서).
+남은 카드 구성(count 벡터)에서 비복원으로 뽑는 모든 경우를 열거한다. 중간 상태
+(몇 번째 카드, 플레이어/뱅커 합, 남은 구성) 를 메모해서, 순서만 다르고 같은 상태가 되는 경로를 한 번만 계산한다.
+
+컷: draw_card 는 위치가 len(deck) - 6 이상이면 새 슈로 바꾼다. 컷까지 남은 장수(usable)가 6 미만이면
+다음 판 중간부터는 새 8덱 슈에서 뽑는다. 그 경우도 카드 순번별 출처를 나눠 정확히 계산한다.
+"""
+
+import functools
+
+import rules
+
+VALUES = range(10)
+# 새 슈: 0 (10/J/Q/K) 이 덱당 16장, 1~9 는 4장씩
+FRESH = tuple((16 if v == 0 else 4) * rules.DECKS for v in VALUES)
+
+
+class ShoeCounts:
+    """채팅 하나의 남은 카드 값별 장수. draw_card 가 한 장씩 갱신한다."""
+
+    __slots__ = ("counts", "usable")
+
+    def __init__(self, deck, pos: int):
+        self.reset(deck, pos)
+
+    def reset(self, deck, pos: int):
+        counts = [0] * 10
+        for r, _ in deck[pos:]:
+            counts[rules.card_value(r)] += 1
+        self.counts = counts
+        self.usable = len(deck) - rules.CUT_RESERVE - pos
+
+    def take(self, card):
+        self.counts[rules.card_value(card[0])] -= 1
+        self.usable -= 1
+
+    def key(self) -> tuple[tuple[int, ...], int]:
+        return tuple(self.counts), self.usable
+
+
+@functools.lru_cache(maxsize=256)
+def next_hand(counts: tuple[int, ...], usable: int) -> tuple[float, float, float]:
+    """
+    다음 판 (P, B, T) 확률.
+    counts: 아직 안 나온 카드 값별 장수 (컷 뒤 6장 포함), usable: 컷까지 뽑을 수 있는 장수.
+    같은 구성은 여러 채팅/여러 번 물어도 한 번만 계산한다 (새 슈 상태가 특히 흔하다).
+    """
+    if usable <= 0:
+        # 첫 장부터 새 슈
+        counts, usable = FRESH, 6
+    return _Enumerator(usable).start(counts)
+
+
+class _Enumerator:
+    """순번 i 의 카드는 i < usable 이면 남은 슈, 아니면 새 슈에서 뽑는다."""
+
+    def __init__(self, usable: int):
+        self.usable = usable
+        self.memo = {}
+
+    def start(self, counts):
+        return self._first(0, 0, 0, counts, FRESH)
+
+    def _draws(self, i, cur, fresh):
+        # (값, 확률, 남은 슈, 새 슈)
+        src = cur if i < self.usable else fresh
+        n = sum(src)
+        for v in VALUES:
+            c = src[v]
+            if not c:
+                continue
+            nxt = src[:v] + (c - 1,) + src[v + 1:]
+            if i < self.usable:
+                yield v, c / n, nxt, fresh
+            else:
+                yield v, c / n, cur, nxt
+
+    def _first(self, i, p, b, cur, fresh):
+        # 0,1: 플레이어 / 2,3: 뱅커. 같은 (순번, 합, 구성) 은 한 번만
+        key = (i, p, b, cur, fresh)
+        hit = self.memo.get(key)
+        if hit is not None:
+            return hit
+
+        out = [0.0, 0.0, 0.0]
+        for v, pr, c2, f2 in self._draws(i, cur, fresh):
+            if i < 2:
+                sub = self._first(i + 1, (p + v) % 10, b, c2, f2)
+            elif i == 2:
+                sub = self._first(i + 1, p, (b + v) % 10, c2, f2)
+            else:
+                sub = self._third(p, (b + v) % 10, c2, f2)
+            out[0] += pr * sub[0]
+            out[1] += pr * sub[1]
+            out[2] += pr * sub[2]
+
+        res = self.memo[key] = tuple(out)
+        return res
+
+    def _third(self, p, b, cur, fresh):
+        # 두 장씩 받은 뒤: 내추럴 / 플레이어 3번째 / 뱅커 3번째 (rules.deal 과 같은 판단)
+        if p >= 8 or b >= 8:
+            return _ONE_HOT[_idx(p, b)]
+        if p > 5 and not rules.banker_draws(b, None):
+            return _ONE_HOT[_idx(p, b)]
+
+        key = (4, p, b, cur, fresh)
+        hit = self.memo.get(key)
+        if hit is not None:
+            return hit
+
+        # 남은 두 장은 구성 튜플을 새로 만들지 않고 장수 계산만 한다
+        s4 = cur if 4 < self.usable else fresh
+        s5 = cur if 5 < self.usable else fresh
+        same = (4 < self.usable) == (5 < self.usable)
+        n4 = sum(s4)
+        n5 = sum(s5) - same
+        out = [0.0, 0.0, 0.0]
+        if p <= 5:
+            for v in VALUES:
+                c = s4[v]
+                if not c:
+                    continue
+                pr = c / n4
+                row = _RESULT[(p + v) % 10]
+                if _BANKER[b][v]:
+                    pr /= n5
+                    for w in VALUES:
+                        c5 = s5[w] - (same and w == v)
+                        if c5:
+                            out[row[(b + w) % 10]] += pr * c5
+                else:
+                    out[row[b]] += pr
+        else:
+            # 플레이어 스탠드, 뱅커 5 이하라 받음
+            row = _RESULT[p]
+            for w in VALUES:
+                c = s4[w]
+                if c:
+                    out[row[(b + w) % 10]] += c / n4
+
+        res = self.memo[key] = tuple(out)
+        return res
+
+
+_BANKER = rules.BANKER_TABLE
+_ONE_HOT = ((1.0, 0.0, 0.0), (0.0, 1.0, 0.0), (0.0, 0.0, 1.0))
+
+
+def _idx(p: int, b: int) -> int:
+    return 0 if p > b else (1 if b > p else 2)
+
+
+# [p][b] -> 0 (P) / 1 (B) / 2 (T)
+_RESULT = [[_idx(p, b) for b in VALUES] for p in VALUES]
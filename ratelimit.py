@@ -0,0 +1,105 @@
+"""
+명령 폭주 막기 (토큰 버킷).
+
+유저별 / 채팅별 버킷 두 개를 같이 본다: 둘 다 cost 만큼 남아 있어야 통과하고, 통과할 때만 둘 다 뺀다.
+DB / 렌더 전에 부르는 거라 거절은 dict 조회 몇 번이 전부다.
+거절마다 답장하지 않고 notice_seconds 에 한 번만 안내한다 (그 사이 버려진 수를 같이 알려준다).
+유저 버킷에 막히면 (유저, 채팅) 마다, 채팅 버킷에 막히면 채팅에 하나.
+
+버킷은 프로세스 메모리에만 있다. SHARDS > 1 이면 채팅 버킷은 그대로 정확하고 (채팅은 한 워커에만 간다)
+유저 버킷은 워커마다 따로라서 여러 샤드의 채팅을 오가는 유저는 그만큼 더 쓸 수 있다.
+"""
+
+import time
+
+
+class Limiter:
+    """키마다 초당 rate 개씩 burst 까지 차는 버킷. rate <= 0 이면 항상 통과."""
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 50_000):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.max_keys = max_keys
+        # key -> [tokens, stamp]
+        self.buckets: dict = {}
+
+    def level(self, key, now: float) -> float:
+        b = self.buckets.get(key)
+        if b is None:
+            return self.burst
+        return min(self.burst, b[0] + (now - b[1]) * self.rate)
+
+    def spend(self, key, cost: float, now: float, level: float):
+        self.buckets[key] = [level - cost, now]
+        if len(self.buckets) > self.max_keys:
+            self._gc(now)
+
+    def retry_after(self, key, cost: float, now: float) -> float:
+        if self.rate <= 0:
+            return 0.0
+        return max(0.0, (min(cost, self.burst) - self.level(key, now)) / self.rate)
+
+    def _gc(self, now: float):
+        # 다 찬 버킷은 없는 것과 같다
+        full = self.burst / self.rate if self.rate > 0 else 0.0
+        self.buckets = {k: b for k, b in self.buckets.items() if now - b[1] < full}
+
+
+class Admission:
+    def __init__(self, user: Limiter, chat: Limiter, costs: dict[str, float] | None = None,
+                 notice_seconds: float = 10.0):
+        self.user = user
+        self.chat = chat
+        self.costs = costs or {}
+        self.notice_seconds = notice_seconds
+        # (chat_id, user_id 또는 None) -> [마지막 안내 시각, 그 뒤 버려진 수]
+        self.notices: dict[tuple[int, int], list] = {}
+
+    def cost(self, route: str) -> float:
+        return self.costs.get(route, 1.0)
+
+    def check(self, uid: int, chat_id: int, route: str, now: float | None = None) -> str | None:
+        """통과면 None (토큰을 쓴다), 막히면 막은 쪽 'user' / 'chat'."""
+        now = time.monotonic() if now is None else now
+        cost = self.cost(route)
+        # burst 보다 비싼 명령도 버킷이 꽉 차 있으면 통과
+        cu, cc = min(cost, self.user.burst), min(cost, self.chat.burst)
+        u = self.user.level(uid, now) if self.user.rate > 0 else None
+        if u is not None and u < cu:
+            return "user"
+        c = self.chat.level(chat_id, now) if self.chat.rate > 0 else None
+        if c is not None and c < cc:
+            return "chat"
+        if u is not None:
+            self.user.spend(uid, cu, now, u)
+        if c is not None:
+            self.chat.spend(chat_id, cc, now, c)
+        return None
+
+    def notice(self, uid: int | None, chat_id: int, now: float | None = None) -> int | None:
+        """
+        거절 하나를 센다. 안내를 보낼 때면 지난 안내 뒤로 버려진 수를 돌려주고, 아니면 None.
+        채팅 버킷에 막힌 건 uid=None 으로 채팅에 하나만 (유저마다 답하면 그게 또 폭주다).
+        """
+        now = time.monotonic() if now is None else now
+        key = (chat_id, uid)
+        n = self.notices.get(key)
+        if n is None or now - n[0] >= self.notice_seconds:
+            dropped = 1 if n is None else n[1] + 1
+            self.notices[key] = [now, 0]
+            if len(self.notices) > self.user.max_keys:
+                self.notices = {k: v for k, v in self.notices.items() if now - v[0] < self.notice_seconds}
+            return dropped
+        n[1] += 1
+        return None
+
+
+def parse_costs(spec: str) -> dict[str, float]:
+    """'/road=4,/odds=2' -> {'/road': 4.0, '/odds': 2.0}"""
+    out = {}
+    for part in spec.replace(" ", "").split(","):
+        if not part:
+            continue
+        route, _, cost = part.partition("=")
+        out[route] = float(cost)
+    return out
@@ -0,0 +1,332 @@
+"""
+카드 공개 GIF / 빅로드 PNG / 주사위 GIF 렌더링.
+
+PIL 을 끌어오는 모듈이라 main.py 는 이걸 첫 렌더 때(또는 시작 직후 백그라운드에서) import 한다.
+DB 는 건드리지 않는다: 필요한 데이터는 호출하는 쪽에서 넘겨준다.
+"""
+
+import random
+from io import BytesIO
+from typing import Iterable, Iterator
+
+from PIL import GifImagePlugin, Image, ImageChops, ImageColor, ImageDraw, ImageFont
+
+
+# ================== PALETTE ==================
+# 모든 이미지를 이 색들만으로 P 모드에 그린다 (도형은 안티앨리어싱이 없고 글자는 fontmode "1").
+# 프레임마다 양자화할 필요가 없고 GIF 는 전역 팔레트 하나로 끝난다.
+# 여기 없는 색을 쓰면 ImageDraw 가 팔레트 뒤에 붙이긴 하지만, 새 색은 여기 추가할 것
+
+PALETTE = (
+    "#0b1220", "#0f2a1c", "#1f2937", "#111111", "#f8fafc", "#94a3b8", "#1e293b", "#64748b",
+    "#334155", "#e2e8f0", "#60a5fa", "#fb7185", "#fbbf24", "#ef4444", "#1f4fff", "#ff2a2a",
+)
+_INK = {c: i for i, c in enumerate(PALETTE)}
+_PALETTE_BYTES = [v for c in PALETTE for v in ImageColor.getrgb(c)]
+
+
+def _canvas(size: tuple[int, int], bg: str) -> Image.Image:
+    img = Image.new("P", size, _INK[bg])
+    img.putpalette(_PALETTE_BYTES)
+    return img
+
+
+def _half(img: Image.Image) -> Image.Image:
+    # P 모드라 NEAREST (BILINEAR 는 팔레트 밖 색을 만든다)
+    return img.resize((img.width // 2, img.height // 2), Image.NEAREST)
+
+
+# ================== GIF WRITER ==================
+
+def _write_gif(frames: Iterable[tuple[Image.Image, int]], name: str) -> BytesIO:
+    """
+    (프레임, ms) 를 하나씩 받아 바로 인코딩한다. 프레임 리스트를 쌓지 않아서
+    렌더 하나가 잡고 있는 프레임은 직전 것과 지금 것 둘뿐이다 (GIF 길이와 무관).
+    팔레트는 PALETTE 하나를 전역 팔레트로, 둘째 프레임부터는 바뀐 사각형만 disposal=1 로 덧그린다.
+    """
+    bio = BytesIO()
+    bio.name = name
+    prev = None
+    for img, duration in frames:
+        full = (0, 0) + img.size
+        if prev is None:
+            header, _ = GifImagePlugin.getheader(img, info={"loop": 0, "duration": duration, "optimize": False})
+            bio.write(b"".join(header))
+            box = full
+        else:
+            # 같은 프레임이어도 시간은 흘러야 하니 1px 라도 쓴다
+            box = ImageChops.subtract_modulo(img, prev).getbbox() or (0, 0, 1, 1)
+        part = img if box == full else img.crop(box)
+        for chunk in GifImagePlugin.getdata(part, box[:2], duration=duration, disposal=1):
+            bio.write(chunk)
+        prev = img
+    bio.write(b";")
+    bio.seek(0)
+    return bio
+
+
+# ================== BIG ROAD ==================
+
+def draw_road_image_bytes(results: list[str], name: str = "road.png") -> BytesIO:
+    MAX_RESULTS = 200
+    if len(results) > MAX_RESULTS:
+        results = results[-MAX_RESULTS:]
+
+    cell = 30
+    cols = 40
+    img = _canvas((cols * cell, 6 * cell + 20), "#111111")
+    draw = ImageDraw.Draw(img)
+
+    col = -1
+    row = 0
+    last = None
+
+    for r in results:
+        if r == "T":
+            continue
+        if r != last:
+            col += 1
+            row = 0
+        if col >= cols:
+            break
+
+        x0 = col * cell + 5
+        y0 = row * cell + 5
+        x1 = x0 + 20
+        y1 = y0 + 20
+        color = "#1f4fff" if r == "P" else "#ff2a2a"
+        draw.ellipse([x0, y0, x1, y1], fill=color)
+        row += 1
+        last = r
+
+    bio = BytesIO()
+    bio.name = name
+    img.save(bio, format="PNG")
+    bio.seek(0)
+    return bio
+
+
+# ================== CARD REVEAL GIF (NO TTF DEPENDENCY) ==================
+
+def _reveal_frames(player, banker, p, b, result, result_label: str | None = None,
+                   steps: bool = True) -> Iterator[tuple[Image.Image, int]]:
+    """
+    truetype 폰트가 없어도 '무조건' 카드 랭크/무늬가 보이게:
+    - 텍스트는 load_default()로 찍은 뒤 NEAREST 확대(픽셀처럼 크게)
+    - 무늬(♠♥♦♣)는 폰트가 아니라 도형으로 직접 그림
+    steps=False 면 한 장씩 뒤집는 중간 프레임을 건너뛴다 (뒷면 -> 결과).
+    프레임은 하나씩 yield 한다 (_write_gif 가 바로 인코딩하고 버린다).
+    """
+    W, H = 900, 520
+    bg = "#0b1220"
+    table = "#0f2a1c"
+
+    base_font = ImageFont.load_default()
+
+    def draw_big_text(img: Image.Image, x: int, y: int, text: str, scale: int = 6, fill="#111111"):
+        mask = Image.new("1", (260, 90), 0)
+        d = ImageDraw.Draw(mask)
+        d.fontmode = "1"  # 팔레트 밖 중간색이 안 생기게
+        d.text((0, 0), text, font=base_font, fill=1)
+        box = mask.getbbox()
+        if box is None:
+            return
+        mask = mask.crop((0, 0, box[2], box[3]))
+        mask = mask.resize((mask.size[0] * scale, mask.size[1] * scale), resample=Image.NEAREST)
+        ImageDraw.Draw(img).bitmap((x, y), mask, fill=fill)
+
+    def draw_suit(draw: ImageDraw.ImageDraw, cx: int, cy: int, suit: str):
+        red = suit in ("♥", "♦")
+        color = "#ef4444" if red else "#111111"
+
+        if suit == "♦":
+            pts = [(cx, cy - 26), (cx + 22, cy), (cx, cy + 26), (cx - 22, cy)]
+            draw.polygon(pts, fill=color)
+
+        elif suit == "♥":
+            draw.ellipse([cx - 22, cy - 24, cx, cy - 2], fill=color)
+            draw.ellipse([cx, cy - 24, cx + 22, cy - 2], fill=color)
+            draw.polygon([(cx - 24, cy - 8), (cx + 24, cy - 8), (cx, cy + 30)], fill=color)
+
+        elif suit == "♣":
+            draw.ellipse([cx - 10, cy - 34, cx + 10, cy - 14], fill=color)
+            draw.ellipse([cx - 26, cy - 16, cx - 6, cy + 4], fill=color)
+            draw.ellipse([cx + 6, cy - 16, cx + 26, cy + 4], fill=color)
+            draw.polygon([(cx - 6, cy + 4), (cx + 6, cy + 4), (cx, cy + 30)], fill=color)
+
+        elif suit == "♠":
+            draw.ellipse([cx - 22, cy - 4, cx, cy + 18], fill=color)
+            draw.ellipse([cx, cy - 4, cx + 22, cy + 18], fill=color)
+            draw.polygon([(cx - 24, cy + 10), (cx + 24, cy + 10), (cx, cy - 26)], fill=color)
+            draw.polygon([(cx - 6, cy + 18), (cx + 6, cy + 18), (cx, cy + 44)], fill=color)
+
+    def base_frame(title_text=None, highlight=None):
+        img = _canvas((W, H), bg)
+        draw = ImageDraw.Draw(img)
+
+        draw.rounded_rectangle([30, 40, W - 30, H - 40], radius=30, fill=table, outline="#1f2937", width=4)
+        draw_big_text(img, 55, 55, "PLAYER", scale=5, fill="#60a5fa")
+        draw_big_text(img, W - 275, 55, "BANKER", scale=5, fill="#fb7185")
+
+        if title_text:
+            draw_big_text(img, W // 2 - 130, 58, title_text, scale=4, fill="#fbbf24")
+
+        if highlight == "P":
+            draw.rounded_rectangle([40, 45, W // 2 - 20, H - 50], radius=28, outline="#60a5fa", width=6)
+        elif highlight == "B":
+            draw.rounded_rectangle([W // 2 + 20, 45, W - 40, H - 50], radius=28, outline="#fb7185", width=6)
+        elif highlight == "T":
+            draw_big_text(img, W // 2 - 30, 410, "TIE", scale=6, fill="#fbbf24")
+
+        return img, draw
+
+    def draw_card_face(img: Image.Image, draw: ImageDraw.ImageDraw, x: int, y: int, r: str, s: str, face_up=True):
+        cw, ch = 110, 155
+        if face_up:
+            draw.rounded_rectangle([x, y, x + cw, y + ch], radius=12, fill="#f8fafc", outline="#94a3b8", width=3)
+            draw_big_text(img, x + 10, y + 8, str(r), scale=7, fill="#111111")
+            draw_suit(draw, x + 34, y + 90, s)
+        else:
+            draw.rounded_rectangle([x, y, x + cw, y + ch], radius=12, fill="#1e293b", outline="#64748b", width=3)
+            for i in range(0, cw, 12):
+                draw.line([x + i, y, x, y + i], fill="#334155", width=2)
+                draw.line([x + cw - i, y + ch, x + cw, y + ch - i], fill="#334155", width=2)
+
+    px0, py0 = 70, 130
+    bx0, by0 = W - 70 - (110 * 3 + 20 * 2), 130
+    gap = 20
+
+    reveal_steps = []
+    if len(player) >= 1: reveal_steps.append(("P", 0))
+    if len(banker) >= 1: reveal_steps.append(("B", 0))
+    if len(player) >= 2: reveal_steps.append(("P", 1))
+    if len(banker) >= 2: reveal_steps.append(("B", 1))
+    if len(player) >= 3: reveal_steps.append(("P", 2))
+    if len(banker) >= 3: reveal_steps.append(("B", 2))
+    if not steps:
+        reveal_steps = []
+
+    shown_p, shown_b = set(), set()
+
+    # frame 0: all back
+    img, draw = base_frame("Revealing...", None)
+    for i in range(3):
+        if i < len(player):
+            draw_card_face(img, draw, px0 + i * (110 + gap), py0, "?", "♠", face_up=False)
+        if i < len(banker):
+            draw_card_face(img, draw, bx0 + i * (110 + gap), by0, "?", "♠", face_up=False)
+    yield img, 500
+
+    # reveal one by one
+    for side, idx in reveal_steps:
+        (shown_p if side == "P" else shown_b).add(idx)
+
+        img, draw = base_frame("Revealing...", None)
+
+        for i in range(len(player)):
+            r, s = player[i]
+            draw_card_face(img, draw, px0 + i * (110 + gap), py0, r, s, face_up=(i in shown_p))
+
+        for i in range(len(banker)):
+            r, s = banker[i]
+            draw_card_face(img, draw, bx0 + i * (110 + gap), by0, r, s, face_up=(i in shown_b))
+
+        draw_big_text(img, 55, 320, f"TOTAL: {p}", scale=5, fill="#e2e8f0")
+        draw_big_text(img, W - 270, 320, f"TOTAL: {b}", scale=5, fill="#e2e8f0")
+
+        yield img, 450
+
+    # final frame
+    highlight = result if result in ("P", "B") else "T"
+    img, draw = base_frame("RESULT", highlight)
+
+    for i in range(len(player)):
+        r, s = player[i]
+        draw_card_face(img, draw, px0 + i * (110 + gap), py0, r, s, face_up=True)
+
+    for i in range(len(banker)):
+        r, s = banker[i]
+        draw_card_face(img, draw, bx0 + i * (110 + gap), by0, r, s, face_up=True)
+
+    draw_big_text(img, 55, 320, f"TOTAL: {p}", scale=5, fill="#e2e8f0")
+    draw_big_text(img, W - 270, 320, f"TOTAL: {b}", scale=5, fill="#e2e8f0")
+    draw_big_text(img, W // 2 - 200, 410, f"RESULT: {result_label or result}", scale=5, fill="#fbbf24")
+
+    yield img, 1400
+
+
+def make_reveal_gif(player, banker, p, b, result, result_label: str | None = None, lite: bool = False) -> BytesIO:
+    """lite: 뒷면 + 결과 2프레임, 절반 해상도."""
+    frames = _reveal_frames(player, banker, p, b, result, result_label, steps=not lite)
+    if lite:
+        frames = ((_half(img), ms) for img, ms in frames)
+    return _write_gif(frames, "reveal.gif")
+
+
+# ================== DICE ==================
+
+def _die_frame(value: int, size: int = 300) -> Image.Image:
+    img = _canvas((size, size), "#0b1220")
+    d = ImageDraw.Draw(img)
+    d.rounded_rectangle([22, 22, size - 22, size - 22], radius=42, fill="#f8fafc", outline="#94a3b8", width=6)
+
+    def dot(cx, cy, r=18):
+        d.ellipse([cx - r, cy - r, cx + r, cy + r], fill="#111111")
+
+    x1, x2, x3 = int(size * 0.30), int(size * 0.50), int(size * 0.70)
+    y1, y2, y3 = int(size * 0.30), int(size * 0.50), int(size * 0.70)
+
+    pips = {
+        1: [(x2, y2)],
+        2: [(x1, y1), (x3, y3)],
+        3: [(x1, y1), (x2, y2), (x3, y3)],
+        4: [(x1, y1), (x3, y1), (x1, y3), (x3, y3)],
+        5: [(x1, y1), (x3, y1), (x2, y2), (x1, y3), (x3, y3)],
+        6: [(x1, y1), (x3, y1), (x1, y2), (x3, y2), (x1, y3), (x3, y3)],
+    }
+    for cx, cy in pips[value]:
+        dot(cx, cy)
+    return img
+
+
+def make_dice_gif(final_value: int, rng: random.Random | None = None, lite: bool = False) -> BytesIO:
+    # 흔들리는 느낌: 랜덤 몇 프레임 + 마지막 결과 프레임. rng 를 주면 같은 GIF 를 다시 만들 수 있다
+    # lite: 흔들기 3프레임, 절반 크기
+    rng = rng or random
+
+    def frames():
+        for _ in range(3 if lite else 7):
+            yield _die_frame(rng.randint(1, 6)), 200 if lite else 120
+        yield _die_frame(final_value), 900
+
+    if lite:
+        return _write_gif(((_half(img), ms) for img, ms in frames()), "dice.gif")
+    return _write_gif(frames(), "dice.gif")
+
+
+# ================== STATIC ==================
+
+def _png(img: Image.Image, name: str) -> BytesIO:
+    bio = BytesIO()
+    bio.name = name
+    img.save(bio, format="PNG")
+    bio.seek(0)
+    return bio
+
+
+def make_result_png(player, banker, p, b, result, result_label: str | None = None) -> BytesIO:
+    """결과 프레임 한 장 (절반 해상도)."""
+    for img, _ in _reveal_frames(player, banker, p, b, result, result_label, steps=False):
+        pass
+    return _png(_half(img), "result.png")
+
+
+def make_dice_png(final_value: int) -> BytesIO:
+    return _png(_half(_die_frame(final_value)), "dice.png")
+
+
+def warm():
+    """폰트/플러그인 로딩을 미리 해둔다 (첫 정산이 그 비용을 안 내도록)."""
+    ImageFont.load_default()
+    Image.init()
+    draw_road_image_bytes([])
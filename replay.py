@@ -0,0 +1,228 @@
+"""
+라운드 재현 / 검증 (DB 쓰기 없음).
+
+채팅 시드(seeding.py)로 바카라 슈와 다이스 눈을 다시 만들고, bet_log 의 베팅으로 settlement 를 메모리에서 다시 돌려
+round_log(결과, 하우스 손익) 와 ledger(베팅 차감, 지급/환급) 에 적힌 값과 맞춰 본다.
+
+    python replay.py --db casino.db --chat -100123
+    python replay.py --db casino.db --chat -100123 --game baccarat --round 812
+    python replay.py --db casino.db --all
+
+라운드마다:
+- deal: 시드로 다시 딘 결과 == round_log.outcome (시드 전 슈에서 딘 판은 unseeded 로 세고 결과는 기록을 믿는다)
+- ledger: bet_log 베팅 차감 + 다시 계산한 지급/환급 == 그 라운드에 묶인 ledger 줄 (유저/금액/사유 단위)
+- house: 다시 계산한 손익 == round_log.house_delta, 베팅 합 == round_log.total_bet
+채팅 단위: 바카라 손익 합 == house.profit. house.rounds 가 기록된 판 수보다 많으면 (round_log 이전 판) 차이만 보여준다.
+"""
+
+import argparse
+import collections
+import time
+
+import rules
+import seeding
+import settlement
+
+GAMES = ("baccarat", "dice")
+_LEDGER_REASONS = ("bet", "payout", "refund")
+
+
+class Shoes:
+    """main.draw_card 와 같은 규칙으로 (슈 번호, 위치) 부터 카드를 뽑는다. 슈는 셔플 한 번만."""
+
+    def __init__(self, seed: str):
+        self.seed = seed
+        self.cache: dict[int, list] = {}
+
+    def deck(self, shoe_no: int) -> list:
+        deck = self.cache.get(shoe_no)
+        if deck is None:
+            if len(self.cache) >= 4:
+                self.cache.clear()
+            deck = self.cache[shoe_no] = seeding.shoe(self.seed, shoe_no)
+        return deck
+
+    def deal(self, shoe_no: int, pos: int):
+        state = [shoe_no, pos]
+
+        def draw():
+            deck = self.deck(state[0])
+            if state[1] >= len(deck) - rules.CUT_RESERVE:
+                state[0] += 1
+                state[1] = 0
+                deck = self.deck(state[0])
+            card = deck[state[1]]
+            state[1] += 1
+            return card
+
+        return rules.deal(draw)
+
+
+class Report:
+    __slots__ = ("chat_id", "rounds", "unseeded", "mismatches", "house", "elapsed")
+
+    def __init__(self, chat_id: int):
+        self.chat_id = chat_id
+        self.rounds = collections.Counter()
+        self.unseeded = 0
+        # (game, round_id, 항목, 기록, 재현)
+        self.mismatches: list[tuple] = []
+        # (house.profit, 기록된 손익 합, house.rounds, 기록된 판 수) — 채팅 전체를 봤을 때만
+        self.house = None
+        self.elapsed = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.mismatches and self.house_gap() == 0
+
+    def house_gap(self) -> int:
+        if self.house is None:
+            return 0
+        profit, replayed, rounds, logged = self.house
+        return profit - replayed if rounds == logged else 0
+
+    def lines(self, limit: int = 20) -> list[str]:
+        total = sum(self.rounds.values())
+        rate = total / self.elapsed if self.elapsed else 0.0
+        per_game = ", ".join(f"{g} {n:,}" for g, n in sorted(self.rounds.items())) or "없음"
+        mark = "✅" if self.ok else "⚠️"
+        out = [f"{mark} {self.chat_id}  재현 {total:,}판 ({per_game})  {self.elapsed * 1000:.0f}ms, {rate:,.0f}판/s"]
+        if self.unseeded:
+            out.append(f"시드 전 슈에서 딘 판 {self.unseeded:,} (딜 검증 생략, 정산만 확인)")
+        if self.house is not None:
+            profit, replayed, rounds, logged = self.house
+            if rounds == logged:
+                out.append(f"하우스 손익 {profit:,} / 재현 {replayed:,}")
+            else:
+                out.append(f"하우스 손익 {profit:,} / 재현 {replayed:,} (기록 전 {rounds - logged:,}판 몫 {profit - replayed:+,})")
+        for game, rid, what, recorded, replayed in self.mismatches[:limit]:
+            out.append(f"{game}#{rid} {what}: 기록 {recorded} / 재현 {replayed}")
+        if len(self.mismatches) > limit:
+            out.append(f"…외 {len(self.mismatches) - limit}건")
+        return out
+
+
+def _group(rows, key=0):
+    out = collections.defaultdict(list)
+    for r in rows:
+        out[r[key]].append(r)
+    return out
+
+
+def _ledger_diff(expected: collections.Counter, got: collections.Counter) -> tuple[str, str]:
+    # (원장에만 있는 줄, 재현에만 있는 줄)
+    def fmt(c):
+        return ", ".join(f"{u}:{d:+}({r})" for (u, d, r), n in sorted(c.items()) for _ in range(n)) or "-"
+    return fmt(got - expected), fmt(expected - got)
+
+
+def replay_game(store, chat_id: int, game: str, payouts: dict[str, float],
+                report: Report, round_id: int | None = None) -> int:
+    """한 게임의 기록된 라운드를 전부 (또는 round_id 하나) 재현한다. 재현한 하우스 손익 합을 돌려준다."""
+    rounds = store.round_log(chat_id, game, round_id)
+    if not rounds:
+        return 0
+    bets = _group(store.bet_log(chat_id, game, round_id))
+    ledger = collections.defaultdict(collections.Counter)
+    for rid, uid, delta, reason in store.round_ledger(chat_id, game, round_id):
+        if reason in _LEDGER_REASONS:
+            ledger[rid][(uid, delta, reason)] += 1
+
+    seed = store.get_seed(chat_id)
+    shoes = Shoes(seed) if seed else None
+    house = 0
+    bad = report.mismatches
+
+    for rid, shoe_no, shoe_pos, outcome, total_bet, house_delta in rounds:
+        rows = bets.get(rid, ())
+        uids = [r[1] for r in rows]
+        choices = [r[2] for r in rows]
+        amounts = [r[4] for r in rows]
+
+        if game == "baccarat":
+            if shoes is None or shoe_no is None:
+                report.unseeded += 1
+            else:
+                _, _, p, b = shoes.deal(shoe_no, shoe_pos)
+                dealt = rules.winner(p, b)
+                if dealt != outcome:
+                    bad.append((game, rid, "deal", outcome, dealt))
+            # 지급 검증은 기록된 결과 기준 (딜이 어긋나도 정산이 기록대로였는지는 따로 본다)
+            out = settlement.settle_baccarat(uids, choices, amounts, outcome, payouts)
+        else:
+            value = int(outcome)
+            if seed is None:
+                report.unseeded += 1
+            else:
+                rolled = seeding.dice(seed, rid)
+                if rolled != value:
+                    bad.append((game, rid, "deal", value, rolled))
+            out = settlement.settle_dice(uids, choices, [r[3] for r in rows], amounts, value, payouts)
+
+        expected = collections.Counter((u, -a, "bet") for u, a in zip(uids, amounts))
+        expected.update((u, pay, reason) for u, pay, reason in out.credits())
+        got = ledger.get(rid, collections.Counter())
+        if expected != got:
+            bad.append((game, rid, "ledger", *_ledger_diff(expected, got)))
+
+        delta = out.total_bet - out.total_payout
+        if delta != house_delta:
+            bad.append((game, rid, "house", house_delta, delta))
+        if out.total_bet != total_bet:
+            bad.append((game, rid, "bets", total_bet, out.total_bet))
+        house += delta
+
+    report.rounds[game] += len(rounds)
+    return house
+
+
+def replay_chat(store, chat_id: int, payouts: dict[str, float], dice_payouts: dict[str, float],
+                games=GAMES, round_id: int | None = None) -> Report:
+    t0 = time.perf_counter()
+    report = Report(chat_id)
+    for game in games:
+        house = replay_game(store, chat_id, game, dice_payouts if game == "dice" else payouts, report, round_id)
+        if game == "baccarat" and round_id is None:
+            h = store.get_house(chat_id)
+            if h is not None:
+                report.house = (int(h["profit"]), house, int(h["rounds"]), report.rounds[game])
+    report.elapsed = time.perf_counter() - t0
+    return report
+
+
+def main():
+    ap = argparse.ArgumentParser(description="시드로 라운드를 다시 돌려 원장/하우스와 맞춰 본다")
+    ap.add_argument("--db", default="casino.db")
+    ap.add_argument("--chat", type=int, action="append", default=[])
+    ap.add_argument("--all", action="store_true", help="round_log 에 있는 채팅 전부")
+    ap.add_argument("--game", choices=GAMES, default=None)
+    ap.add_argument("--round", type=int, default=None, help="한 라운드만 (--game 필요)")
+    args = ap.parse_args()
+    if args.round is not None and not args.game:
+        raise SystemExit("--round 는 --game 과 같이")
+
+    import main as bot  # PAYOUTS 는 봇 설정 그대로
+    from store import SqliteStore
+
+    store = SqliteStore(args.db)
+    chats = list(args.chat)
+    if args.all:
+        chats += [r[0] for r in store.db().execute("SELECT DISTINCT chat_id FROM round_log ORDER BY chat_id")]
+    if not chats:
+        raise SystemExit("--chat 또는 --all")
+
+    games = (args.game,) if args.game else GAMES
+    failed = 0
+    for chat_id in chats:
+        report = replay_chat(store, chat_id, bot.PAYOUTS, bot.DICE_PAYOUT, games, args.round)
+        print("\n".join(report.lines()))
+        failed += not report.ok
+
+    drift = store.reconcile()
+    print(f"balances: {'ok' if not drift else f'{len(drift)} users differ from ledger (/audit)'}")
+    if failed or drift:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+바카라 진행 규칙 (카드 값, 3번째 카드, 승패). DB/셔플 없이 순수 함수만.
+
+main.play_baccarat 과 sim_baccarat / odds 가 같은 규칙을 쓰도록 여기 한 곳에 둔다.
+"""
+
+# 8덱 슈. draw_card 는 위치가 len(deck) - CUT_RESERVE 이상이면 새 슈로 바꾼다
+DECKS = 8
+CUT_RESERVE = 6
+
+SUITS = ["♠", "♥", "♦", "♣"]
+RANKS = ["A", "2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K"]
+
+
+def fresh_shoe() -> list[tuple[str, str]]:
+    """셔플 전 8덱. 순서가 바뀌면 저장된 시드로 다시 만든 슈가 달라지니 건드리지 않는다."""
+    return [(r, s) for _ in range(DECKS) for s in SUITS for r in RANKS]
+
+
+def card_value(rank: str) -> int:
+    if rank == "A":
+        return 1
+    if rank in ["10", "J", "Q", "K"]:
+        return 0
+    return int(rank)
+
+
+def banker_draws(b: int, third: int | None) -> bool:
+    """
+    내추럴이 아닐 때 뱅커가 3번째 카드를 받는지.
+    b: 뱅커 두 장 합, third: 플레이어 3번째 카드 값 (플레이어가 안 받았으면 None)
+    """
+    if third is None:
+        return b <= 5
+    v = third
+    return (
+        b <= 2 or
+        (b == 3 and v != 8) or
+        (b == 4 and 2 <= v <= 7) or
+        (b == 5 and 4 <= v <= 7) or
+        (b == 6 and 6 <= v <= 7)
+    )
+
+
+# [b][v] — 플레이어가 3번째 카드(값 v)를 받았을 때 뱅커 합 b 에서 받는지. 벡터 연산용
+BANKER_TABLE = [[banker_draws(b, v) for v in range(10)] for b in range(10)]
+
+
+def total(values) -> int:
+    return sum(values) % 10
+
+
+def deal(draw):
+    """
+    draw() 가 주는 카드로 한 판을 진행한다. 순서: 플레이어 2장, 뱅커 2장, (플레이어 3번째), (뱅커 3번째).
+    카드는 (rank, suit). (player, banker, p, b) 를 돌려준다.
+    """
+    player = [draw(), draw()]
+    banker = [draw(), draw()]
+
+    p = total(card_value(r) for r, _ in player)
+    b = total(card_value(r) for r, _ in banker)
+
+    # natural
+    if p in (8, 9) or b in (8, 9):
+        return player, banker, p, b
+
+    third = None
+    if p <= 5:
+        player.append(draw())
+        third = card_value(player[2][0])
+        p = total(card_value(r) for r, _ in player)
+
+    if banker_draws(b, third):
+        banker.append(draw())
+        b = total(card_value(r) for r, _ in banker)
+
+    return player, banker, p, b
+
+
+def winner(p: int, b: int) -> str:
+    if p > b:
+        return "P"
+    if b > p:
+        return "B"
+    return "T"
@@ -0,0 +1,62 @@
+"""
+채팅별 시드 난수.
+
+채팅마다 마스터 시드 하나를 DB 에 남기고 (Store.ensure_seed), 게임 난수는 전부 거기서 파생한 스트림으로 뽑는다.
+- shoe k: k 번째 슈 셔플 (1부터)
+- dice r: 다이스 라운드 r 의 눈
+- spin: (유저, 날짜, 그날 몇 번째) 룰렛 결과
+- shake r: 다이스 GIF 흔들림 프레임 (결과와 무관, 같은 GIF 를 다시 만들 수 있게)
+
+PREDEAL 봉인(commitment)도 여기: 라운드를 열 때 딘 핸드를 sha256 으로 먼저 공개하고, 끝난 뒤 원문을 공개한다.
+
+스트림은 random.Random("시드:이름:키...") 로 만든다. 문자열 시드는 sha512 로 섞이고 파이썬 버전이 바뀌어도 같다.
+스트림끼리 상태를 공유하지 않아서 순서와 상관없이 한 라운드만 따로 다시 만들 수 있다 (replay.py).
+"""
+
+import hashlib
+import random
+import secrets
+
+import rules
+
+
+def new_seed(master: str | None = None, chat_id: int | None = None) -> str:
+    """master 가 있으면 (master, chat_id) 로 고정 (벤치/재현용), 없으면 무작위 128비트."""
+    if master:
+        return hashlib.sha256(f"{master}:{chat_id}".encode()).hexdigest()[:32]
+    return secrets.token_hex(16)
+
+
+def stream(seed: str, name: str, *key) -> random.Random:
+    return random.Random(":".join((seed, name, *map(str, key))))
+
+
+def shoe(seed: str, shoe_no: int) -> list[tuple[str, str]]:
+    deck = rules.fresh_shoe()
+    stream(seed, "shoe", shoe_no).shuffle(deck)
+    return deck
+
+
+def dice(seed: str, round_id: int) -> int:
+    return stream(seed, "dice", round_id).randint(1, 6)
+
+
+def spin(seed: str, uid: int, day: str, used: int, table: list[tuple[int, int]]) -> int:
+    rewards = [r for r, _ in table]
+    weights = [w for _, w in table]
+    return stream(seed, "spin", uid, day, used).choices(rewards, weights=weights, k=1)[0]
+
+
+def shake(seed: str, round_id: int) -> random.Random:
+    return stream(seed, "shake", round_id)
+
+
+def seal(chat_id: int, round_id: int, player, banker, nonce: str | None = None) -> tuple[str, str, str]:
+    """
+    PREDEAL 봉인. (nonce, 원문, sha256 hex).
+    nonce 없이 해시하면 가능한 핸드가 몇 안 돼서 해시만 보고 역산된다. 원문은 정산 때 공개한다.
+    """
+    nonce = nonce or secrets.token_hex(16)
+    cards = lambda hand: "".join(f"{r}{s}" for r, s in hand)
+    text = f"{chat_id}:{round_id}:{cards(player)}|{cards(banker)}:{nonce}"
+    return nonce, text, hashlib.sha256(text.encode()).hexdigest()
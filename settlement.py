@@ -0,0 +1,198 @@
+"""
+라운드 정산 계산 (DB/텔레그램 없이 순수 계산만).
+
+베팅을 열(user_id / 선택 / 금액)로 받아서 베팅별 지급액, 하우스 손익, 당첨 수를 한 번에 낸다.
+베팅이 VECTOR_MIN_BETS 개 이상이면 numpy 로 벡터 연산, 그보다 적거나 numpy 가 없으면 순수 파이썬.
+두 경로의 결과는 같다 (지급액은 둘 다 float64 곱을 정수로 자른 값).
+
+결과(Outcome)는 Store.settle_* 에 넘길 credits / stats 와, 정산 메시지 줄을 만들 rows() 를 준다.
+"""
+
+import itertools
+import os
+
+# 베팅별 결과 종류
+LOSE, WIN, REFUND = 0, 1, 2
+REASONS = {WIN: "payout", REFUND: "refund"}
+
+VECTOR_MIN_BETS = int(os.getenv("SETTLE_VECTOR_MIN", "512"))
+
+_np = None
+
+
+def _numpy():
+    # numpy import 가 수십 ms 라 큰 라운드가 처음 올 때 불러온다. 없으면 파이썬 경로로
+    global _np
+    if _np is None:
+        try:
+            import numpy
+            _np = numpy
+        except ImportError:
+            _np = False
+    return _np or None
+
+
+def warm():
+    _numpy()
+
+
+def _use_numpy(n: int):
+    return _numpy() if n >= VECTOR_MIN_BETS else None
+
+
+def _letters(np, letters: list):
+    return np.frombuffer("".join(letters).encode("ascii"), dtype=np.uint8)
+
+
+class Outcome:
+    """
+    열은 베팅 순서 그대로. 파이썬 경로면 list, numpy 경로면 ndarray.
+    choices: 바카라 P/B/T, 다이스 BIG/SMALL/EXACT
+    payouts: 베팅별 돌려줄 포인트 (당첨금/환급, 꽝은 0)
+    kinds: LOSE / WIN / REFUND
+    extra: 다이스 EXACT 숫자 (바카라는 None)
+    """
+
+    __slots__ = ("user_ids", "choices", "extra", "amounts", "payouts", "kinds",
+                 "total_bet", "total_payout", "winners")
+
+    def __init__(self, user_ids, choices, extra, amounts, payouts, kinds):
+        self.user_ids = user_ids
+        self.choices = choices
+        self.extra = extra
+        self.amounts = amounts
+        self.payouts = payouts
+        self.kinds = kinds
+        self.total_bet = int(sum(amounts)) if isinstance(amounts, list) else int(amounts.sum())
+        self.total_payout = int(sum(payouts)) if isinstance(payouts, list) else int(payouts.sum())
+        if isinstance(kinds, list):
+            self.winners = kinds.count(WIN)
+        else:
+            self.winners = int((kinds == WIN).sum())
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def credits(self) -> list[tuple[int, int, str]]:
+        """Store.settle_* 용 [(user_id, amount, reason)] — 지급액이 있는 베팅만."""
+        if isinstance(self.payouts, list):
+            return [
+                (uid, pay, REASONS[kind])
+                for uid, pay, kind in zip(self.user_ids, self.payouts, self.kinds) if pay > 0
+            ]
+        np = _np
+        idx = np.flatnonzero(self.payouts > 0)
+        return [
+            (uid, pay, REASONS[kind])
+            for uid, pay, kind in zip(self.user_ids[idx].tolist(), self.payouts[idx].tolist(), self.kinds[idx].tolist())
+        ]
+
+    def stats(self) -> list[tuple[int, int, int, int]]:
+        """Store.settle_* 용 [(user_id, 베팅액, 돌려받은 액, 적중 1/0)] — 베팅 전부."""
+        if isinstance(self.payouts, list):
+            return [
+                (uid, amt, pay, int(kind == WIN))
+                for uid, amt, pay, kind in zip(self.user_ids, self.amounts, self.payouts, self.kinds)
+            ]
+        win = (self.kinds == WIN).astype(_np.int8)
+        return list(zip(self.user_ids.tolist(), self.amounts.tolist(), self.payouts.tolist(), win.tolist()))
+
+    def rows(self):
+        """(user_id, choice, extra, amount, payout, kind) 를 베팅 순서대로. 메시지 줄 만들 만큼만 꺼내 쓴다."""
+        extra = self.extra if self.extra is not None else itertools.repeat(None)
+        return zip(self.user_ids, self.choices, extra, self.amounts, self.payouts, self.kinds)
+
+
+# ================== BACCARAT ==================
+
+def settle_baccarat(user_ids: list, choices: list, amounts: list,
+                    result: str, payouts: dict[str, float]) -> Outcome:
+    """
+    열은 Store.bet_columns 그대로. 타이면 T 베팅은 배당, 나머지는 원금 환급. 아니면 맞춘 쪽만 배당.
+    """
+    mult = payouts[result]
+
+    np = _use_numpy(len(user_ids))
+    if np is None:
+        pays, kinds = [], []
+        for choice, amt in zip(choices, amounts):
+            if choice == result:
+                pays.append(int(amt * mult))
+                kinds.append(WIN)
+            elif result == "T":
+                pays.append(amt)
+                kinds.append(REFUND)
+            else:
+                pays.append(0)
+                kinds.append(LOSE)
+        return Outcome(user_ids, choices, None, amounts, pays, kinds)
+
+    n = len(user_ids)
+    uid_a = np.fromiter(user_ids, np.int64, n)
+    amt_a = np.fromiter(amounts, np.int64, n)
+    # 선택은 한 글자라 바이트 배열로 비교한다 (문자열 배열 만드는 것보다 10배 빠름)
+    ch_a = _letters(np, choices)
+
+    win = ch_a == ord(result)
+    kinds = np.where(win, WIN, REFUND if result == "T" else LOSE).astype(np.int8)
+    pays = np.where(win, (amt_a * mult).astype(np.int64), amt_a if result == "T" else 0)
+    return Outcome(uid_a, choices, None, amt_a, pays, kinds)
+
+
+# ================== DICE ==================
+
+def dice_hit(bet_type: str, exact_value: int | None, dice_value: int) -> bool:
+    if bet_type == "BIG":
+        return dice_value >= 4
+    if bet_type == "SMALL":
+        return dice_value <= 3
+    if bet_type == "EXACT":
+        return exact_value == dice_value
+    return False
+
+
+def settle_dice(user_ids: list, bet_types: list, exact_values: list, amounts: list,
+                dice_value: int, payouts: dict[str, float]) -> Outcome:
+    """열은 Store.dice_bet_columns 그대로. BIG 4~6, SMALL 1~3, EXACT 숫자 일치."""
+    np = _use_numpy(len(user_ids))
+    if np is None:
+        pays, kinds = [], []
+        for bet_type, ex, amt in zip(bet_types, exact_values, amounts):
+            if dice_hit(bet_type, ex, dice_value):
+                pays.append(int(amt * payouts[bet_type]))
+                kinds.append(WIN)
+            else:
+                pays.append(0)
+                kinds.append(LOSE)
+        return Outcome(user_ids, bet_types, exact_values, amounts, pays, kinds)
+
+    n = len(user_ids)
+    uid_a = np.fromiter(user_ids, np.int64, n)
+    amt_a = np.fromiter(amounts, np.int64, n)
+    ex_a = np.fromiter((e or 0 for e in exact_values), np.int8, n)
+    # BIG / SMALL / EXACT 는 첫 글자가 다 달라서 첫 글자만 본다
+    bt_a = _letters(np, [t[0] for t in bet_types])
+
+    big, small, exact = bt_a == ord("B"), bt_a == ord("S"), bt_a == ord("E")
+    win = (big & (dice_value >= 4)) | (small & (dice_value <= 3)) | (exact & (ex_a == dice_value))
+    mult_a = np.select([big, small, exact], [payouts["BIG"], payouts["SMALL"], payouts["EXACT"]], 0.0)
+    pays = np.where(win, (amt_a * mult_a).astype(np.int64), 0)
+    kinds = np.where(win, WIN, LOSE).astype(np.int8)
+    return Outcome(uid_a, bet_types, exact_values, amt_a, pays, kinds)
+
+
+# ================== MESSAGE ==================
+
+def clip_text(lines, limit: int = 3500) -> str:
+    """
+    "\\n".join(lines) 를 limit 자에서 자르고 "…(생략)" 을 붙인 것과 같은 결과.
+    lines 는 이터레이터여도 되고, limit 을 넘는 순간 더 꺼내지 않는다.
+    """
+    out = []
+    size = -1
+    for line in lines:
+        out.append(line)
+        size += len(line) + 1
+        if size > limit:
+            return "\n".join(out)[:limit] + "\n…(생략)"
+    return "\n".join(out)
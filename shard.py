@@ -0,0 +1,179 @@
+"""
+채팅 단위 샤딩: 프론트 1개 + 워커 N개 프로세스.
+
+    SHARDS=4 python main.py
+
+- 프론트: 폴링으로 업데이트를 받아 chat_id % N 으로 워커를 골라 multiprocessing 큐로 넘긴다.
+  핸들러는 돌리지 않는다.
+- 워커: 폴링 없는 Application 을 띄워 받은 업데이트를 그대로 처리한다. 그 채팅의 라운드 타이머,
+  슈, 정산은 전부 해당 워커 안에서만 돈다 (같은 채팅은 항상 같은 워커).
+- 잔액: 모든 프로세스가 같은 casino.db 를 WAL 로 공유한다. 차감은 조건부 UPDATE 한 문장(try_debit)이라
+  sqlite 가 프로세스 간 쓰기를 직렬화해서 이중 차감/음수 잔액이 생기지 않는다. users 의 주인은 그 파일 하나다.
+
+- 채팅 테이블: 워커 i 는 라운드/베팅/슈/히스토리/하우스를 casino.shard<i>of<N>.db 에 쓰고 casino.db 를 붙여 쓴다
+  (store.LOCAL_TABLES). 워커끼리 casino.db 쓰기 락을 두고 줄 서는 건 차감과 정산의 잔액/원장 부분뿐이다.
+  원자성은 store.py 의 샤드 파일 설명 참고.
+- 잔액 스냅샷과 casino.db 백업은 0번 워커만 한다. 샤드 파일 백업은 워커마다 자기 것.
+- SHARDS 를 바꾸거나 1 로 돌아가려면 봇을 멈추고 먼저 합친다 (다른 수로 만든 파일이 있으면 시작을 거부한다):
+
+    python shard.py --merge
+
+METRICS_PORT 가 있으면 프론트는 METRICS_PORT, 워커 i 는 METRICS_PORT + 1 + i 에서 자기 메트릭을 연다.
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing as mp
+import os
+import signal
+import sqlite3
+
+from telegram import Update
+from telegram.ext import Application, BaseUpdateProcessor
+
+import metrics
+from updates import chat_key
+
+log = logging.getLogger(__name__)
+
+ROUTED = metrics.counter("shard_routed_updates", "Updates forwarded to each shard worker")
+
+
+def shard_of(chat_id: int | None, shards: int) -> int:
+    # 채팅 없는 업데이트는 0번으로
+    if chat_id is None:
+        return 0
+    return chat_id % shards
+
+
+class ShardRouter(BaseUpdateProcessor):
+    """프론트용 업데이트 처리기: 처리 대신 담당 워커 큐로 보낸다."""
+
+    __slots__ = ("queues",)
+
+    def __init__(self, queues: list):
+        super().__init__(256)
+        self.queues = queues
+
+    async def do_process_update(self, update, coroutine) -> None:
+        coroutine.close()  # 프론트에는 핸들러가 없다
+        if not isinstance(update, Update):
+            return
+        idx = shard_of(chat_key(update), len(self.queues))
+        self.queues[idx].put(update.to_dict())
+        ROUTED.inc(shard=idx)
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+
+# ================== WORKER ==================
+
+def run_worker(index: int, queue):
+    """spawn 된 새 인터프리터에서 돈다."""
+    import main
+
+    if main.METRICS_PORT:
+        main.METRICS_PORT += 1 + index
+    # 채팅 테이블은 이 워커의 샤드 파일로 (처음이면 casino.db 에서 담당 채팅 행을 복사해 만든다)
+    main.SHARD_INDEX = index
+    main.init_db()
+    # Ctrl-C 는 프론트가 받아서 큐로 종료를 알린다
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_worker(main, index, queue))
+
+
+async def _worker(main, index: int, queue):
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGTERM, queue.put_nowait, None)
+
+    app = main.build_application(polling=False)
+    async with app:
+        await app.start()
+        if app.post_init:
+            await app.post_init(app)
+        log.info("shard %d ready", index)
+        try:
+            while True:
+                data = await loop.run_in_executor(None, queue.get)
+                if data is None:
+                    break
+                await app.update_queue.put(Update.de_json(data, app.bot))
+        finally:
+            await app.stop()
+            if app.post_shutdown:
+                await app.post_shutdown(app)
+
+
+# ================== FRONT ==================
+
+def run(shards: int):
+    import main
+
+    ctx = mp.get_context("spawn")
+    queues = [ctx.Queue() for _ in range(shards)]
+    procs = [
+        ctx.Process(target=run_worker, args=(i, queues[i]), name=f"shard-{i}")
+        for i in range(shards)
+    ]
+    for p in procs:
+        p.start()
+
+    async def front_startup(app: Application):
+        if main.METRICS_PORT:
+            app.bot_data["metrics_server"] = await metrics.serve(main.METRICS_HOST, main.METRICS_PORT)
+
+    front = (
+        Application.builder()
+        .token(main.TOKEN)
+        .concurrent_updates(ShardRouter(queues))
+        .post_init(front_startup)
+        .build()
+    )
+    try:
+        front.run_polling()
+    finally:
+        for q in queues:
+            q.put(None)
+        for p in procs:
+            p.join(timeout=30)
+            if p.is_alive():
+                p.terminate()
+
+
+# ================== MERGE ==================
+
+def merge(db_path: str) -> list[tuple[str, int]]:
+    """샤드 파일을 전부 casino.db 로 되돌리고 <파일>.merged 로 이름을 바꾼다. [(파일, 옮긴 행 수)]."""
+    import store
+
+    out = []
+    for path, index, shards in store.shard_files(db_path):
+        moved = store.merge_shard(db_path, path, lambda chat_id, i=index, n=shards: shard_of(chat_id, n) == i)
+        # WAL 을 본 파일로 접어 -wal/-shm 없이 한 파일로 남긴다
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA journal_mode=DELETE")
+        conn.close()
+        os.replace(path, path + ".merged")
+        out.append((path, moved))
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="샤드 파일 관리")
+    ap.add_argument("--db", default="casino.db")
+    ap.add_argument("--merge", action="store_true", help="샤드 파일의 채팅 테이블을 casino.db 로 되돌린다 (봇을 멈추고)")
+    args = ap.parse_args()
+    if not args.merge:
+        ap.print_help()
+        return
+    for path, moved in merge(args.db):
+        print(f"{path}: {moved:,} rows -> {args.db}")
+
+
+if __name__ == "__main__":
+    main()
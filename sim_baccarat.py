@@ -0,0 +1,247 @@
+"""
+바카라 몬테카를로 시뮬레이터 (오프라인, numpy).
+
+main.play_baccarat 와 같은 규칙(rules.py)과 같은 슈 운용으로 수억 판을 돌려
+P/B/T 빈도, PAYOUTS 기준 하우스 엣지, engine.streak_bonus 의 추가 비용을 낸다.
+
+    python sim_baccarat.py --hands 100000000 --procs 4
+    python sim_baccarat.py --hands 2000000 --verify 20000   # 벡터 경로를 rules.deal 과 대조
+
+슈 운용: draw_card 는 카드를 뽑을 때마다 위치가 len(deck) - 6 이상이면 새 슈로 바꾼다 (판 도중이어도).
+그래서 한 채팅이 보는 카드 흐름은 "셔플한 8덱의 앞 410장" 을 이어붙인 것과 정확히 같다.
+레인(lane) 하나가 채팅 하나이고, 레인마다 현재 슈/다음 슈를 들고 여러 레인을 한 번에 한 판씩 진행한다.
+
+정산 기준 (main.settle_round):
+- 맞추면 amount * PAYOUTS[선택] 을 돌려받는다 (원금 포함). P 2.0, B 1.95, T 8.0
+- 타이가 나오면 P/B 베팅은 원금 환급(push)
+연승 보너스 (engine.settle_round): P/B 를 맞추면 배당에 streak_bonus(연승) 을 더한다.
+타이 환급/패배면 연승 0, T 적중은 연승 +1 이지만 보너스는 없다.
+"""
+
+import argparse
+import json
+import math
+import multiprocessing as mp
+import time
+
+import numpy as np
+
+import rules
+
+SHOE_CARDS = rules.DECKS * 52
+USABLE = SHOE_CARDS - rules.CUT_RESERVE  # 410
+
+# 한 덱의 카드 값: A=1, 2~9, 10/J/Q/K=0 (무늬 4개)
+_DECK_VALUES = np.array([rules.card_value(r) for r in
+                         ["A", "2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K"]] * 4, dtype=np.int8)
+SHOE_VALUES = np.tile(_DECK_VALUES, rules.DECKS)
+
+BANKER_TABLE = np.array(rules.BANKER_TABLE, dtype=bool)
+
+RESULTS = ("P", "B", "T")
+
+
+def _streak_table():
+    # 연승 s 의 보너스. cap 이상은 STREAK_MAX 로 같다
+    import engine
+    cap = engine.STREAK_START + math.ceil(engine.STREAK_MAX / engine.STREAK_STEP)
+    return np.array([engine.streak_bonus(s) for s in range(cap + 1)]), cap
+
+
+# ================== CORE ==================
+
+class Table:
+    """레인 L 개. 각 레인은 독립된 채팅 하나 (처음엔 새 슈)."""
+
+    def __init__(self, lanes: int, rng: np.random.Generator):
+        self.rng = rng
+        self.lanes = lanes
+        # 레인마다 [현재 슈 410장 | 다음 슈 410장]. 한 판은 최대 6장이라 다음 슈까지만 보면 된다
+        self.buf = np.ascontiguousarray(np.concatenate([self._shoes(lanes), self._shoes(lanes)], axis=1))
+        self._flat = self.buf.reshape(-1)  # 같은 메모리를 보는 1차원 뷰
+        self.pos = np.zeros(lanes, dtype=np.int64)
+        self._base = np.arange(lanes) * (2 * USABLE)
+
+    def _shoes(self, n: int) -> np.ndarray:
+        return self.rng.permuted(np.broadcast_to(SHOE_VALUES, (n, SHOE_CARDS)), axis=1)[:, :USABLE]
+
+    def play(self):
+        """레인마다 한 판. (p, b, used) 배열을 돌려준다."""
+        start = self._base + self.pos
+        c = [self._flat[start + k] for k in range(6)]
+
+        p2 = (c[0] + c[1]) % 10
+        b2 = (c[2] + c[3]) % 10
+        natural = (p2 >= 8) | (b2 >= 8)
+
+        p_draw = ~natural & (p2 <= 5)
+        # 플레이어가 받았으면 표, 안 받았으면 5 이하에서 받는다
+        b_draw = ~natural & np.where(p_draw, BANKER_TABLE[b2, c[4]], b2 <= 5)
+
+        p = np.where(p_draw, (p2 + c[4]) % 10, p2)
+        b_card = np.where(p_draw, c[5], c[4])
+        b = np.where(b_draw, (b2 + b_card) % 10, b2)
+
+        used = 4 + p_draw + b_draw
+        self._advance(used)
+        return p, b, used
+
+    def _advance(self, used: np.ndarray):
+        self.pos += used
+        done = self.pos >= USABLE
+        n = int(done.sum())
+        if n:
+            self.buf[done, :USABLE] = self.buf[done, USABLE:]
+            self.buf[done, USABLE:] = self._shoes(n)
+            self.pos[done] -= USABLE
+
+
+def simulate(hands: int, lanes: int, seed, progress: bool = False) -> dict:
+    """hands 판 (lanes 의 배수로 올림) 을 돌려 집계만 돌려준다."""
+    rng = np.random.default_rng(seed)
+    lanes = max(1, min(lanes, hands))
+    table = Table(lanes, rng)
+    bonus_table, cap = _streak_table()
+
+    steps = -(-hands // lanes)
+    counts = np.zeros(3, dtype=np.int64)           # P, B, T
+    streak = np.zeros((2, lanes), dtype=np.int64)  # 항상 P / 항상 B 를 거는 사람의 연승
+    bonus_sum = np.zeros(2)
+    cards = 0
+
+    t0 = time.perf_counter()
+    for step in range(steps):
+        p, b, used = table.play()
+        p_win = p > b
+        b_win = b > p
+        n_p, n_b = int(p_win.sum()), int(b_win.sum())
+        counts += (n_p, n_b, lanes - n_p - n_b)
+        cards += int(used.sum())
+
+        for k, win in enumerate((p_win, b_win)):
+            streak[k] = np.where(win, streak[k] + 1, 0)
+            bonus_sum[k] += bonus_table[np.minimum(streak[k], cap)].sum()
+
+        if progress and step and step % 200 == 0:
+            done = (step + 1) * lanes
+            rate = done / (time.perf_counter() - t0)
+            print(f"  {done:,} hands  {rate / 1e6:.1f}M/s", flush=True)
+
+    return {"hands": steps * lanes, "counts": counts.tolist(), "bonus_sum": bonus_sum.tolist(), "cards": cards}
+
+
+def _worker(args):
+    hands, lanes, seed = args
+    return simulate(hands, lanes, seed)
+
+
+def run(hands: int, lanes: int, procs: int, seed: int, progress: bool = False) -> dict:
+    if procs <= 1:
+        return simulate(hands, lanes, seed, progress)
+
+    # 프로세스마다 독립 난수 스트림
+    seeds = np.random.SeedSequence(seed).spawn(procs)
+    share = -(-hands // procs)
+    with mp.get_context("spawn").Pool(procs) as pool:
+        parts = pool.map(_worker, [(share, lanes, s) for s in seeds])
+    return {
+        "hands": sum(r["hands"] for r in parts),
+        "counts": np.sum([r["counts"] for r in parts], axis=0).tolist(),
+        "bonus_sum": np.sum([r["bonus_sum"] for r in parts], axis=0).tolist(),
+        "cards": sum(r["cards"] for r in parts),
+    }
+
+
+# ================== REPORT ==================
+
+def report(raw: dict, payouts: dict[str, float]) -> dict:
+    n = raw["hands"]
+    freq = {k: c / n for k, c in zip(RESULTS, raw["counts"])}
+    se = {k: math.sqrt(f * (1 - f) / n) for k, f in freq.items()}
+    tie = freq["T"]
+
+    edge = {}
+    for choice in RESULTS:
+        # 1 걸었을 때 돌려받는 기대값 - 1. P/B 는 타이에 원금 환급
+        back = freq[choice] * payouts[choice] + (tie if choice != "T" else 0.0)
+        edge[choice] = 1.0 - back
+
+    streak = {}
+    for k, choice in enumerate(("P", "B")):
+        # 매 판 1 씩 걸 때 판당 추가 지급 = 하우스 엣지에서 빠지는 몫
+        cost = raw["bonus_sum"][k] / n
+        streak[choice] = {"bonus_per_unit": cost, "edge_with_bonus": edge[choice] - cost}
+
+    return {
+        "hands": n,
+        "cards_per_hand": raw["cards"] / n,
+        "freq": freq,
+        "stderr": se,
+        "house_edge": edge,
+        "streak_bonus": streak,
+        "payouts": payouts,
+    }
+
+
+def print_report(r: dict):
+    print(f"hands {r['hands']:,}   cards/hand {r['cards_per_hand']:.4f}")
+    for k in RESULTS:
+        print(f"  {k}  freq {r['freq'][k]:.6f} ± {r['stderr'][k]:.6f}   "
+              f"edge {r['house_edge'][k] * 100:+.4f}%   (payout x{r['payouts'][k]})")
+    for k in ("P", "B"):
+        s = r["streak_bonus"][k]
+        print(f"  streak_bonus on {k}: +{s['bonus_per_unit'] * 100:.4f}% paid per unit bet "
+              f"-> edge {s['edge_with_bonus'] * 100:+.4f}%")
+
+
+# ================== VERIFY ==================
+
+def verify(hands: int, seed: int) -> int:
+    """같은 카드로 rules.deal 을 한 장씩 돌려 벡터 결과와 비교한다. 불일치 수를 돌려준다."""
+    lanes = 64
+    table = Table(lanes, np.random.default_rng(seed))
+    bad = 0
+    for _ in range(-(-hands // lanes)):
+        # 판 시작 전 레인별 남은 카드 흐름 (현재 슈 나머지 + 다음 슈)
+        streams = [iter(table.buf[i, table.pos[i]:].tolist()) for i in range(lanes)]
+        p, b, used = table.play()
+        for i, it in enumerate(streams):
+            # rules.card_value 는 숫자 문자열을 그대로 값으로 읽는다 ("0" -> 0, "1" -> 1)
+            player, banker, sp, sb = rules.deal(lambda: (str(next(it)), ""))
+            bad += (sp, sb, len(player) + len(banker)) != (int(p[i]), int(b[i]), int(used[i]))
+    return bad
+
+
+def main():
+    ap = argparse.ArgumentParser(description="바카라 하우스 엣지 / 연승 보너스 비용 시뮬레이터")
+    ap.add_argument("--hands", type=int, default=10_000_000)
+    ap.add_argument("--lanes", type=int, default=100_000, help="동시에 진행할 채팅(슈) 수. 메모리 ~ lanes * 820B")
+    ap.add_argument("--procs", type=int, default=1)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--verify", type=int, default=0, help="이만큼 판을 rules.deal 과 대조하고 시작")
+    ap.add_argument("--out", default=None, help="결과 JSON 경로")
+    args = ap.parse_args()
+
+    if args.verify:
+        bad = verify(args.verify, args.seed)
+        print(f"verify: {bad} mismatches in {args.verify:,} hands")
+        if bad:
+            raise SystemExit(1)
+
+    import main as bot  # PAYOUTS 는 봇 설정 그대로
+    t0 = time.perf_counter()
+    raw = run(args.hands, args.lanes, args.procs, args.seed, progress=args.procs <= 1)
+    wall = time.perf_counter() - t0
+
+    r = report(raw, dict(bot.PAYOUTS))
+    r["wall_s"] = round(wall, 3)
+    r["params"] = vars(args)
+    print_report(r)
+    print(f"{r['hands'] / wall / 1e6:.1f}M hands/s  ({wall:.1f}s)")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(r, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
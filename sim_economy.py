@@ -0,0 +1,321 @@
+"""
+포인트 경제 시뮬레이터 (오프라인, numpy).
+
+수급원: 가입 지급(STARTING_POINTS), /daily, /spin(SPIN_TABLE), 채팅 적립(economy.activity_reward)
+소진처: 바카라 / 다이스 하우스 엣지
+유저 N 명을 행동 프로필별로 나눠 하루 단위로 굴리고, 포인트 총량 / 랭킹 쏠림 / 하우스 손익 추이를 낸다.
+
+    python sim_economy.py --users 100000 --days 365
+    python sim_economy.py --set DAILY_REWARD=50000 --set SPIN_DAILY_LIMIT=3 --out econ.json
+    python sim_economy.py --economy legacy          # economy.py / engine.py 쪽 상수로
+
+모델 (하루 한 스텝, 유저 전체를 벡터로):
+- 가입일은 --join-days 안에서 균등. 가입하면 STARTING_POINTS.
+- 접속한 날: 출석 확률만큼 /daily, 룰렛 SPIN_DAILY_LIMIT 회까지 (프로필 평균, 포아송),
+  메시지 수 포아송 -> min(msgs // ACTIVITY_STEP, ACTIVITY_MAX_STEPS) * ACTIVITY_REWARD.
+- 베팅: 하루 판 수 포아송, 한 판 금액은 그날 시작 잔액의 stake 비율 (최소 1). 그날 건 총액이 잔액을 넘지 않게 판 수를 자른다.
+  판마다 (선택, 결과) 조합을 뽑는다. 지급은 main.settle_round 와 같이 int(금액 * 배당), 바카라 타이는 P/B 환급.
+- 바카라 확률은 새 8덱 슈 첫 판의 정확한 값 (odds.next_hand). sim_baccarat 로 본 슈 평균과 소수 넷째 자리까지 같다.
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+# 프로필: share 인원 비율, active 하루 접속 확률, daily 접속 시 출석 확률, spins 접속 시 룰렛 평균 횟수,
+# msgs 접속 시 메시지 평균, bets 접속 시 바카라 판 수 평균, dice 다이스 판 수 평균, stake 한 판 금액 / 잔액,
+# choice 바카라 P/B/T 비율, dice_mix 다이스 BIG+SMALL / EXACT 비율
+PROFILES = {
+    "casual": {"share": 0.70, "active": 0.25, "daily": 0.6, "spins": 2, "msgs": 15, "bets": 3, "dice": 1,
+               "stake": 0.02, "choice": (0.45, 0.45, 0.10), "dice_mix": (0.8, 0.2)},
+    "regular": {"share": 0.25, "active": 0.70, "daily": 0.95, "spins": 5, "msgs": 60, "bets": 15, "dice": 5,
+                "stake": 0.05, "choice": (0.45, 0.50, 0.05), "dice_mix": (0.7, 0.3)},
+    "whale": {"share": 0.05, "active": 0.95, "daily": 1.0, "spins": 5, "msgs": 150, "bets": 60, "dice": 20,
+              "stake": 0.15, "choice": (0.40, 0.55, 0.05), "dice_mix": (0.6, 0.4)},
+}
+
+
+def load_constants(which: str) -> dict:
+    """봇 상수를 코드에서 그대로 읽는다. main 이 실제 배포본, legacy 는 economy/engine 쪽."""
+    import economy
+    if which == "legacy":
+        import engine
+        c = {
+            "STARTING_POINTS": economy.STARTING_POINTS,
+            "DAILY_REWARD": economy.DAILY_REWARD,
+            "SPIN_DAILY_LIMIT": economy.SPIN_DAILY_LIMIT,
+            "SPIN_TABLE": list(economy.SPIN_TABLE),
+            "PAYOUTS": dict(engine.PAYOUTS),
+        }
+    else:
+        import main
+        c = {
+            "STARTING_POINTS": main.STARTING_POINTS,
+            "DAILY_REWARD": main.DAILY_REWARD,
+            "SPIN_DAILY_LIMIT": main.SPIN_DAILY_LIMIT,
+            "SPIN_TABLE": list(main.SPIN_TABLE),
+            "PAYOUTS": dict(main.PAYOUTS),
+        }
+    import main
+    c["DICE_PAYOUT"] = dict(main.DICE_PAYOUT)
+    c["ACTIVITY_STEP"] = economy.ACTIVITY_STEP
+    c["ACTIVITY_REWARD"] = economy.ACTIVITY_REWARD
+    c["ACTIVITY_MAX_STEPS"] = economy.ACTIVITY_MAX_STEPS
+    return c
+
+
+def apply_overrides(c: dict, sets: list[str]) -> dict:
+    # --set NAME=값 (숫자는 int/float, 나머지는 JSON: SPIN_TABLE=[[0,10],[500,25]])
+    for s in sets:
+        name, _, raw = s.partition("=")
+        if name not in c:
+            raise SystemExit(f"unknown constant: {name}")
+        try:
+            c[name] = json.loads(raw)
+        except ValueError:
+            raise SystemExit(f"bad value for {name}: {raw}")
+    return c
+
+
+# ================== OUTCOME TABLES ==================
+
+def baccarat_outcomes(choice_mix, payouts):
+    """한 판의 (확률, 돌려받는 배수) 범주. 지급은 int(금액 * 배수) 라 배수별로 따로 둔다."""
+    import odds
+    p_p, p_b, p_t = odds.next_hand(odds.FRESH, 410)
+    w_p, w_b, w_t = choice_mix
+    cats = [
+        (w_p * p_p, payouts["P"]), (w_p * p_t, 1.0), (w_p * p_b, 0.0),
+        (w_b * p_b, payouts["B"]), (w_b * p_t, 1.0), (w_b * p_p, 0.0),
+        (w_t * p_t, payouts["T"]), (w_t * (1 - p_t), 0.0),
+    ]
+    return _merge(cats)
+
+
+def dice_outcomes(dice_mix, payouts):
+    w_bs, w_ex = dice_mix
+    # BIG / SMALL 은 반반, EXACT 는 1/6 (settlement.dice_hit)
+    cats = [
+        (w_bs * 0.5, payouts["BIG"]), (w_bs * 0.5, 0.0),
+        (w_ex / 6, payouts["EXACT"]), (w_ex * 5 / 6, 0.0),
+    ]
+    return _merge(cats)
+
+
+def _merge(cats):
+    by_mult = {}
+    for p, m in cats:
+        by_mult[m] = by_mult.get(m, 0.0) + p
+    mults = sorted(by_mult)
+    probs = np.array([by_mult[m] for m in mults])
+    return probs / probs.sum(), np.array(mults)
+
+
+# ================== SIMULATION ==================
+
+def gini(x: np.ndarray) -> float:
+    if len(x) == 0 or x.sum() <= 0:
+        return 0.0
+    s = np.sort(x)
+    n = len(s)
+    cum = np.cumsum(s, dtype=np.float64)
+    return float((n + 1 - 2 * (cum.sum() / cum[-1])) / n)
+
+
+def _sample_returns(rng, n, unit, probs, mults):
+    """
+    유저 i 가 n[i] 번, 한 번에 unit[i] 씩 걸 때 돌려받는 합. 판마다 범주를 하나 뽑는다.
+    다항분포(유저 x 범주)보다 판 수만큼 균등난수를 뽑아 누적확률과 비교하는 쪽이 몇 배 빠르다 (하루 판 수가 수십만 단위).
+    """
+    total = int(n.sum())
+    if not total:
+        return np.zeros(len(n), dtype=np.int64)
+    u = rng.random(total, dtype=np.float32)
+    cat = np.zeros(total, dtype=np.int8)
+    for edge in np.cumsum(probs)[:-1].astype(np.float32):
+        cat += u >= edge
+    # int(금액 * 배수) 를 판마다
+    if np.ndim(unit):
+        per = (np.repeat(unit, n) * mults[cat]).astype(np.int64)
+    else:
+        per = (unit * mults[cat]).astype(np.int64)
+    cs = np.concatenate(([0], np.cumsum(per)))
+    ends = np.cumsum(n)
+    return cs[ends] - cs[ends - n]
+
+
+class Population:
+    """
+    유저 열(배열)들. 프로필별로 정렬해 두어서 한 프로필은 연속 구간이다.
+    하루치 계산은 그날 접속한 유저의 인덱스에만 한다 (보통 전체의 절반 이하).
+    """
+
+    def __init__(self, n: int, profiles: dict, c: dict, join_days: int, rng: np.random.Generator):
+        self.rng = rng
+        self.c = c
+        names = list(profiles)
+        share = np.array([profiles[k]["share"] for k in names], dtype=float)
+        self.kind = np.sort(rng.choice(len(names), size=n, p=share / share.sum()))
+        self.bounds = np.searchsorted(self.kind, np.arange(len(names) + 1))
+        self.names = names
+
+        def col(key):
+            return np.array([profiles[k][key] for k in names], dtype=float)[self.kind]
+
+        self.active_p = col("active")
+        self.daily_p = col("daily")
+        self.spins = col("spins")
+        self.msgs = col("msgs")
+        self.bets = col("bets")
+        self.dice = col("dice")
+        self.stake = col("stake")
+
+        # 프로필마다 결과 범주표가 달라서 프로필 구간 단위로 뽑는다
+        self.bac = [baccarat_outcomes(profiles[k]["choice"], c["PAYOUTS"]) for k in names]
+        self.dic = [dice_outcomes(profiles[k]["dice_mix"], c["DICE_PAYOUT"]) for k in names]
+
+        self.join = rng.integers(0, max(1, join_days), size=n)
+        self.joined = np.zeros(n, dtype=bool)
+        self.points = np.zeros(n, dtype=np.int64)
+
+        spin_table = c["SPIN_TABLE"]
+        self.spin_rewards = np.array([r for r, _ in spin_table], dtype=np.int64)
+        w = np.array([w for _, w in spin_table], dtype=float)
+        self.spin_weights = w / w.sum()
+
+        self.totals = {k: 0 for k in ("starting", "daily", "spin", "activity",
+                                      "baccarat_wagered", "baccarat_house", "dice_wagered", "dice_house")}
+
+    def _games(self, idx, rate, outcomes, game: str):
+        # 잔액 기준 한 판 금액, 잔액을 넘지 않게 판 수를 자른 뒤 판마다 결과 범주를 뽑는다
+        rng = self.rng
+        pts = self.points[idx]
+        stake = np.maximum(1, (pts * self.stake[idx]).astype(np.int64))
+        n = np.minimum(rng.poisson(rate[idx]), pts // stake)
+        returned = np.zeros_like(pts)
+        # idx 는 오름차순이라 프로필 경계로 잘린다
+        cuts = np.searchsorted(idx, self.bounds)
+        for k, (probs, mults) in enumerate(outcomes):
+            lo, hi = cuts[k], cuts[k + 1]
+            if lo < hi:
+                returned[lo:hi] = _sample_returns(rng, n[lo:hi], stake[lo:hi], probs, mults)
+        wagered = n * stake
+        self.points[idx] = pts + returned - wagered
+        self.totals[f"{game}_wagered"] += int(wagered.sum())
+        self.totals[f"{game}_house"] += int(wagered.sum() - returned.sum())
+
+    def day(self, d: int):
+        rng = self.rng
+        c = self.c
+        n = len(self.points)
+
+        new = self.join == d
+        self.joined |= new
+        self.points[new] += c["STARTING_POINTS"]
+        self.totals["starting"] += int(new.sum()) * c["STARTING_POINTS"]
+
+        idx = np.flatnonzero(self.joined & (rng.random(n) < self.active_p))
+        if not len(idx):
+            return
+
+        daily = idx[rng.random(len(idx)) < self.daily_p[idx]]
+        self.points[daily] += c["DAILY_REWARD"]
+        self.totals["daily"] += len(daily) * c["DAILY_REWARD"]
+
+        spins = np.minimum(rng.poisson(self.spins[idx]), c["SPIN_DAILY_LIMIT"])
+        got = _sample_returns(rng, spins, 1, self.spin_weights, self.spin_rewards)
+        self.points[idx] += got
+        self.totals["spin"] += int(got.sum())
+
+        msgs = rng.poisson(self.msgs[idx])
+        act = np.minimum(msgs // c["ACTIVITY_STEP"], c["ACTIVITY_MAX_STEPS"]) * c["ACTIVITY_REWARD"]
+        self.points[idx] += act
+        self.totals["activity"] += int(act.sum())
+
+        self._games(idx, self.bets, self.bac, "baccarat")
+        self._games(idx, self.dice, self.dic, "dice")
+
+    def sample(self, d: int) -> dict:
+        pts = self.points[self.joined]
+        out = {"day": d, "users": int(len(pts)), "supply": int(pts.sum())}
+        if len(pts):
+            s = np.sort(pts)[::-1]
+            total = max(1, int(s.sum()))
+            out.update({
+                "median": int(np.median(pts)),
+                "gini": round(gini(pts), 4),
+                "top1_share": round(float(s[:max(1, len(s) // 100)].sum()) / total, 4),
+                "top10_share": round(float(s[:max(1, len(s) // 10)].sum()) / total, 4),
+                "broke_share": round(float((pts == 0).mean()), 4),
+            })
+        out.update({k: v for k, v in self.totals.items()})
+        return out
+
+
+def simulate(users: int, days: int, profiles: dict, c: dict, join_days: int, seed: int,
+             every: int = 7) -> list[dict]:
+    rng = np.random.default_rng(seed)
+    pop = Population(users, profiles, c, join_days, rng)
+    series = []
+    for d in range(days):
+        pop.day(d)
+        if (d + 1) % every == 0 or d == days - 1:
+            series.append(pop.sample(d + 1))
+    return series
+
+
+def print_series(series: list[dict]):
+    print(f"{'day':>5} {'users':>7} {'supply':>16} {'median':>12} {'gini':>6} {'top1%':>6} {'top10%':>7} "
+          f"{'broke':>6} {'house_bac':>15} {'house_dice':>14}")
+    step = max(1, len(series) // 13)
+    rows = series[::step]
+    if rows[-1] is not series[-1]:
+        rows.append(series[-1])
+    for r in rows:
+        print(f"{r['day']:5d} {r['users']:7d} {r['supply']:16,d} {r.get('median', 0):12,d} {r.get('gini', 0):6.3f} "
+              f"{r.get('top1_share', 0):6.3f} {r.get('top10_share', 0):7.3f} {r.get('broke_share', 0):6.3f} "
+              f"{r['baccarat_house']:15,d} {r['dice_house']:14,d}")
+    last = series[-1]
+    faucets = last["starting"] + last["daily"] + last["spin"] + last["activity"]
+    sinks = last["baccarat_house"] + last["dice_house"]
+    print(f"faucets {faucets:,}  (start {last['starting']:,} / daily {last['daily']:,} / "
+          f"spin {last['spin']:,} / activity {last['activity']:,})")
+    print(f"sinks   {sinks:,}  (baccarat {last['baccarat_house']:,} on {last['baccarat_wagered']:,} wagered / "
+          f"dice {last['dice_house']:,} on {last['dice_wagered']:,})")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="포인트 인플레이션 시뮬레이터")
+    ap.add_argument("--users", type=int, default=100_000)
+    ap.add_argument("--days", type=int, default=365)
+    ap.add_argument("--join-days", type=int, default=90, help="가입일이 퍼지는 기간")
+    ap.add_argument("--economy", choices=("main", "legacy"), default="main")
+    ap.add_argument("--set", action="append", default=[], metavar="NAME=VALUE", help="상수 덮어쓰기")
+    ap.add_argument("--profiles", default=None, help="PROFILES 대신 쓸 JSON 파일")
+    ap.add_argument("--every", type=int, default=7, help="며칠마다 기록할지")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args()
+
+    c = apply_overrides(load_constants(args.economy), args.set)
+    profiles = PROFILES
+    if args.profiles:
+        with open(args.profiles, encoding="utf-8") as f:
+            profiles = json.load(f)
+
+    t0 = time.perf_counter()
+    series = simulate(args.users, args.days, profiles, c, args.join_days, args.seed, args.every)
+    wall = time.perf_counter() - t0
+
+    print_series(series)
+    print(f"{args.users:,} users x {args.days} days in {wall:.1f}s")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"constants": c, "profiles": profiles, "params": vars(args),
+                       "wall_s": round(wall, 3), "series": series}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
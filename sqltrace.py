@@ -0,0 +1,234 @@
+"""
+sqlite 문장 추적 + 느린 쿼리 로그.
+
+db() 가 factory=TracedConnection 으로 연결을 만들면 execute / executemany / executescript 마다
+SQL 템플릿, 걸린 시간, 호출한 핸들러, 영향받은 행 수를 모아둔다.
+conn.execute 와 conn.cursor() 둘 다 TracedCursor 를 거친다. SELECT 는 rowcount 가 -1 이라
+fetch* / 반복에서 받은 행 수를 세고, 시간도 다 읽을 때까지 (또는 커서가 버려질 때까지) 더해서 한 번에 기록한다.
+SLOW_MS 를 넘는 문장은 EXPLAIN QUERY PLAN 과 함께 로그로 남긴다 (템플릿당 플랜은 한 번만 뽑는다).
+"""
+
+import contextvars
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+ENABLED = os.getenv("SQL_TRACE", "1") != "0"
+SLOW_MS = float(os.getenv("SQL_SLOW_MS", "50"))
+
+# main.track() 이 라우트 이름을 넣어준다
+current_handler: contextvars.ContextVar[str] = contextvars.ContextVar("current_handler", default="-")
+
+_WS = re.compile(r"\s+")
+_STR = re.compile(r"'(?:[^']|'')*'")
+_NUM = re.compile(r"\b\d+\b")
+
+
+def template(sql: str) -> str:
+    """공백을 접고 남아있는 리터럴을 ? 로 바꾼 SQL 모양."""
+    sql = _WS.sub(" ", sql).strip()
+    sql = _STR.sub("?", sql)
+    return _NUM.sub("?", sql)
+
+
+class StatementStats:
+    __slots__ = ("count", "total", "max", "rows", "slow")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.slow = 0
+
+
+_lock = threading.Lock()
+_stats: dict[tuple[str, str], StatementStats] = {}
+_plans: dict[str, str] = {}
+
+
+def record(sql: str, elapsed: float, rows: int, conn: sqlite3.Connection | None = None, params=()):
+    tpl = template(sql)
+    handler = current_handler.get()
+    with _lock:
+        st = _stats.get((tpl, handler))
+        if st is None:
+            st = _stats[(tpl, handler)] = StatementStats()
+        st.count += 1
+        st.total += elapsed
+        if elapsed > st.max:
+            st.max = elapsed
+        if rows > 0:
+            st.rows += rows
+        slow = elapsed * 1000 >= SLOW_MS
+        if slow:
+            st.slow += 1
+
+    if slow:
+        plan = _plans.get(tpl)
+        if plan is None and conn is not None:
+            plan = _plans[tpl] = explain(conn, sql, params)
+        log.warning("slow sql %.1fms handler=%s rows=%d: %s\n%s", elapsed * 1000, handler, rows, tpl, plan or "")
+
+
+def explain(conn: sqlite3.Connection, sql: str, params=()) -> str:
+    head = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ""
+    if head not in ("SELECT", "INSERT", "UPDATE", "DELETE", "REPLACE", "WITH"):
+        return ""
+    try:
+        # 추적 안 하는 맨 커서로 (플랜 조회가 통계에 섞이지 않게)
+        rows = sqlite3.Cursor(conn).execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    except sqlite3.Error as e:
+        return f"(explain failed: {e})"
+    return "\n".join(f"  {r[3]}" for r in rows)
+
+
+class TracedCursor(sqlite3.Cursor):
+    # 읽는 중인 SELECT: [sql, params, 걸린 시간, 받은 행 수]
+    _pending = None
+
+    def execute(self, sql, parameters=(), /):
+        self._flush()
+        t0 = time.perf_counter()
+        super().execute(sql, parameters)
+        elapsed = time.perf_counter() - t0
+        if self.description is None:
+            # 결과 행이 없는 문장은 여기서 끝
+            record(sql, elapsed, self.rowcount, self.connection, parameters)
+        else:
+            self._pending = [sql, parameters, elapsed, 0]
+        return self
+
+    def executemany(self, sql, seq_of_parameters, /):
+        self._flush()
+        t0 = time.perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        record(sql, time.perf_counter() - t0, self.rowcount)
+        return self
+
+    def executescript(self, sql_script, /):
+        self._flush()
+        t0 = time.perf_counter()
+        super().executescript(sql_script)
+        record(sql_script, time.perf_counter() - t0, -1)
+        return self
+
+    def fetchone(self):
+        t0 = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(t0, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        t0 = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._fetched(t0, len(rows), len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        t0 = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(t0, len(rows), True)
+        return rows
+
+    def __next__(self):
+        t0 = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(t0, 0, True)
+            raise
+        self._fetched(t0, 1, False)
+        return row
+
+    def close(self):
+        self._flush()
+        super().close()
+
+    def __del__(self):
+        # fetchone() 한 번 하고 버리는 커서가 대부분이라 여기서 마무리된다
+        try:
+            self._flush()
+        except Exception:
+            pass
+
+    def _fetched(self, t0: float, rows: int, done: bool):
+        p = self._pending
+        if p is None:
+            return
+        p[2] += time.perf_counter() - t0
+        p[3] += rows
+        if done:
+            self._flush()
+
+    def _flush(self):
+        p = self._pending
+        if p is not None:
+            self._pending = None
+            record(p[0], p[2], p[3], self.connection, p[1])
+
+
+class TracedConnection(sqlite3.Connection):
+    # sqlite3.Connection.execute 는 C 에서 맨 커서를 만들어서 cursor() 재정의를 안 탄다. 직접 넘긴다
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=(), /):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters, /):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script, /):
+        return self.cursor().executescript(sql_script)
+
+
+def connect(path: str, **kwargs) -> sqlite3.Connection:
+    if ENABLED:
+        kwargs.setdefault("factory", TracedConnection)
+    return sqlite3.connect(path, **kwargs)
+
+
+def top(n: int = 10, by: str = "total", per_handler: bool = False) -> list[dict]:
+    """문장별 집계. per_handler=False 면 핸들러 구분 없이 템플릿 단위로 합친다."""
+    with _lock:
+        items = [(k, (s.count, s.total, s.max, s.rows, s.slow)) for k, s in _stats.items()]
+
+    merged: dict[tuple, list] = {}
+    for (tpl, handler), (count, total, mx, rows, slow) in items:
+        key = (tpl, handler) if per_handler else (tpl, "*")
+        m = merged.setdefault(key, [0, 0.0, 0.0, 0, 0, set()])
+        m[0] += count
+        m[1] += total
+        m[2] = max(m[2], mx)
+        m[3] += rows
+        m[4] += slow
+        m[5].add(handler)
+
+    out = [
+        {
+            "sql": tpl,
+            "handler": handler if per_handler else ",".join(sorted(m[5])),
+            "count": m[0],
+            "total_ms": m[1] * 1000,
+            "avg_ms": m[1] * 1000 / m[0],
+            "max_ms": m[2] * 1000,
+            "rows": m[3],
+            "slow": m[4],
+        }
+        for (tpl, handler), m in merged.items()
+    ]
+    out.sort(key=lambda r: r[f"{by}_ms"] if f"{by}_ms" in r else r[by], reverse=True)
+    return out[:n]
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+        _plans.clear()
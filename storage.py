@@ -0,0 +1,87 @@
+"""
+공용 sqlite 저장소 계층.
+
+main.py (casino.db) 와 database / economy / engine / ui 쪽 (vip_casino.db) 이 같이 쓴다.
+- connect(): 스레드마다 파일별 연결 하나를 재사용한다. 매번 새로 열면서 PRAGMA 를 다시 치고
+  prepared statement 캐시를 버리던 비용이 없어진다. `with connect(path) as conn:` 은 예전처럼
+  커밋/롤백만 하고 연결은 닫지 않는다.
+- migrate(): PRAGMA user_version 기반 버전 마이그레이션. 이미 최신이면 아무것도 안 한다.
+- attach: 연결을 처음 만들 때 다른 파일을 그 이름으로 붙인다 (샤드 워커: 채팅 파일 + 공용 casino.db).
+  스키마 이름 없이 쓴 테이블은 main 에서 먼저 찾고 없으면 붙인 파일에서 찾는다.
+"""
+
+import sqlite3
+import threading
+
+import sqltrace
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",  # ~16MB
+)
+
+_local = threading.local()
+
+
+def connect(path: str, attach: tuple[tuple[str, str], ...] = ()) -> sqlite3.Connection:
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+
+    conn = conns.get(path)
+    if conn is None:
+        conn = sqltrace.connect(path, timeout=30, cached_statements=256)
+        conn.row_factory = sqlite3.Row
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        for name, other in attach:
+            conn.execute(f"ATTACH DATABASE ? AS {name}", (other,))
+            conn.execute(f"PRAGMA {name}.journal_mode=WAL")
+            conn.execute(f"PRAGMA {name}.synchronous=NORMAL")
+        conns[path] = conn
+    return conn
+
+
+def close(path: str | None = None):
+    """현재 스레드의 연결을 닫는다 (path 가 없으면 전부)."""
+    conns = getattr(_local, "conns", {})
+    for p in [path] if path else list(conns):
+        conn = conns.pop(p, None)
+        if conn is not None:
+            conn.close()
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection, migrations: list) -> int:
+    """
+    migrations[i] 는 버전 i+1 로 올리는 단계: SQL 스크립트 문자열이나 conn 을 받는 함수.
+    단계마다 user_version 갱신까지 한 트랜잭션으로 묶는다. 최종 버전을 돌려준다.
+    """
+    current = schema_version(conn)
+    for version, step in enumerate(migrations, start=1):
+        if version <= current:
+            continue
+        if callable(step):
+            conn.execute("BEGIN")
+            try:
+                step(conn)
+                conn.execute(f"PRAGMA user_version={version}")
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        else:
+            try:
+                conn.executescript(f"BEGIN;\n{step}\nPRAGMA user_version={version};\nCOMMIT;")
+            except BaseException:
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+        current = version
+    return current
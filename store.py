@@ -0,0 +1,1331 @@
+"""
+main.py 게임 로직이 쓰는 저장소 인터페이스.
+
+- Store: 유저/라운드/베팅/슈/히스토리/하우스/보상 클레임 연산 모음 (게임 로직은 이것만 본다)
+- SqliteStore: casino.db 구현 (storage.connect + MIGRATIONS)
+- MemoryStore: 순수 파이썬 dict 구현. 시뮬레이션/벤치마크용이고 재시작하면 사라진다.
+
+정산은 settle_baccarat / settle_dice 한 번으로 지급, 하우스, 히스토리, 베팅 정리, 라운드 마감까지
+한 트랜잭션에 쓴다. 반환하는 행은 r["column"] 으로 읽는다 (sqlite3.Row 또는 dict).
+
+포인트 원장(ledger):
+- 잔액이 바뀌는 일(가입/베팅/지급/환급/출석/룰렛)은 전부 ledger 에 한 줄씩 남는다 (추가만 함).
+- users.points 는 같은 트랜잭션에서 갱신하는 물질화된 잔액이다. 정산은 원장 줄과 잔액 갱신을
+  executemany 두 번으로 묶어 쓴다.
+- balance_snapshots 는 (유저, 그 시점 마지막 ledger id, 잔액). 잔액은 마지막 스냅샷 + 그 뒤 원장 합으로
+  다시 계산할 수 있고 (rebuild_balance), reconcile 은 users.points 와 어긋난 유저를 찾는다.
+
+재현(replay.py):
+- chat_seeds 는 채팅별 마스터 시드와 지금까지 만든 슈 수 (seeding.py 가 여기서 스트림을 파생한다).
+- 정산 트랜잭션이 round_log (라운드 결과, 딜 시작 슈 번호/위치, 하우스 손익) 와 bet_log (bets 사본) 를 같이 남긴다.
+
+유저 통계(user_stats): 유저당 한 줄. 정산 트랜잭션이 베팅액/돌려받은 액/적중/연승을 더해 두고
+/stats 는 그 한 줄만 읽는다 (히스토리를 모으지 않는다).
+
+샤드 파일 (SHARDS > 1): 채팅 전용 테이블(LOCAL_TABLES)은 워커마다 <이름>.shard<i>of<n>.db 에 두고
+공용 casino.db 를 shared 로 붙인다. 워커끼리 같은 쓰기 락을 두고 줄 서는 건 잔액/원장 쓰기뿐이다.
+- 돈 테이블(users, ledger, balance_snapshots, user_stats)은 전부 공용 파일에 있어서 잔액과 원장은 계속 한 파일 안에서 원자적이다.
+- 정산은 두 파일을 한 트랜잭션으로 쓴다. WAL 에서는 파일마다만 원자적이라 OS 가 커밋 도중 죽으면
+  라운드 기록(round_log / house / road_history)과 원장이 어긋날 수 있다 (/replay 가 찾아낸다).
+- 처음 열 때 공용 파일의 자기 채팅 행을 복사해 온다. 샤드 수를 바꾸거나 SHARDS=1 로 돌아가기 전에는
+  봇을 멈추고 python shard.py --merge 로 공용 파일에 되돌린다.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+
+import storage
+
+
+class Store(ABC):
+    # ---------- users ----------
+
+    @abstractmethod
+    def ensure_user(self, uid: int, username: str | None, starting_points: int) -> None:
+        """처음 보는 유저면 만들고 starting_points 를 'signup' 원장 줄로 남긴다."""
+
+    @abstractmethod
+    def get_points(self, uid: int) -> int: ...
+
+    @abstractmethod
+    def credit(self, uid: int, amount: int, reason: str,
+               chat_id: int | None = None, game: str | None = None, round_id: int | None = None) -> None: ...
+
+    @abstractmethod
+    def try_debit(self, uid: int, amount: int, reason: str,
+                  chat_id: int | None = None, game: str | None = None, round_id: int | None = None) -> bool: ...
+
+    @abstractmethod
+    def top_users(self, limit: int) -> list: ...
+
+    # ---------- rounds ----------
+
+    @abstractmethod
+    def get_round(self, chat_id: int): ...
+
+    @abstractmethod
+    def open_round(self, chat_id: int, round_id: int) -> None: ...
+
+    @abstractmethod
+    def claim_round(self, chat_id: int, round_id: int) -> bool:
+        """OPEN -> CLOSING. 이미 정산 중/완료면 False."""
+
+    @abstractmethod
+    def get_dice_round(self, chat_id: int): ...
+
+    @abstractmethod
+    def open_dice_round(self, chat_id: int, round_id: int, ends_at: int) -> None: ...
+
+    @abstractmethod
+    def claim_dice_round(self, chat_id: int, round_id: int) -> bool: ...
+
+    @abstractmethod
+    def stop_dice_round(self, chat_id: int, round_id: int) -> None:
+        """베팅을 지우고 CLOSED 로 (환급 없음, 기존 !dice_stop 동작)."""
+
+    @abstractmethod
+    def open_round_counts(self) -> dict[str, int]: ...
+
+    # ---------- bets ----------
+
+    @abstractmethod
+    def has_bet(self, chat_id: int, round_id: int, uid: int) -> bool: ...
+
+    @abstractmethod
+    def add_bet(self, chat_id: int, round_id: int, uid: int, choice: str, amount: int) -> None: ...
+
+    @abstractmethod
+    def list_bets(self, chat_id: int, round_id: int) -> list: ...
+
+    @abstractmethod
+    def bet_columns(self, chat_id: int, round_id: int) -> tuple[list, list, list]:
+        """정산용: (user_ids, choices, amounts) 열."""
+
+    @abstractmethod
+    def bet_pool(self, chat_id: int, round_id: int) -> list[tuple[str, int, int]]:
+        """선택별 (choice, 베팅 수, 합계). 재시작 뒤 풀 카운터를 다시 채울 때만 쓴다."""
+
+    @abstractmethod
+    def has_dice_bet(self, chat_id: int, round_id: int, uid: int) -> bool: ...
+
+    @abstractmethod
+    def add_dice_bet(self, chat_id: int, round_id: int, uid: int,
+                     bet_type: str, exact_value: int | None, amount: int) -> None: ...
+
+    @abstractmethod
+    def list_dice_bets(self, chat_id: int, round_id: int) -> list: ...
+
+    @abstractmethod
+    def dice_bet_columns(self, chat_id: int, round_id: int) -> tuple[list, list, list, list]:
+        """정산용: (user_ids, bet_types, exact_values, amounts) 열."""
+
+    @abstractmethod
+    def dice_bet_pool(self, chat_id: int, round_id: int) -> list[tuple[str, int | None, int, int]]:
+        """(bet_type, exact_value, 베팅 수, 합계)."""
+
+    # ---------- shoe ----------
+
+    @abstractmethod
+    def load_shoe(self, chat_id: int) -> tuple[list, int] | None: ...
+
+    @abstractmethod
+    def save_shoe(self, chat_id: int, deck: list, position: int) -> None: ...
+
+    # ---------- history / house ----------
+
+    @abstractmethod
+    def road_history(self, chat_id: int, limit: int | None = None) -> list[str]:
+        """오래된 것부터. limit 이 있으면 최근 limit 개."""
+
+    @abstractmethod
+    def get_house(self, chat_id: int): ...
+
+    # ---------- claims ----------
+
+    @abstractmethod
+    def claim_daily(self, chat_id: int, uid: int, day: str) -> bool:
+        """오늘 처음이면 기록하고 True."""
+
+    @abstractmethod
+    def spin_used(self, chat_id: int, uid: int, day: str) -> int: ...
+
+    @abstractmethod
+    def set_spin_used(self, chat_id: int, uid: int, day: str, used: int) -> None: ...
+
+    # ---------- settlement ----------
+    # credits: [(user_id, amount, reason)] — reason 은 'payout' / 'refund'
+
+    # shoe_no / shoe_pos: 이 판 첫 카드를 뽑기 직전 슈 번호와 위치 (시드 전 슈면 shoe_no None)
+    # stats: [(user_id, 베팅액, 돌려받은 액, 적중 1/0)] — 베팅마다 한 줄 (settlement.Outcome.stats)
+
+    @abstractmethod
+    def settle_baccarat(self, chat_id: int, round_id: int, result: str,
+                        credits: list[tuple[int, int, str]], house_delta: int,
+                        shoe_no: int | None = None, shoe_pos: int | None = None,
+                        stats: list[tuple[int, int, int, int]] = ()) -> None: ...
+
+    @abstractmethod
+    def settle_dice(self, chat_id: int, round_id: int, dice_value: int, created_at: int,
+                    credits: list[tuple[int, int, str]], house_delta: int,
+                    stats: list[tuple[int, int, int, int]] = ()) -> None: ...
+
+    @abstractmethod
+    def void_baccarat(self, chat_id: int, round_id: int, credits: list[tuple[int, int, str]]) -> None:
+        """정산 없이 판을 무효로: 환급 credits 만 적고 베팅을 지우고 CLOSED (round_log/하우스/로드 기록 없음)."""
+
+    # ---------- stats ----------
+
+    @abstractmethod
+    def user_stats(self, uid: int):
+        """points + STAT_COLUMNS 한 줄. 유저가 없으면 None, 베팅 기록이 없으면 통계 열은 0."""
+
+    # ---------- seeds / replay ----------
+
+    @abstractmethod
+    def ensure_seed(self, chat_id: int, seed: str) -> str:
+        """채팅 시드가 없으면 seed 로 만든다. 저장된 시드를 돌려준다."""
+
+    @abstractmethod
+    def get_seed(self, chat_id: int) -> str | None: ...
+
+    @abstractmethod
+    def next_shoe(self, chat_id: int) -> int:
+        """새 슈 번호 (1부터). ensure_seed 뒤에 부른다."""
+
+    @abstractmethod
+    def shoe_number(self, chat_id: int) -> int | None:
+        """지금 슈 번호. 아직 시드로 만든 슈가 없으면 (마이그레이션 전 슈) None."""
+
+    @abstractmethod
+    def save_seal(self, chat_id: int, round_id: int, shoe_no: int, shoe_pos: int, nonce: str, commitment: str) -> None:
+        """PREDEAL: 라운드를 열 때 딘 핸드의 시작 위치와 봉인."""
+
+    @abstractmethod
+    def get_seal(self, chat_id: int, round_id: int) -> tuple | None:
+        """(shoe_no, shoe_pos, nonce, commitment) 또는 None."""
+
+    @abstractmethod
+    def round_log(self, chat_id: int, game: str, round_id: int | None = None) -> list[tuple]:
+        """round_id 순 (round_id, shoe_no, shoe_pos, outcome, total_bet, house_delta)."""
+
+    @abstractmethod
+    def bet_log(self, chat_id: int, game: str, round_id: int | None = None) -> list[tuple]:
+        """(round_id, user_id, choice, exact_value, amount). 바카라 choice 는 P/B/T, 다이스는 BIG/SMALL/EXACT."""
+
+    @abstractmethod
+    def round_ledger(self, chat_id: int, game: str, round_id: int | None = None) -> list[tuple]:
+        """라운드에 묶인 원장 줄 (round_id, user_id, delta, reason)."""
+
+    # ---------- ledger ----------
+
+    @abstractmethod
+    def ledger_entries(self, uid: int, limit: int = 10) -> list:
+        """최근 것부터 (id, delta, reason, chat_id, game, round_id, created_at)."""
+
+    @abstractmethod
+    def snapshot_balances(self) -> int:
+        """마지막 스냅샷 뒤로 원장이 움직인 유저의 현재 잔액을 찍는다. 찍은 유저 수를 돌려준다."""
+
+    @abstractmethod
+    def rebuild_balance(self, uid: int) -> int:
+        """마지막 스냅샷 + 그 뒤 원장 합."""
+
+    @abstractmethod
+    def reconcile(self, limit: int = 20) -> list[tuple[int, int, int]]:
+        """users.points 와 원장으로 다시 계산한 값이 다른 유저 [(user_id, points, rebuilt)]."""
+
+
+# ================== SQLITE ==================
+
+# 스키마 변경은 끝에 단계를 추가한다 (PRAGMA user_version 으로 적용 여부 판단)
+MIGRATIONS = [
+    # 1: 초기 스키마
+    """
+        CREATE TABLE IF NOT EXISTS users(
+            user_id INTEGER PRIMARY KEY,
+            username TEXT,
+            points INTEGER NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS rounds(
+            chat_id INTEGER PRIMARY KEY,
+            round_id INTEGER NOT NULL,
+            status TEXT NOT NULL  -- OPEN, CLOSING, CLOSED
+        );
+
+        -- One bet per user per round
+        CREATE TABLE IF NOT EXISTS bets(
+            chat_id INTEGER NOT NULL,
+            round_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            choice TEXT NOT NULL,
+            amount INTEGER NOT NULL,
+            PRIMARY KEY(chat_id, round_id, user_id)
+        );
+
+        CREATE TABLE IF NOT EXISTS house(
+            chat_id INTEGER PRIMARY KEY,
+            profit INTEGER DEFAULT 0,
+            rounds INTEGER DEFAULT 0
+        );
+
+        CREATE TABLE IF NOT EXISTS road_history(
+            chat_id INTEGER NOT NULL,
+            round_id INTEGER NOT NULL,
+            result TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS shoe(
+            chat_id INTEGER PRIMARY KEY,
+            cards TEXT NOT NULL,
+            position INTEGER NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS daily_claims(
+            chat_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            PRIMARY KEY(chat_id, user_id, day)
+        );
+
+        CREATE TABLE IF NOT EXISTS spin_claims(
+            chat_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            used INTEGER NOT NULL,
+            PRIMARY KEY(chat_id, user_id, day)
+        );
+
+        -- ===== DICE TABLES =====
+        CREATE TABLE IF NOT EXISTS dice_rounds(
+            chat_id INTEGER PRIMARY KEY,
+            round_id INTEGER NOT NULL,
+            status TEXT NOT NULL,  -- OPEN, CLOSING, CLOSED
+            ends_at INTEGER NOT NULL
+        );
+
+        -- One dice bet per user per dice round
+        CREATE TABLE IF NOT EXISTS dice_bets(
+            chat_id INTEGER NOT NULL,
+            round_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            bet_type TEXT NOT NULL,     -- BIG, SMALL, EXACT
+            exact_value INTEGER,        -- for EXACT 1~6
+            amount INTEGER NOT NULL,
+            PRIMARY KEY(chat_id, round_id, user_id)
+        );
+
+        CREATE TABLE IF NOT EXISTS dice_history(
+            chat_id INTEGER NOT NULL,
+            round_id INTEGER NOT NULL,
+            dice_value INTEGER NOT NULL,
+            created_at INTEGER NOT NULL
+        );
+    """,
+    # 2: 히스토리 조회 / 랭킹 인덱스
+    """
+        CREATE INDEX IF NOT EXISTS idx_road_history_chat ON road_history(chat_id, round_id);
+        CREATE INDEX IF NOT EXISTS idx_dice_history_chat ON dice_history(chat_id, round_id);
+        CREATE INDEX IF NOT EXISTS idx_users_points ON users(points DESC);
+    """,
+    # 3: 포인트 원장 + 잔액 스냅샷. 기존 유저는 지금 잔액을 ledger id 0 시점 스냅샷으로 둔다
+    """
+        CREATE TABLE IF NOT EXISTS ledger(
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            delta INTEGER NOT NULL,
+            reason TEXT NOT NULL,       -- signup, bet, payout, refund, daily, spin
+            chat_id INTEGER,
+            game TEXT,                  -- baccarat, dice
+            round_id INTEGER,
+            created_at INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_ledger_user ON ledger(user_id, id);
+
+        CREATE TABLE IF NOT EXISTS balance_snapshots(
+            user_id INTEGER NOT NULL,
+            ledger_id INTEGER NOT NULL,  -- 이 id 까지 반영된 잔액
+            points INTEGER NOT NULL,
+            created_at INTEGER NOT NULL,
+            PRIMARY KEY(user_id, ledger_id)
+        );
+
+        INSERT OR IGNORE INTO balance_snapshots(user_id, ledger_id, points, created_at)
+            SELECT user_id, 0, points, CAST(strftime('%s', 'now') AS INTEGER) FROM users;
+    """,
+    # 4: 채팅 시드 + 정산 기록 (replay.py)
+    """
+        CREATE TABLE IF NOT EXISTS chat_seeds(
+            chat_id INTEGER PRIMARY KEY,
+            seed TEXT NOT NULL,
+            shoes INTEGER NOT NULL DEFAULT 0  -- 시드로 만든 슈 수 = 지금 슈 번호
+        );
+
+        CREATE TABLE IF NOT EXISTS round_log(
+            chat_id INTEGER NOT NULL,
+            game TEXT NOT NULL,         -- baccarat, dice
+            round_id INTEGER NOT NULL,
+            shoe_no INTEGER,            -- 바카라: 딜 시작 슈 번호 (시드 전 슈면 NULL)
+            shoe_pos INTEGER,
+            outcome TEXT NOT NULL,      -- P/B/T 또는 다이스 눈
+            total_bet INTEGER NOT NULL,
+            house_delta INTEGER NOT NULL,
+            created_at INTEGER NOT NULL,
+            PRIMARY KEY(chat_id, game, round_id)
+        );
+
+        CREATE TABLE IF NOT EXISTS bet_log(
+            chat_id INTEGER NOT NULL,
+            game TEXT NOT NULL,
+            round_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            choice TEXT NOT NULL,
+            exact_value INTEGER,
+            amount INTEGER NOT NULL,
+            PRIMARY KEY(chat_id, game, round_id, user_id)
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_ledger_round ON ledger(chat_id, game, round_id);
+    """,
+    # 5: 유저 통계. 누적치는 원장의 라운드별 베팅/지급으로 채운다 (연승은 0 부터)
+    """
+        CREATE TABLE IF NOT EXISTS user_stats(
+            user_id INTEGER PRIMARY KEY,
+            rounds INTEGER NOT NULL DEFAULT 0,
+            wagered INTEGER NOT NULL DEFAULT 0,
+            won INTEGER NOT NULL DEFAULT 0,      -- 돌려받은 포인트 (당첨금 + 타이 환급)
+            wins INTEGER NOT NULL DEFAULT 0,
+            streak INTEGER NOT NULL DEFAULT 0,
+            max_streak INTEGER NOT NULL DEFAULT 0,
+            baccarat_rounds INTEGER NOT NULL DEFAULT 0,
+            baccarat_wagered INTEGER NOT NULL DEFAULT 0,
+            baccarat_won INTEGER NOT NULL DEFAULT 0,
+            baccarat_wins INTEGER NOT NULL DEFAULT 0,
+            dice_rounds INTEGER NOT NULL DEFAULT 0,
+            dice_wagered INTEGER NOT NULL DEFAULT 0,
+            dice_won INTEGER NOT NULL DEFAULT 0,
+            dice_wins INTEGER NOT NULL DEFAULT 0
+        );
+
+        INSERT OR IGNORE INTO user_stats(user_id, rounds, wagered, won, wins,
+                                         baccarat_rounds, baccarat_wagered, baccarat_won, baccarat_wins,
+                                         dice_rounds, dice_wagered, dice_won, dice_wins)
+        SELECT user_id, COUNT(*), SUM(bet), SUM(ret), SUM(win),
+               SUM(game = 'baccarat'), SUM(CASE WHEN game = 'baccarat' THEN bet ELSE 0 END),
+               SUM(CASE WHEN game = 'baccarat' THEN ret ELSE 0 END), SUM(CASE WHEN game = 'baccarat' THEN win ELSE 0 END),
+               SUM(game = 'dice'), SUM(CASE WHEN game = 'dice' THEN bet ELSE 0 END),
+               SUM(CASE WHEN game = 'dice' THEN ret ELSE 0 END), SUM(CASE WHEN game = 'dice' THEN win ELSE 0 END)
+        FROM (
+            SELECT user_id, game,
+                   -SUM(CASE WHEN reason = 'bet' THEN delta ELSE 0 END) AS bet,
+                   SUM(CASE WHEN reason IN ('payout', 'refund') THEN delta ELSE 0 END) AS ret,
+                   MAX(reason = 'payout') AS win
+            FROM ledger
+            WHERE game IS NOT NULL
+            GROUP BY user_id, game, chat_id, round_id
+        )
+        GROUP BY user_id;
+    """,
+    # 6: PREDEAL 봉인. 카드는 (시드, shoe_no, shoe_pos) 로 다시 만들 수 있어서 위치와 nonce 만 남긴다
+    """
+        CREATE TABLE IF NOT EXISTS round_seals(
+            chat_id INTEGER NOT NULL,
+            round_id INTEGER NOT NULL,
+            shoe_no INTEGER NOT NULL,
+            shoe_pos INTEGER NOT NULL,
+            nonce TEXT NOT NULL,
+            commitment TEXT NOT NULL,
+            created_at INTEGER NOT NULL,
+            PRIMARY KEY(chat_id, round_id)
+        );
+    """,
+]
+
+_LEDGER_INSERT = (
+    "INSERT INTO ledger(user_id, delta, reason, chat_id, game, round_id, created_at) VALUES(?,?,?,?,?,?,?)"
+)
+
+STAT_GAMES = ("baccarat", "dice")
+STAT_COLUMNS = ("rounds", "wagered", "won", "wins", "streak", "max_streak") + tuple(
+    f"{g}_{c}" for g in STAT_GAMES for c in ("rounds", "wagered", "won", "wins")
+)
+
+# 게임별 upsert. 연승은 적중이면 +1, 꽝/타이 환급이면 0 (engine.settle_round 와 같은 규칙)
+# DO UPDATE 의 SET 은 전부 갱신 전 값을 본다
+_STATS_UPSERT = {
+    g: f"""
+        INSERT INTO user_stats(user_id, rounds, wagered, won, wins, streak, max_streak,
+                               {g}_rounds, {g}_wagered, {g}_won, {g}_wins)
+        VALUES(?1, 1, ?2, ?3, ?4, ?4, ?4, 1, ?2, ?3, ?4)
+        ON CONFLICT(user_id) DO UPDATE SET
+            rounds = rounds + 1,
+            wagered = wagered + ?2,
+            won = won + ?3,
+            wins = wins + ?4,
+            streak = CASE WHEN ?4 THEN streak + 1 ELSE 0 END,
+            max_streak = MAX(max_streak, CASE WHEN ?4 THEN streak + 1 ELSE 0 END),
+            {g}_rounds = {g}_rounds + 1,
+            {g}_wagered = {g}_wagered + ?2,
+            {g}_won = {g}_won + ?3,
+            {g}_wins = {g}_wins + ?4
+    """
+    for g in STAT_GAMES
+}
+
+
+# 채팅 하나에만 속하는 테이블 (전부 chat_id 열이 있다). 샤드 파일로 나뉘는 단위
+LOCAL_TABLES = (
+    "rounds", "bets", "house", "road_history", "shoe", "daily_claims", "spin_claims",
+    "dice_rounds", "dice_bets", "dice_history", "chat_seeds", "round_log", "bet_log", "round_seals",
+)
+
+_SHARD_FILE = re.compile(r"\.shard(\d+)of(\d+)\.db$")
+
+
+def shard_path(db_path: str, index: int, shards: int) -> str:
+    return f"{os.path.splitext(db_path)[0]}.shard{index}of{shards}.db"
+
+
+def shard_files(db_path: str) -> list[tuple[str, int, int]]:
+    """db_path 옆에 있는 샤드 파일 [(경로, i, n)]."""
+    folder = os.path.dirname(db_path) or "."
+    stem = os.path.splitext(os.path.basename(db_path))[0]
+    out = []
+    for name in sorted(os.listdir(folder)):
+        m = _SHARD_FILE.search(name)
+        if m and name[:m.start()] == stem:
+            out.append((os.path.join(folder, name), int(m.group(1)), int(m.group(2))))
+    return out
+
+
+def merge_shard(db_path: str, path: str, owns) -> int:
+    """샤드 파일의 채팅 테이블을 공용 파일로 되돌린다 (owns(chat_id) 인 행을 갈아끼운다). 옮긴 행 수."""
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.create_function("owns", 1, owns, deterministic=True)
+    moved = 0
+    try:
+        conn.execute("ATTACH DATABASE ? AS s", (path,))
+        conn.execute("BEGIN IMMEDIATE")
+        for t in LOCAL_TABLES:
+            cols = ", ".join(r[1] for r in conn.execute(f"PRAGMA s.table_info({t})"))
+            conn.execute(f"DELETE FROM main.{t} WHERE owns(chat_id)")
+            moved += conn.execute(f"INSERT INTO main.{t}({cols}) SELECT {cols} FROM s.{t}").rowcount
+        conn.commit()
+        conn.execute("DETACH DATABASE s")
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return moved
+
+
+class SqliteStore(Store):
+    def __init__(self, path: str, local_path: str | None = None, owns=None):
+        # local_path: 샤드 워커의 채팅 파일. owns(chat_id) 는 이 워커 담당 채팅인지 (처음 복사할 때만 쓴다)
+        self.path = path
+        self.local_path = local_path
+        self.owns = owns
+
+    def db(self):
+        if self.local_path:
+            return storage.connect(self.local_path, attach=(("shared", self.path),))
+        return storage.connect(self.path)
+
+    def migrate(self) -> int:
+        version = storage.migrate(storage.connect(self.path), MIGRATIONS)
+        if self.local_path:
+            self._migrate_local(version)
+        return version
+
+    def _migrate_local(self, version: int):
+        conn = self.db()
+        have = storage.schema_version(conn)
+        if have == version:
+            return
+        if have != 0:
+            raise RuntimeError(
+                f"{self.local_path} 스키마 v{have} 가 {self.path} v{version} 와 다릅니다. "
+                "봇을 멈추고 python shard.py --merge 로 합친 뒤 다시 시작하세요."
+            )
+        # 공용 파일에 마이그레이션된 스키마를 그대로 가져오고 (테이블 먼저, 인덱스 나중) 담당 채팅 행을 복사
+        marks = ",".join("?" * len(LOCAL_TABLES))
+        ddl = conn.execute(
+            f"SELECT sql FROM shared.sqlite_master WHERE tbl_name IN ({marks}) AND sql IS NOT NULL "
+            "ORDER BY type = 'index'",
+            LOCAL_TABLES,
+        ).fetchall()
+        conn.create_function("owns", 1, self.owns, deterministic=True)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for (sql,) in ddl:
+                conn.execute(sql)
+            for t in LOCAL_TABLES:
+                conn.execute(f"INSERT INTO main.{t} SELECT * FROM shared.{t} WHERE owns(chat_id)")
+            conn.execute(f"PRAGMA user_version={version}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+    # ---------- users ----------
+
+    def ensure_user(self, uid, username, starting_points):
+        with self.db() as conn:
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO users(user_id, username, points) VALUES(?,?,?)",
+                (uid, username or "", starting_points)
+            )
+            if cur.rowcount == 1:
+                conn.execute(_LEDGER_INSERT, (uid, starting_points, "signup", None, None, None, int(time.time())))
+
+    def get_points(self, uid):
+        r = self.db().execute("SELECT points FROM users WHERE user_id=?", (uid,)).fetchone()
+        return int(r["points"]) if r else 0
+
+    def credit(self, uid, amount, reason, chat_id=None, game=None, round_id=None):
+        with self.db() as conn:
+            cur = conn.execute("UPDATE users SET points = points + ? WHERE user_id=?", (amount, uid))
+            if cur.rowcount == 1:
+                conn.execute(_LEDGER_INSERT, (uid, amount, reason, chat_id, game, round_id, int(time.time())))
+
+    def try_debit(self, uid, amount, reason, chat_id=None, game=None, round_id=None):
+        with self.db() as conn:
+            cur = conn.execute(
+                "UPDATE users SET points = points - ? WHERE user_id=? AND points >= ?",
+                (amount, uid, amount)
+            )
+            if cur.rowcount != 1:
+                return False
+            conn.execute(_LEDGER_INSERT, (uid, -amount, reason, chat_id, game, round_id, int(time.time())))
+            return True
+
+    def top_users(self, limit):
+        return self.db().execute(
+            "SELECT user_id, username, points FROM users ORDER BY points DESC LIMIT ?", (limit,)
+        ).fetchall()
+
+    # ---------- rounds ----------
+
+    def get_round(self, chat_id):
+        return self.db().execute("SELECT round_id, status FROM rounds WHERE chat_id=?", (chat_id,)).fetchone()
+
+    def open_round(self, chat_id, round_id):
+        with self.db() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO rounds(chat_id, round_id, status) VALUES(?,?,?)",
+                (chat_id, round_id, "OPEN")
+            )
+
+    def claim_round(self, chat_id, round_id):
+        with self.db() as conn:
+            cur = conn.execute(
+                "UPDATE rounds SET status='CLOSING' WHERE chat_id=? AND round_id=? AND status='OPEN'",
+                (chat_id, round_id)
+            )
+            return cur.rowcount == 1
+
+    def get_dice_round(self, chat_id):
+        return self.db().execute("SELECT * FROM dice_rounds WHERE chat_id=?", (chat_id,)).fetchone()
+
+    def open_dice_round(self, chat_id, round_id, ends_at):
+        with self.db() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO dice_rounds(chat_id, round_id, status, ends_at) VALUES(?,?,?,?)",
+                (chat_id, round_id, "OPEN", ends_at)
+            )
+
+    def claim_dice_round(self, chat_id, round_id):
+        with self.db() as conn:
+            cur = conn.execute(
+                "UPDATE dice_rounds SET status='CLOSING' WHERE chat_id=? AND round_id=? AND status='OPEN'",
+                (chat_id, round_id)
+            )
+            return cur.rowcount == 1
+
+    def stop_dice_round(self, chat_id, round_id):
+        with self.db() as conn:
+            conn.execute("UPDATE dice_rounds SET status='CLOSED' WHERE chat_id=? AND round_id=?", (chat_id, round_id))
+            conn.execute("DELETE FROM dice_bets WHERE chat_id=? AND round_id=?", (chat_id, round_id))
+
+    def open_round_counts(self):
+        conn = self.db()
+        bac = conn.execute("SELECT COUNT(*) FROM rounds WHERE status='OPEN'").fetchone()[0]
+        dice = conn.execute("SELECT COUNT(*) FROM dice_rounds WHERE status='OPEN'").fetchone()[0]
+        return {"baccarat": bac, "dice": dice}
+
+    # ---------- bets ----------
+
+    def has_bet(self, chat_id, round_id, uid):
+        return self.db().execute(
+            "SELECT 1 FROM bets WHERE chat_id=? AND round_id=? AND user_id=?",
+            (chat_id, round_id, uid)
+        ).fetchone() is not None
+
+    def add_bet(self, chat_id, round_id, uid, choice, amount):
+        with self.db() as conn:
+            conn.execute(
+                "INSERT INTO bets(chat_id, round_id, user_id, choice, amount) VALUES(?,?,?,?,?)",
+                (chat_id, round_id, uid, choice, amount)
+            )
+
+    def list_bets(self, chat_id, round_id):
+        return self.db().execute(
+            "SELECT * FROM bets WHERE chat_id=? AND round_id=?", (chat_id, round_id)
+        ).fetchall()
+
+    def _columns(self, sql, params, width):
+        # Row 객체 대신 튜플로 받아 열로 뒤집는다 (큰 라운드에서 행마다 Row 만드는 비용이 크다)
+        cur = self.db().cursor()
+        cur.row_factory = None
+        rows = cur.execute(sql, params).fetchall()
+        if not rows:
+            return tuple([] for _ in range(width))
+        return tuple(list(col) for col in zip(*rows))
+
+    def bet_columns(self, chat_id, round_id):
+        return self._columns(
+            "SELECT user_id, choice, amount FROM bets WHERE chat_id=? AND round_id=?", (chat_id, round_id), 3
+        )
+
+    def bet_pool(self, chat_id, round_id):
+        return self._tuples(
+            "SELECT choice, COUNT(*), SUM(amount) FROM bets WHERE chat_id=? AND round_id=? GROUP BY choice",
+            (chat_id, round_id)
+        )
+
+    def has_dice_bet(self, chat_id, round_id, uid):
+        return self.db().execute(
+            "SELECT 1 FROM dice_bets WHERE chat_id=? AND round_id=? AND user_id=?",
+            (chat_id, round_id, uid)
+        ).fetchone() is not None
+
+    def add_dice_bet(self, chat_id, round_id, uid, bet_type, exact_value, amount):
+        with self.db() as conn:
+            conn.execute(
+                "INSERT INTO dice_bets(chat_id, round_id, user_id, bet_type, exact_value, amount) VALUES(?,?,?,?,?,?)",
+                (chat_id, round_id, uid, bet_type, exact_value, amount)
+            )
+
+    def list_dice_bets(self, chat_id, round_id):
+        return self.db().execute(
+            "SELECT * FROM dice_bets WHERE chat_id=? AND round_id=?", (chat_id, round_id)
+        ).fetchall()
+
+    def dice_bet_columns(self, chat_id, round_id):
+        return self._columns(
+            "SELECT user_id, bet_type, exact_value, amount FROM dice_bets WHERE chat_id=? AND round_id=?",
+            (chat_id, round_id), 4
+        )
+
+    def dice_bet_pool(self, chat_id, round_id):
+        return self._tuples(
+            "SELECT bet_type, exact_value, COUNT(*), SUM(amount) FROM dice_bets WHERE chat_id=? AND round_id=? "
+            "GROUP BY bet_type, exact_value",
+            (chat_id, round_id)
+        )
+
+    # ---------- shoe ----------
+
+    def load_shoe(self, chat_id):
+        row = self.db().execute("SELECT cards, position FROM shoe WHERE chat_id=?", (chat_id,)).fetchone()
+        if not row:
+            return None
+        return [tuple(c) for c in json.loads(row["cards"])], int(row["position"])
+
+    def save_shoe(self, chat_id, deck, position):
+        with self.db() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO shoe(chat_id, cards, position) VALUES(?,?,?)",
+                (chat_id, json.dumps(deck), position)
+            )
+
+    # ---------- history / house ----------
+
+    def road_history(self, chat_id, limit=None):
+        conn = self.db()
+        if limit is None:
+            rows = conn.execute(
+                "SELECT result FROM road_history WHERE chat_id=? ORDER BY round_id", (chat_id,)
+            ).fetchall()
+            return [r["result"] for r in rows]
+        rows = conn.execute(
+            "SELECT result FROM road_history WHERE chat_id=? ORDER BY round_id DESC LIMIT ?", (chat_id, limit)
+        ).fetchall()
+        return [r["result"] for r in reversed(rows)]
+
+    def get_house(self, chat_id):
+        return self.db().execute("SELECT profit, rounds FROM house WHERE chat_id=?", (chat_id,)).fetchone()
+
+    # ---------- claims ----------
+
+    def claim_daily(self, chat_id, uid, day):
+        with self.db() as conn:
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO daily_claims(chat_id, user_id, day) VALUES(?,?,?)",
+                (chat_id, uid, day)
+            )
+            return cur.rowcount == 1
+
+    def spin_used(self, chat_id, uid, day):
+        r = self.db().execute(
+            "SELECT used FROM spin_claims WHERE chat_id=? AND user_id=? AND day=?",
+            (chat_id, uid, day)
+        ).fetchone()
+        return int(r["used"]) if r else 0
+
+    def set_spin_used(self, chat_id, uid, day, used):
+        with self.db() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO spin_claims(chat_id, user_id, day, used) VALUES(?,?,?,?)",
+                (chat_id, uid, day, used)
+            )
+
+    # ---------- settlement ----------
+
+    @staticmethod
+    def _apply_credits(conn, chat_id, game, round_id, credits):
+        # 원장 줄과 물질화된 잔액을 같은 트랜잭션에서 한 번씩 몰아서
+        now = int(time.time())
+        credits = [c for c in credits if c[1] > 0]
+        conn.executemany(_LEDGER_INSERT, [
+            (uid, amt, reason, chat_id, game, round_id, now) for uid, amt, reason in credits
+        ])
+        conn.executemany("UPDATE users SET points = points + ? WHERE user_id=?",
+                         [(amt, uid) for uid, amt, _ in credits])
+
+    def settle_baccarat(self, chat_id, round_id, result, credits, house_delta, shoe_no=None, shoe_pos=None, stats=()):
+        with self.db() as conn:
+            self._apply_credits(conn, chat_id, "baccarat", round_id, credits)
+            conn.executemany(_STATS_UPSERT["baccarat"], stats)
+            conn.execute(
+                "INSERT INTO round_log(chat_id, game, round_id, shoe_no, shoe_pos, outcome, total_bet, house_delta, created_at) "
+                "SELECT ?, 'baccarat', ?, ?, ?, ?, COALESCE(SUM(amount), 0), ?, ? FROM bets WHERE chat_id=? AND round_id=?",
+                (chat_id, round_id, shoe_no, shoe_pos, result, house_delta, int(time.time()), chat_id, round_id)
+            )
+            conn.execute(
+                "INSERT INTO bet_log(chat_id, game, round_id, user_id, choice, exact_value, amount) "
+                "SELECT chat_id, 'baccarat', round_id, user_id, choice, NULL, amount FROM bets WHERE chat_id=? AND round_id=?",
+                (chat_id, round_id)
+            )
+            conn.execute("INSERT OR IGNORE INTO house(chat_id, profit, rounds) VALUES(?,0,0)", (chat_id,))
+            conn.execute(
+                "UPDATE house SET profit = profit + ?, rounds = rounds + 1 WHERE chat_id=?",
+                (house_delta, chat_id)
+            )
+            conn.execute("INSERT INTO road_history(chat_id, round_id, result) VALUES(?,?,?)", (chat_id, round_id, result))
+            conn.execute("DELETE FROM bets WHERE chat_id=? AND round_id=?", (chat_id, round_id))
+            conn.execute("UPDATE rounds SET status='CLOSED' WHERE chat_id=? AND round_id=?", (chat_id, round_id))
+
+    def void_baccarat(self, chat_id, round_id, credits):
+        with self.db() as conn:
+            self._apply_credits(conn, chat_id, "baccarat", round_id, credits)
+            conn.execute("DELETE FROM bets WHERE chat_id=? AND round_id=?", (chat_id, round_id))
+            conn.execute("UPDATE rounds SET status='CLOSED' WHERE chat_id=? AND round_id=?", (chat_id, round_id))
+
+    def settle_dice(self, chat_id, round_id, dice_value, created_at, credits, house_delta, stats=()):
+        with self.db() as conn:
+            self._apply_credits(conn, chat_id, "dice", round_id, credits)
+            conn.executemany(_STATS_UPSERT["dice"], stats)
+            conn.execute(
+                "INSERT INTO round_log(chat_id, game, round_id, shoe_no, shoe_pos, outcome, total_bet, house_delta, created_at) "
+                "SELECT ?, 'dice', ?, NULL, NULL, ?, COALESCE(SUM(amount), 0), ?, ? FROM dice_bets WHERE chat_id=? AND round_id=?",
+                (chat_id, round_id, str(dice_value), house_delta, created_at, chat_id, round_id)
+            )
+            conn.execute(
+                "INSERT INTO bet_log(chat_id, game, round_id, user_id, choice, exact_value, amount) "
+                "SELECT chat_id, 'dice', round_id, user_id, bet_type, exact_value, amount FROM dice_bets "
+                "WHERE chat_id=? AND round_id=?",
+                (chat_id, round_id)
+            )
+            conn.execute(
+                "INSERT INTO dice_history(chat_id, round_id, dice_value, created_at) VALUES(?,?,?,?)",
+                (chat_id, round_id, dice_value, created_at)
+            )
+            conn.execute("DELETE FROM dice_bets WHERE chat_id=? AND round_id=?", (chat_id, round_id))
+            conn.execute("UPDATE dice_rounds SET status='CLOSED' WHERE chat_id=? AND round_id=?", (chat_id, round_id))
+
+    # ---------- stats ----------
+
+    _STATS_SELECT = "SELECT u.points, " + ", ".join(f"COALESCE(s.{c}, 0) AS {c}" for c in STAT_COLUMNS) + (
+        " FROM users u LEFT JOIN user_stats s ON s.user_id = u.user_id WHERE u.user_id=?"
+    )
+
+    def user_stats(self, uid):
+        return self.db().execute(self._STATS_SELECT, (uid,)).fetchone()
+
+    # ---------- ledger ----------
+
+    def ledger_entries(self, uid, limit=10):
+        return self.db().execute(
+            "SELECT id, delta, reason, chat_id, game, round_id, created_at FROM ledger "
+            "WHERE user_id=? ORDER BY id DESC LIMIT ?", (uid, limit)
+        ).fetchall()
+
+    def snapshot_balances(self):
+        with self.db() as conn:
+            # 같은 트랜잭션 안이라 MAX(id) 와 users.points 가 같은 시점이다
+            since = conn.execute("SELECT COALESCE(MAX(ledger_id), 0) FROM balance_snapshots").fetchone()[0]
+            upto = conn.execute("SELECT COALESCE(MAX(id), 0) FROM ledger").fetchone()[0]
+            if upto <= since:
+                return 0
+            cur = conn.execute(
+                "INSERT OR REPLACE INTO balance_snapshots(user_id, ledger_id, points, created_at) "
+                "SELECT user_id, ?, points, ? FROM users "
+                "WHERE user_id IN (SELECT DISTINCT user_id FROM ledger WHERE id > ? AND id <= ?)",
+                (upto, int(time.time()), since, upto)
+            )
+            return cur.rowcount
+
+    _REBUILT = """
+        SELECT u.user_id, u.points,
+               COALESCE(s.points, 0) + COALESCE(
+                   (SELECT SUM(l.delta) FROM ledger l
+                    WHERE l.user_id = u.user_id AND l.id > COALESCE(s.ledger_id, 0)), 0) AS rebuilt
+        FROM users u
+        LEFT JOIN balance_snapshots s
+          ON s.user_id = u.user_id
+         AND s.ledger_id = (SELECT MAX(ledger_id) FROM balance_snapshots WHERE user_id = u.user_id)
+    """
+
+    def rebuild_balance(self, uid):
+        r = self.db().execute(self._REBUILT + " WHERE u.user_id=?", (uid,)).fetchone()
+        return int(r["rebuilt"]) if r else 0
+
+    def reconcile(self, limit=20):
+        rows = self.db().execute(
+            f"SELECT * FROM ({self._REBUILT}) WHERE points != rebuilt LIMIT ?", (limit,)
+        ).fetchall()
+        return [(r["user_id"], r["points"], r["rebuilt"]) for r in rows]
+
+    # ---------- seeds / replay ----------
+
+    def ensure_seed(self, chat_id, seed):
+        with self.db() as conn:
+            conn.execute("INSERT OR IGNORE INTO chat_seeds(chat_id, seed, shoes) VALUES(?,?,0)", (chat_id, seed))
+            return conn.execute("SELECT seed FROM chat_seeds WHERE chat_id=?", (chat_id,)).fetchone()["seed"]
+
+    def get_seed(self, chat_id):
+        r = self.db().execute("SELECT seed FROM chat_seeds WHERE chat_id=?", (chat_id,)).fetchone()
+        return r["seed"] if r else None
+
+    def next_shoe(self, chat_id):
+        with self.db() as conn:
+            conn.execute("UPDATE chat_seeds SET shoes = shoes + 1 WHERE chat_id=?", (chat_id,))
+            return conn.execute("SELECT shoes FROM chat_seeds WHERE chat_id=?", (chat_id,)).fetchone()["shoes"]
+
+    def shoe_number(self, chat_id):
+        r = self.db().execute("SELECT shoes FROM chat_seeds WHERE chat_id=?", (chat_id,)).fetchone()
+        return (r["shoes"] or None) if r else None
+
+    def save_seal(self, chat_id, round_id, shoe_no, shoe_pos, nonce, commitment):
+        with self.db() as conn:
+            conn.execute(
+                "INSERT INTO round_seals(chat_id, round_id, shoe_no, shoe_pos, nonce, commitment, created_at) "
+                "VALUES(?,?,?,?,?,?,?)",
+                (chat_id, round_id, shoe_no, shoe_pos, nonce, commitment, int(time.time())),
+            )
+
+    def get_seal(self, chat_id, round_id):
+        r = self._tuples(
+            "SELECT shoe_no, shoe_pos, nonce, commitment FROM round_seals WHERE chat_id=? AND round_id=?",
+            (chat_id, round_id),
+        )
+        return r[0] if r else None
+
+    def _tuples(self, sql, params):
+        cur = self.db().cursor()
+        cur.row_factory = None
+        return cur.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _round_filter(chat_id, game, round_id):
+        if round_id is None:
+            return "chat_id=? AND game=?", (chat_id, game)
+        return "chat_id=? AND game=? AND round_id=?", (chat_id, game, round_id)
+
+    def round_log(self, chat_id, game, round_id=None):
+        where, params = self._round_filter(chat_id, game, round_id)
+        return self._tuples(
+            f"SELECT round_id, shoe_no, shoe_pos, outcome, total_bet, house_delta FROM round_log "
+            f"WHERE {where} ORDER BY round_id", params
+        )
+
+    def bet_log(self, chat_id, game, round_id=None):
+        where, params = self._round_filter(chat_id, game, round_id)
+        return self._tuples(
+            f"SELECT round_id, user_id, choice, exact_value, amount FROM bet_log WHERE {where}", params
+        )
+
+    def round_ledger(self, chat_id, game, round_id=None):
+        where, params = self._round_filter(chat_id, game, round_id)
+        return self._tuples(f"SELECT round_id, user_id, delta, reason FROM ledger WHERE {where}", params)
+
+
+# ================== MEMORY ==================
+
+class MemoryStore(Store):
+    """dict 기반. 스레드에서 불려도 되게 락 하나로 감싼다."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.users: dict[int, dict] = {}
+        self.rounds: dict[int, dict] = {}
+        self.dice_rounds: dict[int, dict] = {}
+        self.bets: dict[tuple[int, int], dict[int, dict]] = {}
+        self.dice_bets: dict[tuple[int, int], dict[int, dict]] = {}
+        self.shoes: dict[int, tuple[list, int]] = {}
+        self.road: dict[int, list[str]] = {}
+        self.dice_history: dict[int, list[tuple[int, int, int]]] = {}
+        self.house: dict[int, dict] = {}
+        self.daily: set[tuple[int, int, str]] = set()
+        self.spins: dict[tuple[int, int, str], int] = {}
+        # (id, user_id, delta, reason, chat_id, game, round_id, created_at)
+        self.ledger: list[tuple] = []
+        # user_id -> [(ledger_id, points)] 오래된 것부터
+        self.snapshots: dict[int, list[tuple[int, int]]] = {}
+        # user_id -> {STAT_COLUMNS}
+        self.stats: dict[int, dict[str, int]] = {}
+        # chat_id -> [seed, shoes]
+        self.seeds: dict[int, list] = {}
+        # (chat_id, game) -> [(round_id, shoe_no, shoe_pos, outcome, total_bet, house_delta)]
+        self.rounds_log: dict[tuple[int, str], list[tuple]] = {}
+        # (chat_id, game) -> [(round_id, user_id, choice, exact_value, amount)]
+        self.bets_log: dict[tuple[int, str], list[tuple]] = {}
+        # (chat_id, round_id) -> (shoe_no, shoe_pos, nonce, commitment)
+        self.seals: dict[tuple[int, int], tuple] = {}
+
+    def _log(self, uid, delta, reason, chat_id=None, game=None, round_id=None):
+        self.ledger.append((len(self.ledger) + 1, uid, delta, reason, chat_id, game, round_id, int(time.time())))
+
+    # ---------- users ----------
+
+    def ensure_user(self, uid, username, starting_points):
+        with self._lock:
+            if uid not in self.users:
+                self.users[uid] = {"user_id": uid, "username": username or "", "points": starting_points}
+                self._log(uid, starting_points, "signup")
+
+    def get_points(self, uid):
+        u = self.users.get(uid)
+        return u["points"] if u else 0
+
+    def credit(self, uid, amount, reason, chat_id=None, game=None, round_id=None):
+        with self._lock:
+            u = self.users.get(uid)
+            if u:
+                u["points"] += amount
+                self._log(uid, amount, reason, chat_id, game, round_id)
+
+    def try_debit(self, uid, amount, reason, chat_id=None, game=None, round_id=None):
+        with self._lock:
+            u = self.users.get(uid)
+            if not u or u["points"] < amount:
+                return False
+            u["points"] -= amount
+            self._log(uid, -amount, reason, chat_id, game, round_id)
+            return True
+
+    def top_users(self, limit):
+        with self._lock:
+            rows = sorted(self.users.values(), key=lambda u: u["points"], reverse=True)[:limit]
+            return [dict(r) for r in rows]
+
+    # ---------- rounds ----------
+
+    def get_round(self, chat_id):
+        r = self.rounds.get(chat_id)
+        return dict(r) if r else None
+
+    def open_round(self, chat_id, round_id):
+        with self._lock:
+            self.rounds[chat_id] = {"round_id": round_id, "status": "OPEN"}
+
+    def _claim(self, table, chat_id, round_id):
+        with self._lock:
+            r = table.get(chat_id)
+            if not r or r["round_id"] != round_id or r["status"] != "OPEN":
+                return False
+            r["status"] = "CLOSING"
+            return True
+
+    def claim_round(self, chat_id, round_id):
+        return self._claim(self.rounds, chat_id, round_id)
+
+    def get_dice_round(self, chat_id):
+        r = self.dice_rounds.get(chat_id)
+        return dict(r) if r else None
+
+    def open_dice_round(self, chat_id, round_id, ends_at):
+        with self._lock:
+            self.dice_rounds[chat_id] = {"chat_id": chat_id, "round_id": round_id, "status": "OPEN", "ends_at": ends_at}
+
+    def claim_dice_round(self, chat_id, round_id):
+        return self._claim(self.dice_rounds, chat_id, round_id)
+
+    def _close(self, table, chat_id, round_id):
+        r = table.get(chat_id)
+        if r and r["round_id"] == round_id:
+            r["status"] = "CLOSED"
+
+    def stop_dice_round(self, chat_id, round_id):
+        with self._lock:
+            self._close(self.dice_rounds, chat_id, round_id)
+            self.dice_bets.pop((chat_id, round_id), None)
+
+    def open_round_counts(self):
+        with self._lock:
+            return {
+                "baccarat": sum(1 for r in self.rounds.values() if r["status"] == "OPEN"),
+                "dice": sum(1 for r in self.dice_rounds.values() if r["status"] == "OPEN"),
+            }
+
+    # ---------- bets ----------
+
+    def has_bet(self, chat_id, round_id, uid):
+        return uid in self.bets.get((chat_id, round_id), ())
+
+    def add_bet(self, chat_id, round_id, uid, choice, amount):
+        with self._lock:
+            book = self.bets.setdefault((chat_id, round_id), {})
+            if uid in book:
+                raise KeyError("duplicate bet")
+            book[uid] = {"chat_id": chat_id, "round_id": round_id, "user_id": uid, "choice": choice, "amount": amount}
+
+    def list_bets(self, chat_id, round_id):
+        with self._lock:
+            return list(self.bets.get((chat_id, round_id), {}).values())
+
+    def bet_columns(self, chat_id, round_id):
+        rows = self.list_bets(chat_id, round_id)
+        return [b["user_id"] for b in rows], [b["choice"] for b in rows], [b["amount"] for b in rows]
+
+    @staticmethod
+    def _pool(rows, key):
+        out = {}
+        for b in rows:
+            k = key(b)
+            n, total = out.get(k, (0, 0))
+            out[k] = (n + 1, total + b["amount"])
+        return out
+
+    def bet_pool(self, chat_id, round_id):
+        pool = self._pool(self.list_bets(chat_id, round_id), lambda b: b["choice"])
+        return [(k, n, total) for k, (n, total) in pool.items()]
+
+    def has_dice_bet(self, chat_id, round_id, uid):
+        return uid in self.dice_bets.get((chat_id, round_id), ())
+
+    def add_dice_bet(self, chat_id, round_id, uid, bet_type, exact_value, amount):
+        with self._lock:
+            book = self.dice_bets.setdefault((chat_id, round_id), {})
+            if uid in book:
+                raise KeyError("duplicate bet")
+            book[uid] = {
+                "chat_id": chat_id, "round_id": round_id, "user_id": uid,
+                "bet_type": bet_type, "exact_value": exact_value, "amount": amount,
+            }
+
+    def list_dice_bets(self, chat_id, round_id):
+        with self._lock:
+            return list(self.dice_bets.get((chat_id, round_id), {}).values())
+
+    def dice_bet_columns(self, chat_id, round_id):
+        rows = self.list_dice_bets(chat_id, round_id)
+        return (
+            [b["user_id"] for b in rows], [b["bet_type"] for b in rows],
+            [b["exact_value"] for b in rows], [b["amount"] for b in rows],
+        )
+
+    def dice_bet_pool(self, chat_id, round_id):
+        pool = self._pool(self.list_dice_bets(chat_id, round_id), lambda b: (b["bet_type"], b["exact_value"]))
+        return [(t, ex, n, total) for (t, ex), (n, total) in pool.items()]
+
+    # ---------- shoe ----------
+
+    def load_shoe(self, chat_id):
+        s = self.shoes.get(chat_id)
+        return (list(s[0]), s[1]) if s else None
+
+    def save_shoe(self, chat_id, deck, position):
+        with self._lock:
+            self.shoes[chat_id] = (list(deck), position)
+
+    # ---------- history / house ----------
+
+    def road_history(self, chat_id, limit=None):
+        rows = self.road.get(chat_id, [])
+        return list(rows if limit is None else rows[-limit:])
+
+    def get_house(self, chat_id):
+        h = self.house.get(chat_id)
+        return dict(h) if h else None
+
+    # ---------- claims ----------
+
+    def claim_daily(self, chat_id, uid, day):
+        with self._lock:
+            key = (chat_id, uid, day)
+            if key in self.daily:
+                return False
+            self.daily.add(key)
+            return True
+
+    def spin_used(self, chat_id, uid, day):
+        return self.spins.get((chat_id, uid, day), 0)
+
+    def set_spin_used(self, chat_id, uid, day, used):
+        with self._lock:
+            self.spins[(chat_id, uid, day)] = used
+
+    # ---------- settlement ----------
+
+    def _apply_credits(self, chat_id, game, round_id, credits):
+        for uid, amt, reason in credits:
+            u = self.users.get(uid)
+            if u and amt > 0:
+                u["points"] += amt
+                self._log(uid, amt, reason, chat_id, game, round_id)
+
+    def _archive(self, chat_id, game, round_id, book, outcome, house_delta, shoe_no=None, shoe_pos=None):
+        bets = list(book.get((chat_id, round_id), {}).values())
+        total = sum(b["amount"] for b in bets)
+        self.rounds_log.setdefault((chat_id, game), []).append(
+            (round_id, shoe_no, shoe_pos, outcome, total, house_delta)
+        )
+        self.bets_log.setdefault((chat_id, game), []).extend(
+            (round_id, b["user_id"], b.get("choice") or b.get("bet_type"), b.get("exact_value"), b["amount"])
+            for b in bets
+        )
+
+    def _add_stats(self, game, stats):
+        for uid, wagered, won, win in stats:
+            s = self.stats.get(uid)
+            if s is None:
+                s = self.stats[uid] = dict.fromkeys(STAT_COLUMNS, 0)
+            for prefix in ("", f"{game}_"):
+                s[prefix + "rounds"] += 1
+                s[prefix + "wagered"] += wagered
+                s[prefix + "won"] += won
+                s[prefix + "wins"] += win
+            s["streak"] = s["streak"] + 1 if win else 0
+            s["max_streak"] = max(s["max_streak"], s["streak"])
+
+    def settle_baccarat(self, chat_id, round_id, result, credits, house_delta, shoe_no=None, shoe_pos=None, stats=()):
+        with self._lock:
+            self._apply_credits(chat_id, "baccarat", round_id, credits)
+            self._add_stats("baccarat", stats)
+            self._archive(chat_id, "baccarat", round_id, self.bets, result, house_delta, shoe_no, shoe_pos)
+            h = self.house.setdefault(chat_id, {"profit": 0, "rounds": 0})
+            h["profit"] += house_delta
+            h["rounds"] += 1
+            self.road.setdefault(chat_id, []).append(result)
+            self.bets.pop((chat_id, round_id), None)
+            self._close(self.rounds, chat_id, round_id)
+
+    def void_baccarat(self, chat_id, round_id, credits):
+        with self._lock:
+            self._apply_credits(chat_id, "baccarat", round_id, credits)
+            self.bets.pop((chat_id, round_id), None)
+            self._close(self.rounds, chat_id, round_id)
+
+    def settle_dice(self, chat_id, round_id, dice_value, created_at, credits, house_delta, stats=()):
+        with self._lock:
+            self._apply_credits(chat_id, "dice", round_id, credits)
+            self._add_stats("dice", stats)
+            self._archive(chat_id, "dice", round_id, self.dice_bets, str(dice_value), house_delta)
+            self.dice_history.setdefault(chat_id, []).append((round_id, dice_value, created_at))
+            self.dice_bets.pop((chat_id, round_id), None)
+            self._close(self.dice_rounds, chat_id, round_id)
+
+    # ---------- stats ----------
+
+    def user_stats(self, uid):
+        with self._lock:
+            u = self.users.get(uid)
+            if not u:
+                return None
+            return {"points": u["points"], **self.stats.get(uid, dict.fromkeys(STAT_COLUMNS, 0))}
+
+    # ---------- ledger ----------
+
+    _LEDGER_COLUMNS = ("id", "user_id", "delta", "reason", "chat_id", "game", "round_id", "created_at")
+
+    def ledger_entries(self, uid, limit=10):
+        with self._lock:
+            rows = [e for e in reversed(self.ledger) if e[1] == uid][:limit]
+        return [dict(zip(self._LEDGER_COLUMNS, e)) for e in rows]
+
+    def snapshot_balances(self):
+        with self._lock:
+            since = max((s[-1][0] for s in self.snapshots.values()), default=0)
+            upto = len(self.ledger)
+            moved = {e[1] for e in self.ledger[since:upto]}
+            for uid in moved:
+                if uid in self.users:
+                    self.snapshots.setdefault(uid, []).append((upto, self.users[uid]["points"]))
+            return len(moved)
+
+    def rebuild_balance(self, uid):
+        with self._lock:
+            last_id, points = self.snapshots.get(uid, [(0, 0)])[-1]
+            return points + sum(e[2] for e in self.ledger[last_id:] if e[1] == uid)
+
+    def reconcile(self, limit=20):
+        out = []
+        with self._lock:
+            for uid, u in self.users.items():
+                rebuilt = self.rebuild_balance(uid)
+                if rebuilt != u["points"]:
+                    out.append((uid, u["points"], rebuilt))
+                    if len(out) >= limit:
+                        break
+        return out
+
+    # ---------- seeds / replay ----------
+
+    def ensure_seed(self, chat_id, seed):
+        with self._lock:
+            return self.seeds.setdefault(chat_id, [seed, 0])[0]
+
+    def get_seed(self, chat_id):
+        s = self.seeds.get(chat_id)
+        return s[0] if s else None
+
+    def next_shoe(self, chat_id):
+        with self._lock:
+            s = self.seeds[chat_id]
+            s[1] += 1
+            return s[1]
+
+    def shoe_number(self, chat_id):
+        s = self.seeds.get(chat_id)
+        return (s[1] or None) if s else None
+
+    def save_seal(self, chat_id, round_id, shoe_no, shoe_pos, nonce, commitment):
+        with self._lock:
+            self.seals[(chat_id, round_id)] = (shoe_no, shoe_pos, nonce, commitment)
+
+    def get_seal(self, chat_id, round_id):
+        return self.seals.get((chat_id, round_id))
+
+    def round_log(self, chat_id, game, round_id=None):
+        with self._lock:
+            rows = self.rounds_log.get((chat_id, game), [])
+            return sorted(r for r in rows if round_id is None or r[0] == round_id)
+
+    def bet_log(self, chat_id, game, round_id=None):
+        with self._lock:
+            return [r for r in self.bets_log.get((chat_id, game), []) if round_id is None or r[0] == round_id]
+
+    def round_ledger(self, chat_id, game, round_id=None):
+        with self._lock:
+            return [
+                (e[6], e[1], e[2], e[3]) for e in self.ledger
+                if e[4] == chat_id and e[5] == game and (round_id is None or e[6] == round_id)
+            ]
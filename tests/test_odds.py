@@ -0,0 +1,85 @@
+"""odds.next_hand 를 rules.deal 로 직접 따라가는 무식한 열거와 비교한다."""
+
+import random
+
+import pytest
+
+import odds
+import rules
+
+RANK = {0: "10", 1: "A", **{v: str(v) for v in range(2, 10)}}
+
+
+class _More(Exception):
+    pass
+
+
+def brute_force(counts, usable):
+    """순번 i 의 카드는 i < usable 이면 counts 에서, 아니면 새 슈에서. 메모 없이 경로마다 rules.deal 을 다시 돌린다."""
+    out = [0.0, 0.0, 0.0]
+
+    def run(prefix):
+        it = iter(prefix)
+
+        def draw():
+            try:
+                return RANK[next(it)], "♠"
+            except StopIteration:
+                raise _More from None
+
+        try:
+            _, _, p, b = rules.deal(draw)
+        except _More:
+            return None
+        return 0 if p > b else (1 if b > p else 2)
+
+    def walk(prefix, pr, cur, fresh):
+        res = run(prefix)
+        if res is not None:
+            out[res] += pr
+            return
+        i = len(prefix)
+        src = cur if i < usable else fresh
+        n = sum(src)
+        for v in range(10):
+            if src[v]:
+                nxt = list(src)
+                nxt[v] -= 1
+                if i < usable:
+                    walk(prefix + [v], pr * src[v] / n, nxt, fresh)
+                else:
+                    walk(prefix + [v], pr * src[v] / n, cur, nxt)
+
+    walk([], 1.0, list(counts), list(odds.FRESH))
+    return tuple(out)
+
+
+def small_shoe(rng, cards):
+    counts = [0] * 10
+    for _ in range(cards):
+        counts[rng.randrange(10)] += 1
+    return tuple(counts)
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_matches_brute_force_before_cut(seed):
+    rng = random.Random(seed)
+    counts = small_shoe(rng, rng.randint(10, 14))
+    usable = sum(counts) - rules.CUT_RESERVE
+    odds.next_hand.cache_clear()
+    assert odds.next_hand(counts, usable) == pytest.approx(brute_force(counts, usable), abs=1e-12)
+
+
+@pytest.mark.parametrize("usable", [1, 2, 3, 4, 5])
+def test_matches_brute_force_across_cut(usable):
+    # 컷까지 6장이 안 남으면 판 중간부터 새 슈에서 뽑는다
+    counts = small_shoe(random.Random(usable), usable + rules.CUT_RESERVE)
+    odds.next_hand.cache_clear()
+    assert odds.next_hand(counts, usable) == pytest.approx(brute_force(counts, usable), abs=1e-12)
+
+
+def test_fresh_shoe_known_values():
+    # 8덱 바카라의 알려진 확률: 플레이어 44.62%, 뱅커 45.86%, 타이 9.52%
+    p, b, t = odds.next_hand(odds.FRESH, sum(odds.FRESH) - rules.CUT_RESERVE)
+    assert p + b + t == pytest.approx(1.0)
+    assert (p, b, t) == pytest.approx((0.44625, 0.45860, 0.09516), abs=5e-5)
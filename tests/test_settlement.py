@@ -0,0 +1,64 @@
+"""settlement: numpy 경로와 파이썬 경로가 같은 정산을 내는지."""
+
+import random
+
+import pytest
+
+import settlement
+
+PAYOUTS = {"P": 2.0, "B": 1.95, "T": 8.0}
+DICE_PAYOUT = {"BIG": 2.0, "SMALL": 2.0, "EXACT": 6.0}
+
+pytest.importorskip("numpy")
+
+
+def both(monkeypatch, fn, *args):
+    monkeypatch.setattr(settlement, "VECTOR_MIN_BETS", 10 ** 9)
+    py = fn(*args)
+    monkeypatch.setattr(settlement, "VECTOR_MIN_BETS", 0)
+    vec = fn(*args)
+    assert isinstance(py.payouts, list)
+    assert not isinstance(vec.payouts, list)
+    return py, vec
+
+
+def assert_same(py, vec):
+    assert vec.credits() == py.credits()
+    assert vec.stats() == py.stats()
+    assert vec.total_bet - vec.total_payout == py.total_bet - py.total_payout
+    assert (vec.total_bet, vec.total_payout, vec.winners) == (py.total_bet, py.total_payout, py.winners)
+
+
+def amounts(rng, n):
+    # 1.95 배당에서 소수점이 잘리는 금액이 섞이게
+    return [rng.choice((1, 7, 99, 1001, 12345, rng.randint(1, 5_000_000))) for _ in range(n)]
+
+
+@pytest.mark.parametrize("result", ["P", "B", "T"])
+@pytest.mark.parametrize("seed", range(5))
+def test_baccarat_paths_match(monkeypatch, result, seed):
+    rng = random.Random(seed)
+    n = rng.randint(1, 2000)
+    uids = rng.sample(range(10_000, 10_000_000), n)
+    choices = [rng.choice("PBT") for _ in range(n)]
+    py, vec = both(monkeypatch, settlement.settle_baccarat, uids, choices, amounts(rng, n), result, PAYOUTS)
+    assert_same(py, vec)
+
+
+def test_baccarat_tie_refunds(monkeypatch):
+    py, vec = both(monkeypatch, settlement.settle_baccarat, [1, 2, 3], ["P", "B", "T"], [100, 101, 10], "T", PAYOUTS)
+    assert_same(py, vec)
+    assert py.credits() == [(1, 100, "refund"), (2, 101, "refund"), (3, 80, "payout")]
+
+
+@pytest.mark.parametrize("dice_value", range(1, 7))
+@pytest.mark.parametrize("seed", range(3))
+def test_dice_paths_match(monkeypatch, dice_value, seed):
+    rng = random.Random(seed * 7 + dice_value)
+    n = rng.randint(1, 2000)
+    uids = rng.sample(range(10_000, 10_000_000), n)
+    types = [rng.choice(("BIG", "SMALL", "EXACT")) for _ in range(n)]
+    exact = [rng.randint(1, 6) if t == "EXACT" else None for t in types]
+    py, vec = both(monkeypatch, settlement.settle_dice, uids, types, exact, amounts(rng, n), dice_value, DICE_PAYOUT)
+    assert_same(py, vec)
+    assert py.winners == sum(settlement.dice_hit(t, e, dice_value) for t, e in zip(types, exact))
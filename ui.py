@@ -1,4 +1,3 @@
-from PIL import Image, ImageDraw
 from database import db
 
 CELL = 30
@@ -28,6 +27,8 @@ def get_road(chat_id):
 # =========================
 
 def draw_road_image(chat_id):
+    from PIL import Image, ImageDraw  # 이미지가 필요할 때만 로딩
+
     results = get_road(chat_id)
 
     cols = max(len(results), 20)
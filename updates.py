@@ -0,0 +1,101 @@
+"""
+채팅별 순서를 지키는 동시 업데이트 처리기.
+
+Application 기본값은 업데이트를 하나씩 처리해서, 한 방의 정산/이미지 전송이 다른 방 명령까지 막는다.
+ChatOrderedUpdateProcessor 는
+- 같은 채팅의 업데이트는 들어온 순서대로 하나씩 (베팅/시작이 뒤바뀌지 않게),
+- 다른 채팅끼리는 최대 `limit` 개까지 동시에 처리한다.
+채팅이 없는 업데이트는 순서 보장 없이 슬롯만 잡고 처리한다.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+QUEUE_DEPTH = metrics.gauge("chat_queue_depth", "Updates waiting or running per chat")
+PENDING = metrics.gauge("updates_pending", "Updates accepted but not finished")
+INFLIGHT = metrics.gauge("updates_inflight", "Updates currently running a handler")
+
+
+def chat_key(update: object) -> int | None:
+    if isinstance(update, Update) and update.effective_chat is not None:
+        return update.effective_chat.id
+    return None
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """
+    limit: 동시에 핸들러를 돌리는 업데이트 수 상한.
+    max_pending: 대기 포함 받아둘 업데이트 수 상한 (BaseUpdateProcessor 의 semaphore).
+      같은 채팅 앞 순서를 기다리는 업데이트도 여기에 포함돼서, 한 방이 몰려도 슬롯(limit)은 안 먹는다.
+    """
+
+    __slots__ = ("limit", "_slots", "_tails", "_depth")
+
+    def __init__(self, limit: int = 32, max_pending: int = 4096):
+        super().__init__(max(limit, max_pending))
+        self.limit = limit
+        self._slots = asyncio.BoundedSemaphore(limit)
+        # chat_id -> 그 채팅 마지막 업데이트가 끝나면 완료되는 future
+        self._tails: dict[int, asyncio.Future] = {}
+        self._depth: dict[int, int] = {}
+
+    async def do_process_update(self, update: object, coroutine: "Awaitable[Any]") -> None:
+        key = chat_key(update)
+        PENDING.inc()
+        try:
+            if key is None:
+                await self._run(coroutine)
+                return
+
+            # 여기까지 await 없이 와야 도착 순서대로 꼬리를 잇는다
+            prev = self._tails.get(key)
+            done = asyncio.get_running_loop().create_future()
+            self._tails[key] = done
+            depth = self._depth[key] = self._depth.get(key, 0) + 1
+            QUEUE_DEPTH.set(depth, chat=key)
+            try:
+                if prev is not None:
+                    await asyncio.shield(prev)
+                await self._run(coroutine)
+            finally:
+                done.set_result(None)
+                if self._tails.get(key) is done:
+                    del self._tails[key]
+                depth = self._depth[key] = self._depth[key] - 1
+                if depth:
+                    QUEUE_DEPTH.set(depth, chat=key)
+                else:
+                    del self._depth[key]
+                    QUEUE_DEPTH.remove(chat=key)
+        finally:
+            PENDING.dec()
+
+    async def _run(self, coroutine: "Awaitable[Any]"):
+        async with self._slots:
+            INFLIGHT.inc()
+            try:
+                await coroutine
+            except Exception:
+                # Application.process_update 가 이미 에러 핸들러로 넘긴 예외다. 다음 순서를 막지 않는다
+                log.debug("update processing raised", exc_info=True)
+            finally:
+                INFLIGHT.dec()
+
+    def depth(self, chat_id: int) -> int:
+        return self._depth.get(chat_id, 0)
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        tails = list(self._tails.values())
+        if tails:
+            await asyncio.gather(*tails, return_exceptions=True)